@@ -1,7 +1,20 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+
+# Startup is measured from here, before the heavy imports below
+_import_start = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Depends, Query
+from typing import List
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import json
+from fastapi.responses import StreamingResponse, Response, FileResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, ExitStack
+import asyncio
+import math
+import zipfile
 import uvicorn
 import sys
 import os
@@ -9,15 +22,440 @@ import os
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from services.pdf_processor import process_pdf
-import tempfile
+from config import Config
+from services.pdf_processor import (
+    extract_document, extract_document_parallel, extract_document_info, iter_pages_parallel, parse_fields,
+    parse_page_ranges, limit_output, warm_up, render_page_preview, round_preview_width, ExtractionOptions,
+    ResourceLimits, DEFAULT_OPTIONS, PDFProcessingError, InvalidPDFError, ExtractionCancelled, ResourceLimitExceeded
+)
+from services.serialization import dumps, loads_as, negotiate_format, available_formats, MEDIA_TYPES
+from services.compression import negotiate_encoding, compress, StreamCompressor
+from services.image_store import ImageStore
+from services.preview_store import PreviewStore, is_digest
+from services.uploads import spool_upload, spool_zip_member, zip_pdf_members, UploadTooLarge
+from services.executor import WorkerPool, PoolSaturated, PoolClosed, JobTimeout
+from services.result_cache import ResultCache, result_key
+from services.job_store import JobStore, ACTIVE_STATUSES, COMPLETED
+from services.models import DocumentResult
+from services.search_index import SearchIndex, SearchIndexer, SpooledPageText
+from services.page_memo import PageMemo
+from services.instrumentation import Timings, TimedExecutor, recording, stage
+from services.metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+# Extraction runs in worker processes so CPU-bound work never blocks the event loop
+pool = WorkerPool(
+    max_workers=Config.WORKER_COUNT,
+    max_queue=Config.MAX_QUEUED_JOBS,
+    job_timeout=Config.JOB_TIMEOUT_SECONDS,
+    retry_after=Config.RETRY_AFTER_SECONDS,
+    start_method=Config.WORKER_START_METHOD,
+    preload=Config.PRELOAD_ENGINE,
+    warmup=warm_up if Config.PRELOAD_ENGINE else None
+)
+
+# Filled in during startup; /ready answers 200 once "ready" is set
+startup = {"ready": False, "importSeconds": round(IMPORT_SECONDS, 3), "warmupSeconds": None, "readySeconds": None}
+
+# Results are cached by content hash, so re-uploads never reach the pool
+result_cache = ResultCache(
+    directory=Config.CACHE_DIR,
+    memory_bytes=Config.CACHE_MEMORY_MB * 1024 * 1024,
+    disk_bytes=Config.CACHE_DISK_MB * 1024 * 1024
+)
+
+MAX_UPLOAD_BYTES = Config.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+BATCH_MAX_UPLOAD_BYTES = Config.BATCH_MAX_UPLOAD_SIZE_MB * 1024 * 1024
+
+# Documents over these limits fail with 413 instead of exhausting a worker
+LIMITS = ResourceLimits(
+    max_pages=Config.MAX_PAGES,
+    max_image_pixels=Config.MAX_IMAGE_PIXELS,
+    max_single_image_pixels=Config.MAX_SINGLE_IMAGE_PIXELS,
+    max_output_bytes=Config.MAX_OUTPUT_MB * 1024 * 1024,
+    max_seconds=Config.MAX_EXTRACTION_SECONDS,
+    engine_memory_bytes=Config.ENGINE_MEMORY_MB * 1024 * 1024
+)
+
+# Optional memo of page text and images by content hash, shared with the worker processes
+page_memo = PageMemo(Config.PAGE_MEMO_PATH, Config.PAGE_MEMO_MB * 1024 * 1024) if Config.PAGE_MEMO else None
+
+# Image bytes served by /documents/{doc_id}/images/{image_id} in image_mode=ref
+image_store = ImageStore(max_bytes=Config.IMAGE_STORE_MB * 1024 * 1024)
+
+# Page previews, and the PDFs they are rendered from on demand
+preview_store = PreviewStore(Config.PREVIEW_DIR, max_bytes=Config.PREVIEW_STORE_MB * 1024 * 1024)
+
+# Asynchronous jobs: state in a local SQLite store, run on a few runner threads
+job_store = JobStore(Config.JOBS_DIR, ttl_seconds=Config.JOB_TTL_SECONDS)
+job_runner = ThreadPoolExecutor(max_workers=Config.JOB_RUNNERS, thread_name_prefix="pdf-job")
+JOB_PURGE_INTERVAL_SECONDS = min(60, Config.JOB_TTL_SECONDS)
+JOB_PROGRESS_INTERVAL_SECONDS = 0.5
+
+# Optional full-text index of processed documents, written by a background thread
+search_index = SearchIndex(Config.SEARCH_INDEX_PATH) if Config.SEARCH_INDEX else None
+search_indexer = SearchIndexer(search_index, Config.SEARCH_INDEX_QUEUE) if search_index else None
+
+# Prometheus metrics served by /metrics
+metrics = Registry()
+REQUESTS = metrics.counter("pdf_requests_total", "HTTP requests by endpoint and status code",
+                           ("endpoint", "status"))
+REQUEST_DURATION = metrics.histogram("pdf_request_duration_seconds",
+                                     "Time until the response, streamed bodies included, was sent",
+                                     ("endpoint",))
+IN_FLIGHT = metrics.gauge("pdf_requests_in_flight", "Requests being handled", ("endpoint",))
+EXTRACTION_ERRORS = metrics.counter("pdf_extraction_errors_total", "Failed extractions by error type",
+                                    ("error",))
+STARTUP_SECONDS = metrics.gauge("pdf_startup_seconds",
+                                "Seconds from the first import to each startup phase finishing", ("phase",))
+STARTUP_SECONDS.set(IMPORT_SECONDS, phase="imports")
+STAGE_DURATION = metrics.histogram("pdf_stage_duration_seconds",
+                                   "Time per extraction stage and request, summed across workers; "
+                                   "only timed requests are observed",
+                                   ("stage",))
+# Timings counter name -> metric. Pages, images and previews are counted for
+# every extraction from its result; the image bytes and reused images are
+# only known to timed requests, like the stage histogram
+EXTRACTED = {
+    "pages": metrics.counter("pdf_pages_extracted_total", "Pages extracted"),
+    "images": metrics.counter("pdf_images_extracted_total", "Unique images extracted"),
+    "imageBytesIn": metrics.counter("pdf_image_bytes_in_total", "Source bytes of extracted images"),
+    "imageBytesOut": metrics.counter("pdf_image_bytes_out_total", "Output bytes of extracted images"),
+    "pagesReused": metrics.counter("pdf_pages_reused_total", "Pages taken from the page memo"),
+    "imagesReused": metrics.counter("pdf_images_reused_total", "Unique images taken from the page memo"),
+    "previews": metrics.counter("pdf_previews_rendered_total", "Page previews rendered during extractions"),
+}
+COUNTED_FROM_RESULTS = ("pages", "images", "pagesReused", "previews")
+
+def service_metrics():
+    """Pool and cache state, read from their own counters at scrape time."""
+    pool_stats = pool.stats()
+    cache_stats = result_cache.stats()
+    extraction_stats = extractions.stats()
+    return {
+        "pdf_pool_workers": ("gauge", "Worker processes", pool_stats["workers"]),
+        "pdf_pool_busy_workers": ("gauge", "Workers running a job", pool_stats["busyWorkers"]),
+        "pdf_pool_queue_depth": ("gauge", "Jobs waiting for a worker", pool_stats["queueDepth"]),
+        "pdf_pool_admitted": ("gauge", "Admitted requests holding pool capacity", pool_stats["admitted"]),
+        "pdf_pool_capacity": ("gauge", "Admission capacity of the pool", pool_stats["capacity"]),
+        "pdf_pool_jobs_completed_total": ("counter", "Jobs completed by workers", pool_stats["completed"]),
+        "pdf_pool_jobs_failed_total": ("counter", "Jobs that raised", pool_stats["failed"]),
+        "pdf_pool_jobs_timed_out_total": ("counter", "Jobs killed by the timeout", pool_stats["timedOut"]),
+        "pdf_pool_worker_restarts_total": ("counter", "Worker processes restarted",
+                                           pool_stats["workerRestarts"]),
+        "pdf_cache_hits_total": ("counter", "Result cache hits", cache_stats["hits"]),
+        "pdf_cache_misses_total": ("counter", "Result cache misses", cache_stats["misses"]),
+        "pdf_cache_memory_bytes": ("gauge", "Result cache bytes in memory", cache_stats["memoryBytes"]),
+        "pdf_cache_disk_bytes": ("gauge", "Result cache bytes on disk", cache_stats["diskBytes"]),
+        "pdf_extractions_in_flight": ("gauge", "Distinct extractions running for requests",
+                                      extraction_stats["inFlight"]),
+        "pdf_requests_coalesced_total": ("counter", "Requests that shared an identical running extraction",
+                                         extraction_stats["coalesced"]),
+    }
+
+metrics.add_collector(service_metrics)
+
+def record_timings(timings):
+    """Feed the stage timings and the counters only timed requests know into the metrics."""
+    for name, (seconds, _) in timings.stages.items():
+        STAGE_DURATION.observe(seconds, stage=name)
+    for name, n in timings.counters.items():
+        if name in EXTRACTED and name not in COUNTED_FROM_RESULTS:
+            EXTRACTED[name].inc(n)
+
+def count_extraction(pages, images=0, previews=0, pages_reused=0):
+    """Count the pages and images of one extraction, timed or not."""
+    EXTRACTED["pages"].inc(pages)
+    EXTRACTED["images"].inc(images)
+    EXTRACTED["previews"].inc(previews)
+    EXTRACTED["pagesReused"].inc(pages_reused)
+
+def count_result(result, info):
+    """count_extraction() for a DocumentResult extracted with the pre-flight ``info``."""
+    count_extraction(len(info["pageIndexes"]), len(result.images or ()), len(result.previews or ()),
+                     (result.page_reuse or {}).get("reused", 0))
+
+def count_error(error):
+    EXTRACTION_ERRORS.inc(error=type(error).__name__)
+
+class SingleFlight:
+    """
+    Runs one extraction per key at a time and lets identical requests share it.
+
+    The first request for a key starts the work as a task of its own; later
+    requests for the same key wait for that task instead of starting another.
+    Every waiter gets the same result, or the same exception. Waiters are
+    shielded from each other: one that is cancelled (its client went away)
+    stops waiting, but the work runs on for the others and its result still
+    reaches the cache.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, start):
+        """Return the result of ``start()`` for ``key``; ``start`` is only called if no task is running."""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+            with stage("coalesced"):
+                return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(start())
+        self._tasks[key] = task
+        self.started += 1
+        task.add_done_callback(lambda task: self._finished(key, task))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every waiter is gone
+
+    def stats(self):
+        return {"inFlight": len(self._tasks), "started": self.started, "coalesced": self.coalesced}
+
+# Extractions in flight by result cache key
+extractions = SingleFlight()
+
+class FastJSONResponse(Response):
+    """JSON response serialized with orjson when available; bytes are sent as they are."""
+    media_type = "application/json"
+
+    def render(self, content):
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+@asynccontextmanager
+async def lifespan(app):
+    pool.start()
+    warmer = asyncio.create_task(warm_up_service())
+    job_store.recover()
+    purger = asyncio.create_task(purge_jobs())
+    if search_indexer is not None:
+        search_indexer.start()
+    yield
+    warmer.cancel()
+    purger.cancel()
+    if search_indexer is not None:
+        search_indexer.shutdown(timeout=5)
+    # Queued jobs are dropped and failed by recover() on the next start
+    job_runner.shutdown(wait=False, cancel_futures=True)
+    pool.shutdown()
+
+async def warm_up_service():
+    """
+    Wait for the workers to warm up; then the service is ready. Nothing is
+    warmed up in this process, since every extraction, pre-flights included,
+    runs on the pool.
+    """
+    start = time.perf_counter()
+    # Waited for in short steps, so shutting down can cancel the wait
+    while not await asyncio.to_thread(pool.wait_ready, 1):
+        pass
+    startup["warmupSeconds"] = round(time.perf_counter() - start, 3)
+    startup["readySeconds"] = round(time.perf_counter() - _import_start, 3)
+    startup["ready"] = True
+    STARTUP_SECONDS.set(time.perf_counter() - _import_start, phase="ready")
+
+async def purge_jobs():
+    """Remove expired jobs and their results in the background."""
+    while True:
+        await asyncio.to_thread(job_store.purge_expired)
+        await asyncio.sleep(JOB_PURGE_INTERVAL_SECONDS)
 
 app = FastAPI(
     title="PDF Processor API",
     description="API for extracting text, metadata, and images from PDF files",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+class RequestSizeLimit:
+    """
+    ASGI middleware rejecting request bodies over a size limit with 413.
+
+    A declared Content-Length is checked before anything is read, so
+    oversized uploads are refused before the multipart body is parsed;
+    bodies without one are counted as they arrive. ``path_limits_mb``
+    overrides the limit for specific paths.
+    """
+
+    # Room for the multipart framing around the files themselves
+    FRAMING_BYTES = 1024 * 1024
+
+    def __init__(self, app, max_mb, path_limits_mb=None):
+        self.app = app
+        self.max_mb = max_mb
+        self.path_limits_mb = path_limits_mb or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit_mb = self.path_limits_mb.get(scope["path"], self.max_mb)
+        max_bytes = limit_mb * 1024 * 1024 + self.FRAMING_BYTES
+        detail = f"Request body exceeds the maximum upload size of {limit_mb} MB"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            response = FastJSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(RequestSizeLimit, max_mb=Config.MAX_UPLOAD_SIZE_MB,
+                   path_limits_mb={"/process-batch": Config.BATCH_MAX_UPLOAD_SIZE_MB})
+
+class RequestMetrics:
+    """
+    ASGI middleware recording request counts, latency and in-flight requests.
+
+    Requests are labelled by their route template (``/jobs/{job_id}``), and
+    requests matching no route by "unmatched", so the number of label values
+    stays bounded. Latency runs until the whole response, including a
+    streamed body, has been sent.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def endpoint(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self.endpoint(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc(endpoint=endpoint)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_DURATION.observe(time.perf_counter() - start, endpoint=endpoint)
+            REQUESTS.inc(endpoint=endpoint, status=status)
+            IN_FLIGHT.dec(endpoint=endpoint)
+
+class ResponseCompression:
+    """
+    ASGI middleware compressing responses with the best content coding the
+    client accepts: zstd, br or gzip (see services.compression).
+
+    Whole bodies smaller than ``minimum_size`` are sent as they are, and
+    large ones are compressed in a thread to keep the event loop free.
+    Streamed bodies are compressed chunk by chunk and flushed after each, so
+    NDJSON records still arrive as they are produced. Only text-like media
+    types are compressed; images and bodies that already have a
+    Content-Encoding pass through.
+    """
+
+    COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack",
+                          "application/cbor", "text/")
+    # Bodies at least this large are compressed off the event loop
+    THREAD_BYTES = 256 * 1024
+
+    def __init__(self, app, minimum_size=1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if ("content-encoding" in headers
+                        or not headers.get("content-type", "").startswith(self.COMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await compressing_send(message)
+                    return
+
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    if len(body) >= self.THREAD_BYTES:
+                        body = await asyncio.to_thread(compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    passthrough = True
+                    await compressing_send({"type": "http.response.body", "body": body})
+                    return
+
+                # Streamed: the compressed length is not known in advance
+                del headers["Content-Length"]
+                compressor = StreamCompressor(encoding)
+                await send(start)
+                start = None
+
+            chunk = compressor.compress(body) if body else b""
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+if Config.COMPRESS_RESPONSES:
+    app.add_middleware(ResponseCompression, minimum_size=Config.COMPRESSION_MIN_BYTES)
+
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +465,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so requests rejected by the other middleware are counted too
+app.add_middleware(RequestMetrics, routes=app.routes)
+
 @app.get("/")
 async def root():
     return {
@@ -34,17 +475,442 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "process_pdf": "/process-pdf",
-            "process_pdf_metadata_only": "/process-pdf-metadata-only"
+            "process_pdf_metadata_only": "/process-pdf-metadata-only",
+            "process_batch": "/process-batch",
+            "document_image": "/documents/{doc_id}/images/{image_id}",
+            "page_preview": "/documents/{doc_id}/pages/{page}/preview",
+            "jobs": "/jobs",
+            "search": "/search",
+            "ready": "/ready"
         }
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 once the extraction engine is warm in this process
+    and on every worker, 503 before. /health only reports that the process is up.
+    """
+    pool_stats = pool.stats()
+    body = {
+        "status": "ready" if startup["ready"] else "starting",
+        **startup,
+        "readyWorkers": pool_stats["readyWorkers"],
+        "workers": pool_stats["workers"],
+        "warmupError": pool_stats["warmupError"]
+    }
+    if not startup["ready"]:
+        return FastJSONResponse(body, status_code=503, headers={"Retry-After": "1"})
+    return body
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "PDF Processor API"}
+    return {
+        "status": "healthy",
+        "service": "PDF Processor API",
+        "pool": pool.stats(),
+        "cache": result_cache.stats(),
+        "singleFlight": extractions.stats(),
+        "imageStore": image_store.stats(),
+        "previews": preview_store.stats(),
+        "jobs": await asyncio.to_thread(job_store.stats),
+        "search": await search_stats(),
+        "pageMemo": await asyncio.to_thread(page_memo.stats) if page_memo is not None else {"enabled": False}
+    }
+
+async def search_stats():
+    if search_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(search_index.stats), **search_indexer.stats()}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics in the text exposition format."""
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@contextmanager
+def pool_errors():
+    """
+    Translate pool back-pressure into HTTP errors.
+
+    A full queue becomes 429 and a closed pool 503 (both with Retry-After),
+    a timeout becomes 504.
+    """
+    try:
+        yield
+    except PoolSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+    except PoolClosed as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(pool.retry_after)})
+    except JobTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@contextmanager
+def extraction_errors(prefix="Error processing PDF"):
+    """
+    Translate extraction failures into HTTP errors.
+
+    Inputs that cannot be opened as a PDF become 422, documents over the
+    resource limits 413, other failures 500.
+    """
+    try:
+        yield
+    except HTTPException:
+        raise
+    except ResourceLimitExceeded as e:
+        count_error(e)
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPDFError as e:
+        count_error(e)
+        raise HTTPException(status_code=422, detail=str(e))
+    except PDFProcessingError as e:
+        count_error(e)
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        count_error(e)
+        raise HTTPException(status_code=500, detail=f"{prefix}: {str(e)}")
+
+async def spool(file, max_bytes=MAX_UPLOAD_BYTES):
+    """Copy an upload to a temporary file on disk, or raise 413 if it is larger than ``max_bytes``."""
+    try:
+        return await spool_upload(file, max_bytes)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def extraction_options(
+    image_format: str = Query(DEFAULT_OPTIONS.image_format, pattern="^(jpeg|png|webp|original)$",
+                              description="Output format of extracted images"),
+    image_quality: int = Query(DEFAULT_OPTIONS.image_quality, ge=1, le=100,
+                               description="JPEG/WebP quality"),
+    max_image_dimension: int = Query(DEFAULT_OPTIONS.max_image_dimension, ge=1,
+                                     description="Downscale images larger than this many pixels"),
+    thumbnails_only: bool = Query(DEFAULT_OPTIONS.thumbnails_only,
+                                  description="Return small thumbnails instead of full images"),
+    min_image_size: int = Query(DEFAULT_OPTIONS.min_image_size, ge=0,
+                                description="Skip images smaller than this many pixels"),
+    fields: str = Query(",".join(sorted(DEFAULT_OPTIONS.fields)),
+                        description="Comma separated fields: text, metadata, images, outline, links, previews"),
+    pages: str = Query(None, description="1-based page ranges to extract, e.g. 1-10,50"),
+    preview_width: int = Query(DEFAULT_OPTIONS.preview_width, ge=1,
+                               description="Width of page previews, rounded up to 128, 256, 512 or 1024 pixels")
+):
+    """Build ExtractionOptions from the request's query parameters."""
+    try:
+        return ExtractionOptions(
+            image_format=image_format,
+            image_quality=image_quality,
+            max_image_dimension=max_image_dimension,
+            thumbnails_only=thumbnails_only,
+            min_image_size=min_image_size,
+            fields=parse_fields(fields),
+            pages=parse_page_ranges(pages) if pages else None,
+            limits=LIMITS,
+            memo=page_memo,
+            preview_width=round_preview_width(preview_width)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def ndjson_line(record):
+    return dumps(record) + b"\n"
+
+def admission_cost(info, chunk_pages, min_pages):
+    """
+    Return the pool capacity a document is admitted with, from its pre-flight estimate.
+
+    A chunked document keeps up to PARALLEL_MAX_WORKERS jobs in flight, and
+    every ADMISSION_PIXELS_PER_JOB declared image pixels weigh as much as one
+    more job, so a few heavy documents fill the pool and further requests get
+    429 instead of pushing the workers out of memory.
+    """
+    cost = info["cost"]
+    jobs = 1
+    if cost["pages"] >= min_pages:
+        jobs = min(math.ceil(cost["pages"] / max(1, chunk_pages)), max(1, Config.PARALLEL_MAX_WORKERS))
+    if Config.ADMISSION_PIXELS_PER_JOB > 0:
+        jobs += cost["imagePixels"] // Config.ADMISSION_PIXELS_PER_JOB
+    return max(1, min(jobs, pool.capacity))
+
+async def preflight(upload, options, timings=None):
+    """
+    Run the pre-flight estimate (extract_document_info) of an upload on the worker pool.
+
+    Opening a document can mean repairing a damaged or hostile file, and
+    PyMuPDF holds the GIL while it does, so this never runs in the API
+    process. The job is admitted like any other, with a cost of one.
+    """
+    executor = pool if timings is None else TimedExecutor(pool, timings)
+    with pool_errors(), pool.admit():
+        return await asyncio.wrap_future(executor.submit(extract_document_info, upload.path, options))
+
+async def stream_pdf_records(upload, options, image_mode, timings=None):
+    """
+    Build an NDJSON response that streams the extraction page by page.
+
+    Records are sent in this order:
+    - {"type": "metadata", "metadata": {...}} as soon as the document is opened,
+      with the outline if it was requested
+    - {"type": "page", "page": n, "text": "...", "images": [...]} per selected
+      page, with the requested page fields; images only holds images not sent
+      with an earlier page
+    - {"type": "summary", ...} with totals once every page is done
+    Failures after the response has started are sent as {"type": "error", ...}.
+    With image_mode="ref" images are descriptors and the metadata record
+    carries the documentId needed to fetch them. When ``timings`` is given
+    the summary carries the stage timings as well.
+
+    The response takes ownership of the spooled upload and deletes it when
+    the stream ends. The pre-flight runs before the response starts, so
+    documents over the resource limits still fail with 413.
+    """
+    doc_id = upload.digest
+    resources = ExitStack()
+    resources.callback(upload.close)
+    try:
+        info = await preflight(upload, options, timings)
+        with pool_errors():
+            resources.enter_context(pool.admit(cost=admission_cost(info, Config.STREAM_CHUNK_PAGES, 0)))
+    except Exception:
+        resources.close()
+        raise
+
+    executor = pool if timings is None else TimedExecutor(pool, timings)
+
+    async def records():
+        indexed_text = None
+        indexing = False
+        try:
+            metadata = info["metadata"]
+            record = {"type": "metadata", "metadata": metadata}
+            if "outline" in info:
+                record["outline"] = info["outline"]
+            if image_mode == "ref":
+                record["documentId"] = doc_id
+            yield ndjson_line(record)
+
+            page_count = 0
+            pages_reused = 0
+            image_count = 0
+            preview_count = 0
+            character_count = 0
+            # Text for the search index, unless only some pages are extracted; it
+            # goes to a temporary file, so memory does not grow with the document
+            if search_indexer is not None and options.pages is None and "text" in options.fields:
+                indexed_text = SpooledPageText()
+            chunks = iter_pages_parallel(
+                upload.path,
+                info["pageIndexes"],
+                executor,
+                chunk_pages=Config.STREAM_CHUNK_PAGES,
+                max_workers=Config.PARALLEL_MAX_WORKERS,
+                options=options,
+                deadline=options.limits.deadline()
+            )
+            pages = limit_output(chunks, options)
+            try:
+                while True:
+                    # Chunks are awaited in a thread to keep the event loop free
+                    page = await asyncio.to_thread(next, pages, None)
+                    if page is None:
+                        break
+                    page_count += 1
+                    pages_reused += page.reused
+                    character_count += len(page.text or "")
+                    if indexed_text is not None:
+                        indexed_text.append(page.number, page.text)
+                    if page.images is not None:
+                        image_count += len(page.images)
+                        if image_mode == "ref":
+                            image_store.put_images(doc_id, page.images)
+                    if page.preview is not None:
+                        preview_count += 1
+                        await asyncio.to_thread(preview_store.put, doc_id, page.number, options.preview_width,
+                                                page.preview.data)
+                    yield ndjson_line({"type": "page", **page.to_dict(image_mode)})
+            finally:
+                try:
+                    pages.close()
+                    chunks.close()
+                except ValueError:
+                    pass  # still running in a worker thread; its chunks finish on their own
+
+            summary = {
+                "type": "summary",
+                "pageCount": metadata["pageCount"],
+                "pagesExtracted": page_count,
+                "imageCount": image_count,
+                "characterCount": character_count
+            }
+            if options.memo is not None:
+                summary["pageReuse"] = {"reused": pages_reused, "extracted": page_count - pages_reused}
+            count_extraction(page_count, image_count, preview_count, pages_reused)
+            if timings is not None:
+                record_timings(timings)
+                summary["timings"] = timings.to_dict()
+            if indexed_text is not None:
+                # The indexer reads the pages back and deletes the file
+                indexing = index_pages(doc_id, indexed_text, metadata)
+            yield ndjson_line(summary)
+        except Exception as e:
+            count_error(e)
+            yield ndjson_line({"type": "error", "error": str(e)})
+        finally:
+            if indexed_text is not None and not indexing:
+                indexed_text.close()
+            resources.close()
+
+    # The background task releases the admission slot and temp file even if
+    # the client disconnects before the stream starts
+    return StreamingResponse(records(), media_type=NDJSON_MEDIA_TYPE,
+                             background=BackgroundTask(resources.close))
+
+def result_cache_key(upload, options, image_mode, output_format="json"):
+    return result_key(upload.digest, options, image_mode, output_format)
+
+def cached_result(cache_key, doc_id, image_mode, output_format="json", options=DEFAULT_OPTIONS):
+    """
+    Return cached result bytes, or None.
+
+    By-reference results are only reused while their images are still in
+    the image store. Results the search index takes (see index_result) are
+    only reused while the index holds the document: cached bytes have no
+    page boundaries, so a document missing from a purged or rebuilt index is
+    extracted again to be indexed.
+    """
+    if (search_indexer is not None and options.pages is None and "text" in options.fields
+            and not search_indexer.has_document(doc_id)):
+        return None
+    with stage("cache"):
+        cached = result_cache.get(cache_key)
+    if cached is not None and (image_mode == "inline" or image_store.has_all(
+            doc_id, loads_as(cached, output_format).get("images", []))):
+        return cached
+    return None
+
+def index_pages(doc_id, pages, metadata):
+    """
+    Queue the per-page text of a whole document for the search index, if it
+    is enabled; returns False if it was not queued.
+    """
+    if search_indexer is None:
+        return False
+    return search_indexer.submit(doc_id, pages, (metadata or {}).get("title") or None)
+
+def index_result(doc_id, result):
+    """Queue the text of a DocumentResult for the search index; page selections are not indexed."""
+    if search_indexer is not None and result.page_offsets and result.pages is None:
+        # Only the text is kept alive until it is indexed, not the images
+        text_only = DocumentResult(text=result.text, page_offsets=result.page_offsets)
+        index_pages(doc_id, text_only.iter_page_text(), result.metadata)
+
+def keep_preview_source(upload, options):
+    """Keep the PDF of a request for previews, so pages it did not preview can be rendered on demand."""
+    if "previews" in options.fields:
+        preview_store.keep_source(upload.digest, upload.path)
+
+def serialize_result(result, doc_id, cache_key, options, image_mode, output_format="json"):
+    """
+    Serialize a DocumentResult once and cache the bytes; ref mode stores the images first.
+
+    Page previews always go to the preview store, so /documents/{id}/pages/{n}/preview
+    serves them without rendering them again. The text is handed to the
+    search index, which indexes it in the background.
+    """
+    index_result(doc_id, result)
+    preview_store.put_previews(doc_id, result.previews, options.preview_width)
+    if image_mode == "ref":
+        image_store.put_images(doc_id, result.images)
+        result.document_id = doc_id
+    with stage("serialize"):
+        body = result.to_bytes(output_format, image_mode)
+    result_cache.put(cache_key, body)
+    return body
+
+async def extract_json(upload, options, image_mode="inline", timings=None, output_format="json"):
+    """
+    Return the extraction result for a spooled upload as JSON bytes, or in
+    another ``output_format`` from serialization.available_formats().
+
+    Results come from the cache when possible. Otherwise the PDF is processed
+    on the worker pool, with large documents split into page chunks, unless
+    an identical request (same content, options and format) is already being
+    processed: then this request waits for that extraction and shares its
+    result. Raises PDFProcessingError (or InvalidPDFError) when the
+    extraction fails. Stages are recorded into ``timings`` if given,
+    including those run in worker processes; a request that joined another
+    one's extraction only records the "coalesced" wait.
+    """
+    # Threads started by asyncio.to_thread inherit the recording context
+    with recording(timings):
+        cache_key = result_cache_key(upload, options, image_mode, output_format)
+        cached = await asyncio.to_thread(cached_result, cache_key, upload.digest, image_mode, output_format,
+                                         options)
+        if cached is not None:
+            return cached
+        # The shared extraction takes over the spooled file, so it outlives this request
+        return await extractions.run(cache_key, lambda: extract_and_serialize(
+            upload.detach(), options, image_mode, timings, output_format, cache_key))
+
+async def extract_and_serialize(upload, options, image_mode, timings, output_format, cache_key):
+    """Extract a spooled upload on the pool, serialize and cache the result; deletes the upload when done."""
+    with upload:
+        # The pre-flight estimate decides how much of the pool the document
+        # is admitted with, and rejects documents over the limits
+        info = await preflight(upload, options, timings)
+        cost = admission_cost(info, Config.PARALLEL_CHUNK_PAGES, Config.PARALLEL_MIN_PAGES)
+        
+        # Workers open the spooled file by path; the merge runs in a thread to
+        # keep the event loop free
+        with pool_errors(), pool.admit(cost=cost):
+            result = await asyncio.to_thread(
+                extract_document_parallel,
+                upload.path,
+                executor=pool if timings is None else TimedExecutor(pool, timings),
+                chunk_pages=Config.PARALLEL_CHUNK_PAGES,
+                max_workers=Config.PARALLEL_MAX_WORKERS,
+                min_pages=Config.PARALLEL_MIN_PAGES,
+                options=options,
+                info=info
+            )
+        count_result(result, info)
+        
+        return await asyncio.to_thread(serialize_result, result, upload.digest, cache_key, options, image_mode,
+                                       output_format)
+
+FORMAT_QUERY = Query(None, alias="format", description="Output format (json, msgpack or cbor); overrides Accept")
+
+def response_format(request, requested=None):
+    """
+    Return the output format given by ``?format=``, or else the one the
+    request's Accept header asks for (JSON if it allows none).
+
+    Raises 406 for a requested format this process cannot produce.
+    """
+    if requested is None:
+        return negotiate_format(request.headers.get("accept"))
+    if requested not in available_formats():
+        media_types = ", ".join(MEDIA_TYPES[name] for name in available_formats())
+        raise HTTPException(status_code=406, detail=f"Results are available as {media_types}")
+    return requested
+
+def vary_on_accept(response, requested=None):
+    """Mark a response whose format was chosen from the Accept header as varying with it."""
+    if requested is None:
+        response.headers.add_vary_header("Accept")
+    return response
 
 @app.post("/process-pdf")
-async def process_pdf_endpoint(file: UploadFile = File(...)):
+async def process_pdf_endpoint(request: Request, file: UploadFile = File(...), stream: bool = False,
+                               options: ExtractionOptions = Depends(extraction_options),
+                               image_mode: str = Query("inline", pattern="^(inline|ref)$"),
+                               timings: bool = Query(False, description="Report per-stage timings"),
+                               requested_format: str = FORMAT_QUERY):
     """
     Process a PDF file and extract text, metadata, and images.
     
@@ -52,74 +918,457 @@ async def process_pdf_endpoint(file: UploadFile = File(...)):
     - text: Extracted text content
     - metadata: Document metadata (title, author, page count, etc.)
     - images: Base64 encoded images found in the PDF
+    
+    Files that cannot be opened as a PDF are rejected with 422, files over
+    the maximum upload size or the resource limits (pages, image pixels,
+    output size, extraction time) with 413. The upload is spooled to disk in
+    chunks and opened by path, never held in memory as a whole.
+    
+    ``fields`` selects which of text, metadata, images, outline and links are
+    produced and ``pages`` restricts page-level work to the given page ranges.
+    With ``?stream=1`` or ``Accept: application/x-ndjson`` the result is
+    streamed as one NDJSON record per page instead (see stream_pdf_records).
+    Image output is controlled by the query parameters of extraction_options.
+    With ``image_mode=ref`` images are returned as descriptors whose bytes are
+    fetched from /documents/{documentId}/images/{id}.
+    
+    With ``?timings=1`` (or PDF_STAGE_TIMINGS set) the time spent per stage
+    is returned in a Server-Timing header, or as ``timings`` in the summary
+    record of a stream.
+
+    ``Accept: application/msgpack`` or ``application/cbor`` (or
+    ``?format=msgpack`` / ``cbor``) returns the same result as MessagePack or
+    CBOR, with inline images as raw bytes.
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
-    try:
-        # Create a temporary file to save the uploaded PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        # Process the PDF using your existing function
-        result = process_pdf(temp_file_path)
-        
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
+    streamed = stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    output_format = "json" if streamed else response_format(request, requested_format)
+    request_timings = Timings() if timings or Config.STAGE_TIMINGS else None
+    with extraction_errors():
+        upload = await spool(file)
+        await asyncio.to_thread(keep_preview_source, upload, options)
         
-        # Parse the JSON result
-        parsed_result = json.loads(result)
+        if streamed:
+            return vary_on_accept(await stream_pdf_records(upload, options, image_mode, request_timings))
         
-        # Return the result
-        return JSONResponse(content=parsed_result)
-        
-    except Exception as e:
-        # Clean up temp file if it exists
-        if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+        # The result is already serialized, so it is sent as it is
+        with upload:
+            body = await extract_json(upload, options, image_mode, request_timings, output_format)
+        response = vary_on_accept(Response(body, media_type=MEDIA_TYPES[output_format]), requested_format)
+        if request_timings is not None:
+            record_timings(request_timings)
+            response.headers["Server-Timing"] = request_timings.server_timing()
+        return response
+
+def raise_error(error):
+    raise error
+
+def batch_error_status(error):
+    """Return the HTTP status a single-file request would have failed with."""
+    if isinstance(error, InvalidPDFError):
+        return 422
+    if isinstance(error, (UploadTooLarge, ResourceLimitExceeded)):
+        return 413
+    if isinstance(error, JobTimeout):
+        return 504
+    return 500
+
+async def extract_batch_item(spool_item, options, image_mode):
+    """Spool, extract and serialize one file of a batch; returns the result bytes."""
+    upload = await asyncio.to_thread(spool_item)
+    with upload:
+        await asyncio.to_thread(keep_preview_source, upload, options)
+        cache_key = result_cache_key(upload, options, image_mode)
+        cached = await asyncio.to_thread(cached_result, cache_key, upload.digest, image_mode, "json", options)
+        if cached is not None:
+            return cached
+        return await extractions.run(cache_key, lambda: extract_batch_file(upload.detach(), options, image_mode,
+                                                                           cache_key))
+
+async def extract_batch_file(upload, options, image_mode, cache_key):
+    with upload:
+        result = await asyncio.wrap_future(pool.submit(extract_document, upload.path, options))
+        return await asyncio.to_thread(serialize_result, result, upload.digest, cache_key, options, image_mode)
+
+@app.post("/process-batch")
+async def process_batch(files: List[UploadFile] = File(...),
+                        options: ExtractionOptions = Depends(extraction_options),
+                        image_mode: str = Query("inline", pattern="^(inline|ref)$")):
+    """
+    Process many PDFs in one request, streaming each result as it finishes.
+
+    ``files`` takes several PDFs and/or ZIP archives of PDFs. Up to
+    PDF_BATCH_CONCURRENCY files are extracted at once on the worker pool and
+    the response is NDJSON, in completion order:
+    - {"type": "result", "index": i, "filename": "...", "result": {...}}
+      with the same result as /process-pdf
+    - {"type": "error", "index": i, "filename": "...", "status": 422, "error": "..."}
+      for a file that failed (not a PDF, too large, damaged...); the other
+      files are not affected
+    - {"type": "summary", "files": n, "succeeded": n, "failed": n} at the end
+    ZIP members are named by their path inside the archive.
+    """
+    resources = ExitStack()
+    items = []
+    try:
+        for file in files:
+            name = file.filename or ""
+            if name.lower().endswith('.zip'):
+                # Only the request body limits an archive; each member is limited like a single PDF
+                archive = resources.enter_context(await spool(file, BATCH_MAX_UPLOAD_BYTES))
+                try:
+                    zip_file = resources.enter_context(zipfile.ZipFile(archive.path))
+                except zipfile.BadZipFile:
+                    raise HTTPException(status_code=400, detail=f"{name} is not a valid ZIP archive")
+                items.extend(
+                    (info.filename, lambda zip_file=zip_file, info=info:
+                        spool_zip_member(zip_file, info, MAX_UPLOAD_BYTES))
+                    for info in zip_pdf_members(zip_file)
+                )
+            elif name.lower().endswith('.pdf'):
+                try:
+                    upload = resources.enter_context(await spool_upload(file, MAX_UPLOAD_BYTES))
+                    items.append((name, lambda upload=upload: upload))
+                except UploadTooLarge as e:
+                    items.append((name, lambda error=e: raise_error(error)))
+            else:
+                error = InvalidPDFError("File must be a PDF or a ZIP of PDFs")
+                items.append((name, lambda error=error: raise_error(error)))
+            if len(items) > Config.BATCH_MAX_FILES:
+                raise HTTPException(status_code=413,
+                                    detail=f"A batch may contain at most {Config.BATCH_MAX_FILES} PDFs")
         
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+        # The whole batch is admitted once, weighted by the jobs it keeps in flight
+        concurrency = max(1, Config.BATCH_CONCURRENCY)
+        with pool_errors():
+            resources.enter_context(pool.admit(cost=min(concurrency, pool.capacity)))
+    except BaseException:
+        resources.close()
+        raise
+
+    async def records():
+        running = {}
+        pending = iter(enumerate(items))
+        succeeded = failed = 0
+        try:
+            while True:
+                while len(running) < concurrency:
+                    item = next(pending, None)
+                    if item is None:
+                        break
+                    index, (filename, spool_item) = item
+                    task = asyncio.ensure_future(extract_batch_item(spool_item, options, image_mode))
+                    running[task] = (index, filename)
+                if not running:
+                    break
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, filename = running.pop(task)
+                    try:
+                        body = task.result()
+                    except Exception as e:
+                        failed += 1
+                        count_error(e)
+                        yield ndjson_line({"type": "error", "index": index, "filename": filename,
+                                           "status": batch_error_status(e), "error": str(e)})
+                    else:
+                        # The result is already serialized, so it is spliced in as it is
+                        succeeded += 1
+                        yield (b'{"type":"result","index":' + dumps(index)
+                               + b',"filename":' + dumps(filename)
+                               + b',"result":' + body + b'}\n')
+            
+            yield ndjson_line({"type": "summary", "files": len(items),
+                               "succeeded": succeeded, "failed": failed})
+        finally:
+            for task in running:
+                task.cancel()
+            resources.close()
+
+    # The background task releases the admission slot and spooled files even
+    # if the client disconnects before the stream starts
+    return StreamingResponse(records(), media_type=NDJSON_MEDIA_TYPE,
+                             background=BackgroundTask(resources.close))
+
+@app.get("/documents/{doc_id}/images/{image_id}")
+async def get_document_image(doc_id: str, image_id: str, request: Request):
+    """
+    Return the bytes of an image extracted with image_mode=ref.
+
+    Image ids are derived from the image bytes, so they double as strong
+    ETags and responses can be cached indefinitely.
+    """
+    entry = image_store.get(doc_id, image_id) if is_digest(doc_id) else None
+    if entry is None:
+        raise HTTPException(status_code=404,
+                            detail="Image not found; process the document again with image_mode=ref")
+    
+    data, media_type = entry
+    etag = f'"{image_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=media_type, headers=headers)
+
+@app.get("/documents/{doc_id}/pages/{page}/preview")
+async def get_page_preview(doc_id: str, page: int, request: Request,
+                           width: int = Query(DEFAULT_OPTIONS.preview_width, ge=1,
+                                              description="Preview width, rounded up to 128, 256, 512 or 1024")):
+    """
+    Return a low-resolution JPEG of a page (1-based) of a processed document.
+
+    Previews rendered during an extraction with the ``previews`` field are
+    served from the preview store. Other pages and widths are rendered on
+    demand on the worker pool, as long as the store still holds the PDF of
+    a request that asked for previews. Responses are addressed by the
+    document's content, so they can be cached indefinitely.
+    """
+    if not is_digest(doc_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    if page < 1:
+        raise HTTPException(status_code=404, detail="Page not found")
+    width = round_preview_width(width)
+    etag = f'"{doc_id}-{page}-{width}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    data = await asyncio.to_thread(preview_store.get, doc_id, page, width)
+    if data is None:
+        source = await asyncio.to_thread(preview_store.source_path, doc_id)
+        if source is None:
+            raise HTTPException(status_code=404,
+                                detail="Preview not found; process the document again with the previews field")
+        # Counts against the pool's capacity like an extraction, so clients get 429 when it is full
+        with extraction_errors("Error rendering preview"), pool_errors(), pool.admit():
+            try:
+                preview = await asyncio.wrap_future(pool.submit(render_page_preview, source, page, width))
+            except IndexError:
+                raise HTTPException(status_code=404, detail="Page not found")
+        data = preview.data
+        await asyncio.to_thread(preview_store.put, doc_id, page, width, data)
+    return Response(content=data, media_type="image/jpeg", headers=headers)
+
+def admit_job(job_id, resources, cost):
+    """
+    Enter ``pool.admit(cost)`` on the ExitStack ``resources``, waiting while
+    the pool is full; returns False if the job is cancelled first.
+    """
+    while not job_store.is_cancelled(job_id):
+        try:
+            resources.enter_context(pool.admit(cost=cost))
+            return True
+        except PoolSaturated as e:
+            time.sleep(e.retry_after)
+    return False
+
+def run_job(job_id, upload, options, image_mode, cache_key):
+    """
+    Run an extraction job on the worker pool, recording progress in the job store.
+
+    Jobs wait for room in the pool instead of being rejected, and always
+    use page chunks so progress advances and cancellation takes effect
+    between pages. Owns ``upload`` and deletes it when done.
+    """
+    last_update = 0
+
+    def progress(done, total):
+        nonlocal last_update
+        # Throttle database writes for documents with many pages
+        now = time.monotonic()
+        if done in (0, total) or now - last_update >= JOB_PROGRESS_INTERVAL_SECONDS:
+            last_update = now
+            job_store.set_progress(job_id, done, total)
+
+    with upload, ExitStack() as admission:
+        try:
+            # The pre-flight runs on the pool as well, admitted as a job of its own
+            with ExitStack() as preflight_admission:
+                if not admit_job(job_id, preflight_admission, 1):
+                    return  # cancelled while queued
+                info = pool.submit(extract_document_info, upload.path, options).result()
+            cost = admission_cost(info, Config.PARALLEL_CHUNK_PAGES, 0)
+            if not admit_job(job_id, admission, cost) or not job_store.start(job_id):
+                return  # cancelled while queued
+
+            result = extract_document_parallel(
+                upload.path,
+                executor=pool,
+                chunk_pages=Config.PARALLEL_CHUNK_PAGES,
+                max_workers=Config.PARALLEL_MAX_WORKERS,
+                min_pages=0,
+                options=options,
+                progress=progress,
+                cancel_path=job_store.cancel_path(job_id),
+                info=info
+            )
+            count_result(result, info)
+            job_store.complete(job_id, serialize_result(result, upload.digest, cache_key, options, image_mode))
+        except ExtractionCancelled:
+            pass  # the job store already records the cancellation
+        except Exception as e:
+            count_error(e)
+            job_store.fail(job_id, str(e) or type(e).__name__)
+
+def complete_cached_job(job_id, cached):
+    """
+    Complete a job with a result from the cache. Its progress shows the
+    pages of the result, taken from the page selection or the metadata.
+    """
+    result = loads_as(cached)
+    pages = result.get("pages")
+    page_count = len(pages) if pages is not None else (result.get("metadata") or {}).get("pageCount")
+    job_store.complete(job_id, cached, page_count)
+
+def job_resource(job):
+    """Return the public JSON representation of a job."""
+    resource = {
+        "id": job["id"],
+        "status": job["status"],
+        "createdAt": job["created_at"],
+        "updatedAt": job["updated_at"],
+        "finishedAt": job["finished_at"],
+        "pageCount": job["page_count"],
+        "pagesProcessed": job["pages_processed"]
+    }
+    if job["error"]:
+        resource["error"] = job["error"]
+    if job["finished_at"] is not None:
+        resource["expiresAt"] = job["finished_at"] + job_store.ttl_seconds
+    if job["status"] == COMPLETED:
+        resource["resultUrl"] = f"/jobs/{job['id']}/result"
+    return resource
+
+async def get_job_or_404(job_id):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.post("/jobs", status_code=202)
+async def create_job(response: Response, file: UploadFile = File(...),
+                     options: ExtractionOptions = Depends(extraction_options),
+                     image_mode: str = Query("inline", pattern="^(inline|ref)$")):
+    """
+    Start an extraction in the background and return its job right away.
+
+    Takes the same parameters as /process-pdf. Poll ``GET /jobs/{id}`` for
+    status and progress, then fetch ``GET /jobs/{id}/result``. Results are
+    kept for PDF_JOB_TTL_SECONDS after the job finishes.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    
+    upload = await spool(file)
+    try:
+        await asyncio.to_thread(keep_preview_source, upload, options)
+        cache_key = result_cache_key(upload, options, image_mode)
+        job = await asyncio.to_thread(job_store.create)
+        cached = await asyncio.to_thread(cached_result, cache_key, upload.digest, image_mode, "json", options)
+        if cached is not None:
+            upload.close()
+            await asyncio.to_thread(complete_cached_job, job["id"], cached)
+        else:
+            job_runner.submit(run_job, job["id"], upload, options, image_mode, cache_key)
+    except Exception:
+        upload.close()
+        raise
+    
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return job_resource(await get_job_or_404(job["id"]))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Return a job's status and progress (pagesProcessed out of pageCount)."""
+    return job_resource(await get_job_or_404(job_id))
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Return the result of a completed job; 409 while it is not completed."""
+    job = await get_job_or_404(job_id)
+    if job["status"] != COMPLETED:
+        detail = f"Job is {job['status']}"
+        if job["error"]:
+            detail += f": {job['error']}"
+        raise HTTPException(status_code=409, detail=detail)
+    
+    path = job_store.result_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return FileResponse(path, media_type="application/json")
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """
+    Cancel a queued or running job, or delete a finished one and its result.
+
+    Running extractions stop at the next page.
+    """
+    job = await get_job_or_404(job_id)
+    if job["status"] in ACTIVE_STATUSES:
+        return job_resource(await asyncio.to_thread(job_store.cancel, job_id))
+    await asyncio.to_thread(job_store.delete, job_id)
+    return Response(status_code=204)
+
+def get_search_index():
+    if search_index is None:
+        raise HTTPException(status_code=404, detail="The search index is disabled; set PDF_SEARCH_INDEX=1")
+    return search_index
+
+@app.get("/search")
+async def search(q: str = Query(..., min_length=1, description="Words to find; end a word with * to match a prefix"),
+                 limit: int = Query(20, ge=1, le=100),
+                 offset: int = Query(0, ge=0),
+                 document_id: str = Query(None, description="Only search this document")):
+    """
+    Search the text of every document processed while the index was enabled.
+
+    Every word must occur on a page for it to match. Hits are pages, best
+    first, with the document id (the SHA-256 of the PDF, as in image_mode=ref),
+    page number and a snippet with the matches in brackets. Documents are
+    indexed in the background, so a document can take a moment to appear.
+    """
+    index = get_search_index()
+    start = time.perf_counter()
+    hits = await asyncio.to_thread(index.search, q, limit, offset, document_id)
+    return {
+        "query": q,
+        "limit": limit,
+        "offset": offset,
+        "tookMs": round((time.perf_counter() - start) * 1000, 2),
+        "results": hits
+    }
+
+@app.delete("/search/documents/{doc_id}")
+async def delete_search_document(doc_id: str):
+    """Remove a document from the search index."""
+    index = get_search_index()
+    if not await asyncio.to_thread(index.delete_document, doc_id):
+        raise HTTPException(status_code=404, detail="Document is not in the search index")
+    return Response(status_code=204)
 
 @app.post("/process-pdf-metadata-only")
-async def process_pdf_metadata_only(file: UploadFile = File(...)):
+async def process_pdf_metadata_only(request: Request, file: UploadFile = File(...),
+                                    requested_format: str = FORMAT_QUERY):
     """
     Process a PDF file and extract only metadata (faster processing).
     
+    Equivalent to ``/process-pdf?fields=metadata``; no page is loaded.
+    
     Returns:
     - metadata: Document metadata (title, author, page count, etc.)
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
-    try:
-        import fitz
-        
-        # Read the PDF content
-        content = await file.read()
-        doc = fitz.open(stream=content, filetype="pdf")
-        
-        # Extract only metadata
-        metadata = doc.metadata
-        result = {
-            "metadata": {
-                "pageCount": len(doc),
-                "title": metadata.get("title", ""),
-                "author": metadata.get("author", ""),
-                "subject": metadata.get("subject", ""),
-                "creator": metadata.get("creator", ""),
-                "producer": metadata.get("producer", ""),
-                "creationDate": metadata.get("creationDate", ""),
-                "modificationDate": metadata.get("modDate", "")
-            }
-        }
-        
-        doc.close()
-        return JSONResponse(content=result)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing PDF metadata: {str(e)}")
+    output_format = response_format(request, requested_format)
+    options = ExtractionOptions(fields=frozenset(("metadata",)), limits=LIMITS)
+    with extraction_errors("Error processing PDF metadata"), await spool(file) as upload:
+        body = await extract_json(upload, options, output_format=output_format)
+    return vary_on_accept(Response(body, media_type=MEDIA_TYPES[output_format]), requested_format)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,138 @@
+"""
+Synthetic PDF corpus for the benchmarks.
+
+Documents are generated with PyMuPDF from a seed, so the same spec always
+produces the same file and results are comparable between commits.
+
+    python -m benchmarks.corpus out.pdf --pages 100 --images-per-page 2 --image-format png
+"""
+import argparse
+import os
+import random
+from dataclasses import dataclass, asdict
+from io import BytesIO
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure "
+    "in reprehenderit voluptate velit esse cillum fugiat nulla pariatur excepteur sint"
+).split()
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    """
+    Shape of a synthetic document.
+
+    Args:
+        pages: Number of pages
+        lines_per_page: Lines of text per page (0 for none)
+        words_per_line: Words per line of text
+        images_per_page: Images placed on every page
+        image_format: "jpeg" (stored as DCTDecode) or "png" (stored as FlateDecode)
+        image_size: Width and height of each image in pixels
+        duplicate_ratio: Fraction of image placements that repeat an earlier
+            image's bytes under a new xref, exercising hash de-duplication
+        seed: Random seed
+    """
+    pages: int = 10
+    lines_per_page: int = 40
+    words_per_line: int = 12
+    images_per_page: int = 0
+    image_format: str = "jpeg"
+    image_size: int = 512
+    duplicate_ratio: float = 0.0
+    seed: int = 0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def make_image(rng, size, image_format):
+    """Return encoded bytes of a noisy image that does not compress to nothing."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x0, y0 = rng.randrange(size), rng.randrange(size)
+        x1, y1 = x0 + rng.randrange(1, size // 2), y0 + rng.randrange(1, size // 2)
+        draw.rectangle((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+    # Pixel noise keeps both JPEG and Flate streams realistically large
+    noise = Image.frombytes("L", (size, size), rng.randbytes(size * size))
+    image = Image.blend(image, Image.merge("RGB", (noise, noise, noise)), 0.2)
+
+    buffered = BytesIO()
+    if image_format == "jpeg":
+        image.save(buffered, format="JPEG", quality=85)
+    else:
+        image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def generate(path, spec):
+    """Write a PDF shaped by spec to path and return its size in bytes."""
+    import fitz  # PyMuPDF
+
+    rng = random.Random(spec.seed)
+    doc = fitz.open()
+    doc.set_metadata({"title": f"Benchmark corpus {spec.pages}p", "author": "benchmarks"})
+    images = []
+    try:
+        for page_number in range(spec.pages):
+            page = doc.new_page()
+            width, height = page.rect.width, page.rect.height
+
+            if spec.lines_per_page:
+                line_height = (height - 72) / spec.lines_per_page
+                for line in range(spec.lines_per_page):
+                    words = " ".join(rng.choice(WORDS) for _ in range(spec.words_per_line))
+                    page.insert_text((36, 36 + line * line_height), words, fontsize=min(10, line_height * 0.8))
+
+            cell = (width - 72) / max(1, spec.images_per_page)
+            for slot in range(spec.images_per_page):
+                if images and rng.random() < spec.duplicate_ratio:
+                    data = rng.choice(images)
+                else:
+                    data = make_image(rng, spec.image_size, spec.image_format)
+                    images.append(data)
+                rect = fitz.Rect(36 + slot * cell, height / 2, 36 + (slot + 1) * cell - 4, height / 2 + cell)
+                page.insert_image(rect, stream=data)
+
+        doc.save(path, garbage=0, deflate=True)
+    finally:
+        doc.close()
+    return os.path.getsize(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF for benchmarking.")
+    parser.add_argument("output", help="Path of the PDF to write")
+    defaults = CorpusSpec()
+    parser.add_argument("--pages", type=int, default=defaults.pages)
+    parser.add_argument("--lines-per-page", type=int, default=defaults.lines_per_page)
+    parser.add_argument("--words-per-line", type=int, default=defaults.words_per_line)
+    parser.add_argument("--images-per-page", type=int, default=defaults.images_per_page)
+    parser.add_argument("--image-format", choices=("jpeg", "png"), default=defaults.image_format)
+    parser.add_argument("--image-size", type=int, default=defaults.image_size)
+    parser.add_argument("--duplicate-ratio", type=float, default=defaults.duplicate_ratio)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+
+    spec = CorpusSpec(
+        pages=args.pages,
+        lines_per_page=args.lines_per_page,
+        words_per_line=args.words_per_line,
+        images_per_page=args.images_per_page,
+        image_format=args.image_format,
+        image_size=args.image_size,
+        duplicate_ratio=args.duplicate_ratio,
+        seed=args.seed
+    )
+    size = generate(args.output, spec)
+    print(f"Wrote {args.output} ({size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
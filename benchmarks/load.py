@@ -0,0 +1,360 @@
+"""
+Load test of the HTTP API.
+
+Starts api_server with uvicorn on localhost (or targets a running server with
+--url), then drives it at each concurrency level of a sweep with a weighted
+mix of synthetic documents across /process-pdf and /process-pdf-metadata-only.
+Every level reports throughput, latency percentiles, error rate and the peak
+RSS of the server process and its workers, as JSON:
+
+    python -m benchmarks.load --concurrency 1,2,4,8 --duration 30 --output load.json
+    python -m benchmarks.load --server-env PDF_WORKER_COUNT=2 --mix small:8,large:1
+
+Every upload gets a unique trailing PDF comment, so it misses the result
+cache and is not coalesced with another one; pass --cache to send identical
+files instead.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import requests  # noqa: E402
+
+from benchmarks.corpus import CorpusSpec, generate  # noqa: E402
+from benchmarks.run import corpus_path, environment, git_info  # noqa: E402
+
+RESULT_FORMAT_VERSION = 1
+
+DOCUMENTS = {
+    "small": CorpusSpec(pages=2, lines_per_page=30),
+    "medium": CorpusSpec(pages=20, lines_per_page=30, images_per_page=1, image_size=512),
+    "large": CorpusSpec(pages=200, lines_per_page=40, images_per_page=1, image_size=256, duplicate_ratio=0.5),
+}
+
+ENDPOINTS = {
+    "full": "/process-pdf",
+    "metadata": "/process-pdf-metadata-only",
+}
+
+RSS_SAMPLE_SECONDS = 0.2
+
+# Numbers the unique uploads across every level of a run
+_upload_numbers = itertools.count()
+
+
+def parse_weights(spec, choices):
+    """Parse "name:weight,..." into a dict, checking the names against ``choices``."""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition(":")
+        if name not in choices:
+            raise ValueError(f"Unknown name {name!r}; choose from {', '.join(sorted(choices))}")
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError(f"No positive weights in {spec!r}")
+    return weights
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list, or None if it is empty."""
+    if not sorted_values:
+        return None
+    # The rank is rounded first so float error (0.07 * 100 == 7.000000000000001)
+    # does not push an exact rank up by one
+    rank = max(1, math.ceil(round(fraction * len(sorted_values), 9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(latencies):
+    values = sorted(latencies)
+    return {
+        "mean": round(sum(values) / len(values) * 1000, 2) if values else None,
+        "p50": round(percentile(values, 0.50) * 1000, 2) if values else None,
+        "p95": round(percentile(values, 0.95) * 1000, 2) if values else None,
+        "p99": round(percentile(values, 0.99) * 1000, 2) if values else None,
+        "max": round(values[-1] * 1000, 2) if values else None,
+    }
+
+
+def process_tree_rss_mb(pid):
+    """RSS of a process and all of its descendants in MB (Linux), or None."""
+    total = 0
+    pids = [pid]
+    try:
+        while pids:
+            current = pids.pop()
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        if not total:
+            return None
+    return total / 1024
+
+
+class RssSampler:
+    """Samples the server's RSS in the background and keeps the peak."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            rss = process_tree_rss_mb(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            if self._stop.wait(RSS_SAMPLE_SECONDS):
+                break
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, server_env, timeout):
+    """Start api_server under uvicorn and wait until /ready answers 200; returns the process."""
+    env = {**os.environ, **server_env}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if requests.get(f"{url}/ready", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"Server was not ready within {timeout:g}s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def request_plan(documents, endpoints, seed):
+    """Yield an endless, reproducible sequence of (document, endpoint) pairs drawn by weight."""
+    rng = random.Random(seed)
+    document_names, document_weights = zip(*documents.items())
+    endpoint_names, endpoint_weights = zip(*endpoints.items())
+    while True:
+        yield (rng.choices(document_names, document_weights)[0],
+               rng.choices(endpoint_names, endpoint_weights)[0])
+
+
+def run_level(url, concurrency, duration, max_requests, plan, files, unique, server_pid, timeout):
+    """
+    Keep ``concurrency`` requests in flight for ``duration`` seconds (or
+    ``max_requests`` requests) and summarize them.
+    """
+    lock = threading.Lock()
+    records = []
+    counter = itertools.count()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                number = next(counter)
+                if time.perf_counter() >= stop_at or (max_requests and number >= max_requests):
+                    return
+                document, endpoint = next(plan)
+                upload_number = next(_upload_numbers)
+            body = files[document]
+            if unique:
+                # Bytes after %%EOF are ignored by PDF readers but change the content hash
+                body += f"\n% load-test {os.getpid()} {upload_number}\n".encode()
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{url}{ENDPOINTS[endpoint]}", timeout=timeout,
+                                        files={"file": (f"{document}.pdf", body, "application/pdf")})
+                status = response.status_code
+                size = len(response.content)
+            except requests.RequestException as e:
+                status, size = type(e).__name__, 0
+            elapsed = time.perf_counter() - start
+            with lock:
+                records.append((document, endpoint, status, elapsed, size))
+
+    started = time.perf_counter()
+    with RssSampler(server_pid) if server_pid else nullcontext() as sampler:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in range(concurrency):
+                executor.submit(worker)
+    seconds = time.perf_counter() - started
+
+    ok = [record for record in records if record[2] == 200]
+    statuses = {}
+    for record in records:
+        statuses[str(record[2])] = statuses.get(str(record[2]), 0) + 1
+    by_endpoint = {}
+    for name in ENDPOINTS:
+        latencies = [record[3] for record in ok if record[1] == name]
+        if latencies:
+            by_endpoint[name] = {"requests": len(latencies), "latencyMs": latency_summary(latencies)}
+    by_document = {}
+    for name in files:
+        latencies = [record[3] for record in ok if record[0] == name]
+        if latencies:
+            by_document[name] = {"requests": len(latencies), "latencyMs": latency_summary(latencies)}
+    return {
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "errorRate": round((len(records) - len(ok)) / len(records), 4) if records else None,
+        "statuses": statuses,
+        "throughput": round(len(ok) / seconds, 2) if seconds else None,
+        "responseMbPerSecond": round(sum(record[4] for record in ok) / seconds / (1024 * 1024), 2),
+        "latencyMs": latency_summary([record[3] for record in ok]),
+        "endpoints": by_endpoint,
+        "documents": by_document,
+        "serverPeakRssMb": round(sampler.peak, 1) if sampler and sampler.peak else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the PDF Processor API.")
+    parser.add_argument("--url", help="Test a running server instead of starting one (no RSS is reported)")
+    parser.add_argument("--concurrency", default="1,2,4,8",
+                        help="Comma separated concurrency levels of the sweep")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per concurrency level")
+    parser.add_argument("--requests", type=int, help="Stop a level after this many requests")
+    parser.add_argument("--warmup", type=int, default=2, help="Requests sent before the sweep starts")
+    parser.add_argument("--mix", default="small:6,medium:3,large:1",
+                        help=f"Weighted documents, out of {', '.join(DOCUMENTS)}")
+    parser.add_argument("--endpoints", default="full:3,metadata:1",
+                        help="Weighted endpoints: full (/process-pdf), metadata (/process-pdf-metadata-only)")
+    parser.add_argument("--cache", action="store_true", help="Send identical files, so results can be cached")
+    parser.add_argument("--server-env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Environment of the started server, e.g. PDF_WORKER_COUNT=2 (repeatable)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds per request")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the request mix")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "pdf-processor-bench"),
+                        help="Where generated PDFs are kept between runs")
+    args = parser.parse_args(argv)
+
+    try:
+        levels = [int(level) for level in args.concurrency.split(",")]
+        documents = parse_weights(args.mix, DOCUMENTS)
+        endpoints = parse_weights(args.endpoints, ENDPOINTS)
+        server_env = dict(item.split("=", 1) for item in args.server_env)
+    except ValueError as e:
+        parser.error(str(e))
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    files = {}
+    for name in documents:
+        path = corpus_path(args.corpus_dir, name, DOCUMENTS[name])
+        if not os.path.exists(path):
+            print(f"Generating {name} document...", file=sys.stderr)
+            generate(path, DOCUMENTS[name])
+        with open(path, "rb") as f:
+            files[name] = f.read()
+
+    process = None
+    cache_dir = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        # A private cache directory keeps earlier runs from answering requests
+        cache_dir = tempfile.TemporaryDirectory(prefix="pdf-load-")
+        server_env = {"PDF_CACHE_DIR": cache_dir.name, **server_env}
+        port = free_port()
+        print(f"Starting server on port {port}...", file=sys.stderr)
+        started = time.perf_counter()
+        process = start_server(port, server_env, timeout=120)
+        print(f"  ready after {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        url = f"http://127.0.0.1:{port}"
+
+    results = {
+        "version": RESULT_FORMAT_VERSION,
+        "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_info(),
+        "environment": environment(),
+        "url": args.url,
+        "serverEnv": server_env if process else None,
+        "mix": documents,
+        "endpoints": endpoints,
+        "documents": {name: {"bytes": len(files[name]), "spec": DOCUMENTS[name].to_dict()} for name in files},
+        "duration": args.duration,
+        "uniqueUploads": not args.cache,
+        "levels": []
+    }
+    try:
+        plan = request_plan(documents, endpoints, args.seed)
+        if args.warmup:
+            run_level(url, 1, float("inf"), args.warmup, plan, files, not args.cache, None, args.timeout)
+        results["serverIdleRssMb"] = round(process_tree_rss_mb(process.pid), 1) if process else None
+        for concurrency in levels:
+            print(f"Concurrency {concurrency}...", file=sys.stderr)
+            level = run_level(url, concurrency, args.duration, args.requests, plan, files, not args.cache,
+                              process.pid if process else None, args.timeout)
+            results["levels"].append(level)
+            latency = level["latencyMs"]
+            print(f"  {level['requests']} requests, {level['throughput']} req/s, p50 {latency['p50']} ms, "
+                  f"p95 {latency['p95']} ms, p99 {latency['p99']} ms, {level['errors']} errors, "
+                  f"server RSS {level['serverPeakRssMb']} MB", file=sys.stderr)
+    finally:
+        if process is not None:
+            stop_server(process)
+        if cache_dir is not None:
+            cache_dir.cleanup()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""
+Benchmarks for the extraction pipeline.
+
+Every scenario is a synthetic PDF from benchmarks.corpus, benchmarked stage by
+stage and end to end in a fresh process so that peak RSS belongs to that
+scenario alone. Results are written as JSON and can be compared with an
+earlier run:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from benchmarks.corpus import CorpusSpec, generate  # noqa: E402
+from services.pdf_processor import (  # noqa: E402
+    ExtractionOptions, _open_document, _encode_image, extract_document, process_pdf, write_document_json
+)
+
+RESULT_FORMAT_VERSION = 1
+
+SCENARIOS = {
+    "text": CorpusSpec(pages=300, lines_per_page=50),
+    "jpeg-images": CorpusSpec(pages=40, lines_per_page=10, images_per_page=3, image_format="jpeg",
+                              image_size=1024),
+    "png-images": CorpusSpec(pages=40, lines_per_page=10, images_per_page=3, image_format="png",
+                             image_size=1024),
+    "duplicate-images": CorpusSpec(pages=200, lines_per_page=10, images_per_page=2, image_format="png",
+                                   duplicate_ratio=0.9),
+    "large-mixed": CorpusSpec(pages=1000, lines_per_page=40, images_per_page=1, image_format="jpeg",
+                              image_size=256, duplicate_ratio=0.5),
+    "huge": CorpusSpec(pages=5000, lines_per_page=40, images_per_page=1, image_format="jpeg",
+                       image_size=128, duplicate_ratio=0.5),
+}
+
+
+def _peak_rss_mb():
+    # Linux keeps ru_maxrss across exec, so a spawned process would report the
+    # peak of the parent that forked it; VmHWM starts afresh with the new program
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _unique_images(doc):
+    seen = set()
+    for page in doc:
+        for info in page.get_images(full=True):
+            if info[0] not in seen:
+                seen.add(info[0])
+                yield info
+
+
+# Each stage opens what it needs, then yields the callable that is timed
+
+@contextmanager
+def stage_open(path, options):
+    def run():
+        doc = _open_document(path)
+        len(doc)
+        doc.close()
+    yield run
+
+
+@contextmanager
+def stage_text(path, options):
+    doc = _open_document(path)
+    try:
+        yield lambda: [page.get_text() for page in doc]
+    finally:
+        doc.close()
+
+
+@contextmanager
+def stage_image_extract(path, options):
+    """Raw extraction of every unique image, without any conversion."""
+    doc = _open_document(path)
+    try:
+        images = list(_unique_images(doc))
+        yield lambda: [doc.extract_image(info[0]) for info in images]
+    finally:
+        doc.close()
+
+
+@contextmanager
+def stage_image_encode(path, options):
+    """The image pipeline's extract-and-encode step (JPEG passthrough included)."""
+    doc = _open_document(path)
+    try:
+        images = list(_unique_images(doc))
+        yield lambda: [_encode_image(doc, info[0], info, options) for info in images]
+    finally:
+        doc.close()
+
+
+@contextmanager
+def stage_serialize(path, options):
+    result = extract_document(path, options)
+    yield result.to_json
+
+
+@contextmanager
+def stage_end_to_end(path, options):
+    yield lambda: process_pdf(path, options)
+
+
+@contextmanager
+def stage_low_memory(path, options):
+    """The same JSON as end_to_end, written page by page (write_document_json)."""
+    def run():
+        with open(os.devnull, "wb") as out:
+            write_document_json(path, out, options)
+    yield run
+
+
+STAGES = {
+    "open": stage_open,
+    "text": stage_text,
+    "image_extract": stage_image_extract,
+    "image_encode": stage_image_encode,
+    "serialize": stage_serialize,
+    "end_to_end": stage_end_to_end,
+    "low_memory": stage_low_memory,
+}
+
+
+def peak_rss(path, options, low_memory):
+    """Peak RSS of one end-to-end extraction, standard or low-memory; runs in its own process."""
+    with (stage_low_memory if low_memory else stage_end_to_end)(path, options) as run:
+        run()
+    return round(_peak_rss_mb(), 1)
+
+
+def run_scenario(path, options, repeat):
+    """Benchmark every stage on one PDF; runs in its own process."""
+    doc = _open_document(path)
+    pages = len(doc)
+    image_count = sum(1 for _ in _unique_images(doc))
+    doc.close()
+
+    file_mb = os.path.getsize(path) / (1024 * 1024)
+    stages = {}
+    for name, stage in STAGES.items():
+        timings = []
+        with stage(path, options) as run:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+        seconds = statistics.median(timings)
+        stages[name] = {
+            "seconds": round(seconds, 6),
+            "minSeconds": round(min(timings), 6),
+            "pagesPerSecond": round(pages / seconds, 2) if seconds else None,
+            "mbPerSecond": round(file_mb / seconds, 2) if seconds else None,
+            # Peak RSS is cumulative, so a jump shows which stage caused it
+            "peakRssMb": round(_peak_rss_mb(), 1)
+        }
+
+    result = extract_document(path, options)
+    return {
+        "pages": pages,
+        "uniqueImages": image_count,
+        "fileBytes": os.path.getsize(path),
+        "outputBytes": len(result.to_json()),
+        "extractedImages": len(result.images or ()),
+        "stages": stages,
+        "peakRssMb": round(_peak_rss_mb(), 1)
+    }
+
+
+def corpus_path(corpus_dir, name, spec):
+    import hashlib
+    key = hashlib.sha256(json.dumps(spec.to_dict(), sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(corpus_dir, f"{name}-{key}.pdf")
+
+
+def git_info():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import fitz
+    import PIL
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "pymupdf": fitz.VersionBind,
+        "pillow": PIL.__version__
+    }
+
+
+def compare(current, baseline, max_regression, min_seconds):
+    """
+    Print the change of every stage against a baseline; returns the regressions.
+
+    Stages faster than ``min_seconds`` in both runs are too noisy to flag.
+    """
+    regressions = []
+    print(f"{'scenario':<18} {'stage':<14} {'before':>10} {'after':>10} {'change':>8}")
+    for name, scenario in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        for stage, timing in scenario["stages"].items():
+            old = before["stages"].get(stage, {}).get("seconds")
+            if not old:
+                continue
+            change = timing["seconds"] / old - 1
+            flag = ""
+            if change > max_regression and max(old, timing["seconds"]) >= min_seconds:
+                regressions.append((name, stage, change))
+                flag = "  <-- regression"
+            print(f"{name:<18} {stage:<14} {old:>10.4f} {timing['seconds']:>10.4f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction on a synthetic corpus.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--quick", action="store_true", help="Use documents with a tenth of the pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median is reported")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "pdf-processor-bench"),
+                        help="Where generated PDFs are kept between runs")
+    parser.add_argument("--image-format", default="jpeg", choices=("jpeg", "png", "webp", "original"))
+    parser.add_argument("--image-quality", type=int, default=70)
+    parser.add_argument("--max-image-dimension", type=int)
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with an earlier results file")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Relative slowdown reported as a regression (exit status 1)")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="Ignore stages faster than this when looking for regressions")
+    args = parser.parse_args(argv)
+
+    options = ExtractionOptions(image_format=args.image_format, image_quality=args.image_quality,
+                                max_image_dimension=args.max_image_dimension)
+    os.makedirs(args.corpus_dir, exist_ok=True)
+
+    results = {
+        "version": RESULT_FORMAT_VERSION,
+        "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_info(),
+        "environment": environment(),
+        "options": options.to_dict(),
+        "repeat": args.repeat,
+        "quick": args.quick,
+        "scenarios": {}
+    }
+
+    # A fresh process per scenario keeps peak RSS and caches independent
+    context = multiprocessing.get_context("spawn")
+    for name in args.scenario or SCENARIOS:
+        spec = SCENARIOS[name]
+        if args.quick:
+            spec = replace(spec, pages=max(2, spec.pages // 10))
+        path = corpus_path(args.corpus_dir, name, spec)
+        if not os.path.exists(path):
+            print(f"Generating {name} corpus...", file=sys.stderr)
+            generate(path, spec)
+
+        print(f"Running {name}...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            scenario = executor.submit(run_scenario, path, options, args.repeat).result()
+        # Peak RSS of a single extraction per mode, each in a fresh process, since the
+        # stages above share one process and its peak only grows
+        memory = {}
+        for mode, low_memory in (("standardPeakRssMb", False), ("lowMemoryPeakRssMb", True)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                memory[mode] = executor.submit(peak_rss, path, options, low_memory).result()
+        scenario["memory"] = memory
+        scenario["spec"] = spec.to_dict()
+        results["scenarios"][name] = scenario
+
+        end_to_end = scenario["stages"]["end_to_end"]
+        print(f"  {scenario['pages']} pages: {end_to_end['seconds']:.3f}s, "
+              f"{end_to_end['pagesPerSecond']} pages/s, {end_to_end['mbPerSecond']} MB/s, "
+              f"peak RSS {scenario['peakRssMb']} MB; one extraction {memory['standardPeakRssMb']} MB, "
+              f"low-memory {memory['lowMemoryPeakRssMb']} MB", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.max_regression, args.min_seconds):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,76 @@ import os
 
 class Config:
     PDF_PROCESSING_API_URL = os.getenv("PDF_PROCESSING_API_URL", "http://localhost:5000/process-pdf")
-    MAX_UPLOAD_SIZE_MB = 50  # Maximum upload size in MB
+    MAX_UPLOAD_SIZE_MB = int(os.getenv("PDF_MAX_UPLOAD_SIZE_MB", "200"))  # Maximum upload size in MB
     ALLOWED_EXTENSIONS = {'pdf'}  # Allowed file extensions for upload
 
+    # Extraction worker pool
+    WORKER_COUNT = int(os.getenv("PDF_WORKER_COUNT", os.cpu_count() or 1))
+    WORKER_START_METHOD = os.getenv("PDF_WORKER_START_METHOD", "spawn")
+    MAX_QUEUED_JOBS = int(os.getenv("PDF_MAX_QUEUED_JOBS", "16"))  # Admitted jobs waiting for a worker
+    JOB_TIMEOUT_SECONDS = float(os.getenv("PDF_JOB_TIMEOUT_SECONDS", "120"))
+    RETRY_AFTER_SECONDS = int(os.getenv("PDF_RETRY_AFTER_SECONDS", "5"))
+    # Import PyMuPDF and warm up the engine at startup (/ready waits for it) instead of on the first request
+    PRELOAD_ENGINE = os.getenv("PDF_PRELOAD_ENGINE", "1").lower() in ("1", "true", "yes")
+
+    # Page-parallel extraction of large documents
+    PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200"))  # Smaller documents use one job
+    PARALLEL_CHUNK_PAGES = int(os.getenv("PDF_PARALLEL_CHUNK_PAGES", "50"))
+    PARALLEL_MAX_WORKERS = int(os.getenv("PDF_PARALLEL_MAX_WORKERS", WORKER_COUNT))  # Chunks in flight per document
+    STREAM_CHUNK_PAGES = int(os.getenv("PDF_STREAM_CHUNK_PAGES", "4"))  # Pages per chunk in NDJSON streaming mode
+
+    # Extraction result cache, shared by the API and the Streamlit apps
+    CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf-processor"))
+    CACHE_MEMORY_MB = int(os.getenv("PDF_CACHE_MEMORY_MB", "64"))
+    CACHE_DISK_MB = int(os.getenv("PDF_CACHE_DISK_MB", "1024"))
+
+    # Image bytes kept in memory for by-reference image responses
+    IMAGE_STORE_MB = int(os.getenv("PDF_IMAGE_STORE_MB", "256"))
+
+    # Page preview thumbnails and the PDFs they are rendered from, shared by the API and the Streamlit apps
+    PREVIEW_DIR = os.getenv("PDF_PREVIEW_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf-processor-previews"))
+    PREVIEW_STORE_MB = int(os.getenv("PDF_PREVIEW_STORE_MB", "1024"))
+
+    # Asynchronous extraction jobs (/jobs)
+    JOBS_DIR = os.getenv("PDF_JOBS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf-processor-jobs"))
+    JOB_TTL_SECONDS = int(os.getenv("PDF_JOB_TTL_SECONDS", "3600"))  # Finished jobs are kept this long
+    JOB_RUNNERS = int(os.getenv("PDF_JOB_RUNNERS", "2"))  # Jobs extracted concurrently
+
+    # Batch extraction (/process-batch)
+    BATCH_MAX_FILES = int(os.getenv("PDF_BATCH_MAX_FILES", "5000"))  # PDFs per request, including ZIP members
+    BATCH_MAX_UPLOAD_SIZE_MB = int(os.getenv("PDF_BATCH_MAX_UPLOAD_SIZE_MB", "2048"))  # Whole request body
+    BATCH_CONCURRENCY = int(os.getenv("PDF_BATCH_CONCURRENCY", 2 * WORKER_COUNT))  # Files in flight per batch
+
+    # Hard limits per document, checked before and during extraction; 0 disables a limit
+    MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "10000"))  # Selected pages
+    MAX_IMAGE_PIXELS = int(os.getenv("PDF_MAX_IMAGE_PIXELS", "2000000000"))  # All images, as declared
+    MAX_SINGLE_IMAGE_PIXELS = int(os.getenv("PDF_MAX_SINGLE_IMAGE_PIXELS", "150000000"))
+    MAX_OUTPUT_MB = int(os.getenv("PDF_MAX_OUTPUT_MB", "1024"))  # Text and image bytes before encoding
+    MAX_EXTRACTION_SECONDS = float(os.getenv("PDF_MAX_EXTRACTION_SECONDS", "600"))
+    # Worker resident memory above which MuPDF's cache is emptied between pages; 0 disables it
+    ENGINE_MEMORY_MB = int(os.getenv("PDF_ENGINE_MEMORY_MB", "512"))
+    # Declared image pixels that weigh as much as one extra job at admission
+    ADMISSION_PIXELS_PER_JOB = int(os.getenv("PDF_ADMISSION_PIXELS_PER_JOB", "50000000"))
+
+    # Page-level memo of text and images, so revised documents only extract changed pages
+    PAGE_MEMO = os.getenv("PDF_PAGE_MEMO", "0").lower() in ("1", "true", "yes")
+    PAGE_MEMO_PATH = os.getenv("PDF_PAGE_MEMO_PATH", os.path.join(os.path.expanduser("~"), ".cache",
+                                                                  "pdf-processor-memo", "memo.sqlite3"))
+    PAGE_MEMO_MB = int(os.getenv("PDF_PAGE_MEMO_MB", "1024"))
+
+    # Optional full-text search index (/search), fed in the background
+    SEARCH_INDEX = os.getenv("PDF_SEARCH_INDEX", "0").lower() in ("1", "true", "yes")
+    SEARCH_INDEX_PATH = os.getenv("PDF_SEARCH_INDEX_PATH", os.path.join(os.path.expanduser("~"), ".cache",
+                                                                        "pdf-processor-search", "index.sqlite3"))
+    SEARCH_INDEX_QUEUE = int(os.getenv("PDF_SEARCH_INDEX_QUEUE", "64"))  # Documents waiting to be indexed
+
+    # Response compression (zstd, br or gzip, as the client accepts); smaller bodies are sent as they are
+    COMPRESS_RESPONSES = os.getenv("PDF_COMPRESS_RESPONSES", "1").lower() in ("1", "true", "yes")
+    COMPRESSION_MIN_BYTES = int(os.getenv("PDF_COMPRESSION_MIN_BYTES", "1024"))
+
+    # Per-stage timings of every extraction (Server-Timing header, /metrics stage histograms)
+    STAGE_TIMINGS = os.getenv("PDF_STAGE_TIMINGS", "0").lower() in ("1", "true", "yes")
+
     @staticmethod
     def is_allowed_file(filename):
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
\ No newline at end of file
@@ -0,0 +1,442 @@
+"""
+Python client for the PDF Processor API.
+
+PDFClient (threads) and AsyncPDFClient (asyncio) keep a pool of keep-alive
+connections, stream uploads from disk, retry 429 and 503 responses with
+backoff and parse NDJSON responses record by record as they arrive:
+
+    with PDFClient("http://localhost:8000") as client:
+        result = client.process("document.pdf", fields="text,metadata")
+        for path, result in client.map(paths, concurrency=8):
+            ...
+
+Both clients can talk to the app in-process, without a server:
+
+    PDFClient(client=fastapi.testclient.TestClient(api_server.app))
+    AsyncPDFClient("http://test", transport=httpx.ASGITransport(app=api_server.app))
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import ExitStack
+from itertools import islice
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library is used instead
+    orjson = None
+
+# Responses that mean "try again later"; both carry Retry-After from this API
+RETRY_STATUSES = frozenset((429, 503))
+# Connection failures that happen before the request reaches the server
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+class PDFClientError(Exception):
+    """An error response from the API, with its status code and ``detail``."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+def _response_error(response):
+    try:
+        detail = _loads(response.content).get("detail", response.text)
+    except (ValueError, AttributeError):
+        detail = response.text
+    return PDFClientError(response.status_code, detail)
+
+def _job_error(job):
+    detail = f"Job is {job['status']}"
+    if job.get("error"):
+        detail += f": {job['error']}"
+    return PDFClientError(409, detail)
+
+class NDJSONDecoder:
+    """
+    Incremental NDJSON parser: feed() it chunks as they arrive and it returns
+    the records completed so far, so no record waits for the whole body.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk):
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        return [_loads(line) for line in lines if line.strip()]
+
+    def close(self):
+        """Return the last record if the body did not end with a newline."""
+        rest, self._buffer = self._buffer, b""
+        return [_loads(rest)] if rest.strip() else []
+
+def _params(options):
+    """Query parameters from keyword arguments; lists such as ``fields`` are joined with commas."""
+    return {
+        name: ",".join(map(str, value)) if isinstance(value, (list, tuple, set, frozenset)) else value
+        for name, value in options.items() if value is not None
+    }
+
+def _open_uploads(files, uploads):
+    """Open (field, path) pairs as multipart files; httpx reads them in chunks while sending."""
+    opened = []
+    for field, path in uploads:
+        name = os.path.basename(path)
+        media_type = "application/zip" if name.lower().endswith(".zip") else "application/pdf"
+        opened.append((field, (name, files.enter_context(open(path, "rb")), media_type)))
+    return opened or None
+
+class _ClientBase:
+    def __init__(self, retries, backoff, max_backoff):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _delay(self, attempt, response=None):
+        """Seconds to wait before retry ``attempt``: exponential with jitter, at least Retry-After."""
+        delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("retry-after", 0)))
+            except ValueError:
+                pass
+        return min(delay, self.max_backoff)
+
+    def _retry(self, attempt, response=None):
+        """Return whether to retry after an error response, or a connection failure when ``response`` is None."""
+        if attempt >= self.retries:
+            return False
+        return response is None or response.status_code in RETRY_STATUSES
+
+def _limits(max_connections):
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+class PDFClient(_ClientBase):
+    """
+    Thread-safe client for the PDF Processor API.
+
+    Requests share a pool of up to ``max_connections`` keep-alive
+    connections. PDFs are uploaded from their paths and streamed from disk,
+    never read into memory. 429 and 503 responses and failed connections
+    are retried up to ``retries`` times, waiting ``backoff`` seconds doubled
+    on every attempt (with jitter, at least the Retry-After, at most
+    ``max_backoff``); other error responses raise PDFClientError.
+
+    Args:
+        base_url: URL of the API
+        timeout: Seconds to wait for a connection, or between bytes of a response
+        max_connections: Connections kept open and used at the same time
+        retries: Retries of a request after the first attempt
+        backoff: Seconds before the first retry
+        max_backoff: Longest wait before a retry
+        headers: Headers sent with every request
+        transport: httpx transport, such as httpx.MockTransport
+        client: An httpx.Client to use instead, such as FastAPI's TestClient;
+            it is not closed by close()
+    """
+
+    def __init__(self, base_url="http://localhost:8000", timeout=300.0, max_connections=10, retries=3,
+                 backoff=0.5, max_backoff=30.0, headers=None, transport=None, client=None):
+        super().__init__(retries, backoff, max_backoff)
+        self._owns_client = client is None
+        self._client = client or httpx.Client(base_url=base_url, timeout=timeout, headers=headers,
+                                              limits=_limits(max_connections), transport=transport)
+
+    def close(self):
+        if self._owns_client:
+            self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, method, url, params=None, uploads=(), stream=False):
+        attempt = 0
+        while True:
+            response = None
+            with ExitStack() as files:
+                request = self._client.build_request(method, url, params=params,
+                                                     files=_open_uploads(files, uploads))
+                try:
+                    response = self._client.send(request, stream=stream)
+                except RETRY_ERRORS:
+                    if not self._retry(attempt):
+                        raise
+            if response is not None:
+                if response.status_code < 400:
+                    return response
+                if stream:
+                    response.read()
+                    response.close()
+                if not self._retry(attempt, response):
+                    raise _response_error(response)
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def _json(self, method, url, params=None, uploads=()):
+        return _loads(self._send(method, url, params, uploads).content)
+
+    def _records(self, url, params, uploads):
+        response = self._send("POST", url, params, uploads, stream=True)
+        try:
+            decoder = NDJSONDecoder()
+            for chunk in response.iter_bytes():
+                yield from decoder.feed(chunk)
+            yield from decoder.close()
+        finally:
+            response.close()
+
+    def health(self):
+        return self._json("GET", "/health")
+
+    def ready(self):
+        """Return /ready; a server that is still starting is retried like any 503."""
+        return self._json("GET", "/ready")
+
+    def process(self, path, **options):
+        """
+        Extract a PDF with /process-pdf and return the result.
+
+        Keyword arguments are the endpoint's query parameters, e.g.
+        ``fields=["text", "links"]``, ``pages="1-10"`` or ``image_mode="ref"``.
+        """
+        return self._json("POST", "/process-pdf", _params(options), [("file", path)])
+
+    def process_metadata(self, path):
+        return self._json("POST", "/process-pdf-metadata-only", uploads=[("file", path)])
+
+    def stream(self, path, **options):
+        """
+        Yield the NDJSON records of a streamed extraction as they arrive.
+
+        The request is sent once iteration starts. A failure after the stream
+        started is a ``{"type": "error"}`` record rather than an exception.
+        """
+        return self._records("/process-pdf", {**_params(options), "stream": "true"}, [("file", path)])
+
+    def batch(self, paths, **options):
+        """Yield the records of /process-batch for PDFs and ZIP archives, in completion order."""
+        return self._records("/process-batch", _params(options), [("files", path) for path in paths])
+
+    def map(self, paths, concurrency=4, **options):
+        """
+        Extract many PDFs with one request each, ``concurrency`` at a time.
+
+        Yields (path, result) in completion order; a file that failed yields
+        its exception as the result, so one bad file does not stop the rest.
+        ``paths`` may be a lazy iterable; only ``concurrency`` paths are
+        taken from it ahead of their results.
+        """
+        paths = iter(paths)
+        running = {}
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pdf-client") as executor:
+            try:
+                while True:
+                    for path in islice(paths, concurrency - len(running)):
+                        running[executor.submit(self.process, path, **options)] = path
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path = running.pop(future)
+                        try:
+                            yield path, future.result()
+                        except Exception as e:
+                            yield path, e
+            finally:
+                for future in running:
+                    future.cancel()
+
+    def image(self, document_id, image_id):
+        """Return the bytes of an image from a result extracted with image_mode="ref"."""
+        return self._send("GET", f"/documents/{document_id}/images/{image_id}").content
+
+    def preview(self, document_id, page, width=None):
+        """Return the JPEG preview of a page (1-based) of a document processed with the previews field."""
+        return self._send("GET", f"/documents/{document_id}/pages/{page}/preview",
+                          _params({"width": width})).content
+
+    def create_job(self, path, **options):
+        """Start a background extraction (see process) and return the job."""
+        return self._json("POST", "/jobs", _params(options), [("file", path)])
+
+    def job(self, job_id):
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def job_result(self, job_id):
+        return self._json("GET", f"/jobs/{job_id}/result")
+
+    def wait_for_job(self, job_id, poll_interval=1.0, timeout=None):
+        """
+        Poll a job until it finishes and return its result.
+
+        Raises PDFClientError if the job failed or was cancelled, and
+        TimeoutError after ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            job = self.job(job_id)
+            if job["status"] == "completed":
+                return self.job_result(job_id)
+            if job["status"] in ("failed", "cancelled"):
+                raise _job_error(job)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} is still {job['status']}")
+            time.sleep(poll_interval)
+
+    def cancel_job(self, job_id):
+        """Cancel a running job, or delete a finished one."""
+        self._send("DELETE", f"/jobs/{job_id}")
+
+    def search(self, query, limit=20, offset=0, document_id=None):
+        return self._json("GET", "/search", _params({"q": query, "limit": limit, "offset": offset,
+                                                     "document_id": document_id}))
+
+class AsyncPDFClient(_ClientBase):
+    """
+    asyncio counterpart of PDFClient, with the same methods as coroutines;
+    stream(), batch() and map() are async generators.
+
+    Pass ``transport=httpx.ASGITransport(app=app)`` to call an ASGI app
+    in-process, or ``client=`` an httpx.AsyncClient to use instead.
+    """
+
+    def __init__(self, base_url="http://localhost:8000", timeout=300.0, max_connections=10, retries=3,
+                 backoff=0.5, max_backoff=30.0, headers=None, transport=None, client=None):
+        super().__init__(retries, backoff, max_backoff)
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(base_url=base_url, timeout=timeout, headers=headers,
+                                                   limits=_limits(max_connections), transport=transport)
+
+    async def close(self):
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _send(self, method, url, params=None, uploads=(), stream=False):
+        attempt = 0
+        while True:
+            response = None
+            with ExitStack() as files:
+                request = self._client.build_request(method, url, params=params,
+                                                     files=_open_uploads(files, uploads))
+                try:
+                    response = await self._client.send(request, stream=stream)
+                except RETRY_ERRORS:
+                    if not self._retry(attempt):
+                        raise
+            if response is not None:
+                if response.status_code < 400:
+                    return response
+                if stream:
+                    await response.aread()
+                    await response.aclose()
+                if not self._retry(attempt, response):
+                    raise _response_error(response)
+            await asyncio.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    async def _json(self, method, url, params=None, uploads=()):
+        return _loads((await self._send(method, url, params, uploads)).content)
+
+    async def _records(self, url, params, uploads):
+        response = await self._send("POST", url, params, uploads, stream=True)
+        try:
+            decoder = NDJSONDecoder()
+            async for chunk in response.aiter_bytes():
+                for record in decoder.feed(chunk):
+                    yield record
+            for record in decoder.close():
+                yield record
+        finally:
+            await response.aclose()
+
+    async def health(self):
+        return await self._json("GET", "/health")
+
+    async def ready(self):
+        return await self._json("GET", "/ready")
+
+    async def process(self, path, **options):
+        return await self._json("POST", "/process-pdf", _params(options), [("file", path)])
+
+    async def process_metadata(self, path):
+        return await self._json("POST", "/process-pdf-metadata-only", uploads=[("file", path)])
+
+    def stream(self, path, **options):
+        return self._records("/process-pdf", {**_params(options), "stream": "true"}, [("file", path)])
+
+    def batch(self, paths, **options):
+        return self._records("/process-batch", _params(options), [("files", path) for path in paths])
+
+    async def map(self, paths, concurrency=4, **options):
+        """Yield (path, result or exception) like PDFClient.map, with tasks instead of threads."""
+        paths = iter(paths)
+        running = {}
+        try:
+            while True:
+                for path in islice(paths, concurrency - len(running)):
+                    running[asyncio.ensure_future(self.process(path, **options))] = path
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    path = running.pop(task)
+                    try:
+                        yield path, task.result()
+                    except Exception as e:
+                        yield path, e
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def image(self, document_id, image_id):
+        return (await self._send("GET", f"/documents/{document_id}/images/{image_id}")).content
+
+    async def preview(self, document_id, page, width=None):
+        return (await self._send("GET", f"/documents/{document_id}/pages/{page}/preview",
+                                 _params({"width": width}))).content
+
+    async def create_job(self, path, **options):
+        return await self._json("POST", "/jobs", _params(options), [("file", path)])
+
+    async def job(self, job_id):
+        return await self._json("GET", f"/jobs/{job_id}")
+
+    async def job_result(self, job_id):
+        return await self._json("GET", f"/jobs/{job_id}/result")
+
+    async def wait_for_job(self, job_id, poll_interval=1.0, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            job = await self.job(job_id)
+            if job["status"] == "completed":
+                return await self.job_result(job_id)
+            if job["status"] in ("failed", "cancelled"):
+                raise _job_error(job)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} is still {job['status']}")
+            await asyncio.sleep(poll_interval)
+
+    async def cancel_job(self, job_id):
+        await self._send("DELETE", f"/jobs/{job_id}")
+
+    async def search(self, query, limit=20, offset=0, document_id=None):
+        return await self._json("GET", "/search", _params({"q": query, "limit": limit, "offset": offset,
+                                                           "document_id": document_id}))
@@ -1,9 +1,19 @@
 import streamlit as st
-import json
+import sys
+import os
 from components.file_upload import upload_file
-from services.pdf_processor import process_pdf
+from services.pdf_processor import PDFProcessingError
+from services.result_cache import ResultCache
+from services.image_store import ImageStore
+from services.preview_store import PreviewStore
+from components.document_loader import upload_digest, load_document, page_text, page_preview
 from components.json_display import display_json
 
+# Add the project root so the shared Config can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
 # Page configuration
 st.set_page_config(
     page_title="PDF Processor",
@@ -11,6 +21,25 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_result_cache():
+    """One result cache per server process, sharing its disk tier with the API."""
+    return ResultCache(
+        directory=Config.CACHE_DIR,
+        memory_bytes=Config.CACHE_MEMORY_MB * 1024 * 1024,
+        disk_bytes=Config.CACHE_DISK_MB * 1024 * 1024
+    )
+
+@st.cache_resource
+def get_image_store():
+    """Image bytes for the viewer, loaded lazily by display_json."""
+    return ImageStore(max_bytes=Config.IMAGE_STORE_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_preview_store():
+    """Page previews for the viewer, in the directory shared with the API."""
+    return PreviewStore(Config.PREVIEW_DIR, max_bytes=Config.PREVIEW_STORE_MB * 1024 * 1024)
+
 def main():
     st.title("📄 PDF Data Extractor")
     st.markdown("""
@@ -27,15 +56,24 @@ def main():
         # Show file details
         st.success(f"✅ File uploaded: {pdf_file.name} ({pdf_file.size:,} bytes)")
         
-        # Process the PDF file with progress indicator
-        with st.spinner("🔄 Processing PDF... This may take a moment for large files."):
-            result = process_pdf(pdf_file)
+        # Extraction is memoized by the file's hash, so reruns caused by tab
+        # clicks and downloads do not process the PDF again
+        image_store = get_image_store()
+        preview_store = get_preview_store()
+        doc_id = upload_digest(pdf_file)
+        try:
+            with st.spinner("🔄 Processing PDF... This may take a moment for large files."):
+                result = load_document(doc_id, pdf_file, get_result_cache(), image_store)
+        except PDFProcessingError as e:
+            result = None
+            st.error(f"❌ Error processing the PDF file: {e}")
 
-        # Display the result
+        # Display the result, loading image bytes and page text on demand
         if result:
-            display_json(result)
-        else:
-            st.error("❌ Error processing the PDF file.")
+            display_json(result,
+                         image_loader=lambda image_id: image_store.get(doc_id, image_id),
+                         page_text_loader=lambda page_number: page_text(doc_id, page_number, pdf_file),
+                         preview_loader=lambda page_number: page_preview(doc_id, page_number, pdf_file, preview_store))
     else:
         st.info("👆 Please upload a PDF file to get started.")
 
@@ -1,19 +1,32 @@
 import streamlit as st
-import json
 from components.file_upload import upload_file
-from services.pdf_processor import process_pdf
+from services.pdf_processor import (
+    extract_document, warm_up, ExtractionOptions, ResourceLimits, PDFProcessingError, InvalidPDFError,
+    ResourceLimitExceeded
+)
+from services.result_cache import ResultCache, result_key
+from services.image_store import ImageStore
+from services.preview_store import PreviewStore
+from services.uploads import spool_upload, UploadTooLarge
+from components.document_loader import upload_digest, load_document, page_text, page_preview
 from components.json_display import display_json
 import threading
 import time
+import asyncio
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, JSONResponse
 import uvicorn
 import sys
 import os
 
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+# Add the project root so the shared Config can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.executor import WorkerPool, PoolSaturated, PoolClosed, JobTimeout
 
 # Page configuration
 st.set_page_config(
@@ -22,6 +35,29 @@ st.set_page_config(
     layout="wide"
 )
 
+# Worker processes for the embedded API, started with the server
+api_pool = WorkerPool(
+    max_workers=Config.WORKER_COUNT,
+    max_queue=Config.MAX_QUEUED_JOBS,
+    job_timeout=Config.JOB_TIMEOUT_SECONDS,
+    retry_after=Config.RETRY_AFTER_SECONDS,
+    start_method=Config.WORKER_START_METHOD,
+    preload=Config.PRELOAD_ENGINE,
+    warmup=warm_up if Config.PRELOAD_ENGINE else None
+)
+
+# Seconds to wait for the embedded server to accept connections
+API_START_TIMEOUT_SECONDS = 10
+
+# Same resource limits as the standalone API
+API_OPTIONS = ExtractionOptions(limits=ResourceLimits(
+    max_pages=Config.MAX_PAGES,
+    max_image_pixels=Config.MAX_IMAGE_PIXELS,
+    max_single_image_pixels=Config.MAX_SINGLE_IMAGE_PIXELS,
+    max_output_bytes=Config.MAX_OUTPUT_MB * 1024 * 1024,
+    max_seconds=Config.MAX_EXTRACTION_SECONDS
+))
+
 # FastAPI app
 api_app = FastAPI(
     title="PDF Processor API",
@@ -41,43 +77,90 @@ api_app.add_middleware(
 async def health_check():
     return {"status": "healthy", "service": "PDF Processor API"}
 
+@api_app.get("/api/ready")
+async def readiness_check():
+    """200 once the worker processes have warmed up, 503 before."""
+    if not api_pool.ready:
+        return JSONResponse({"status": "starting", **api_pool.stats()}, status_code=503,
+                            headers={"Retry-After": "1"})
+    return {"status": "ready"}
+
 @api_app.post("/api/process-pdf")
 async def process_pdf_endpoint(file: UploadFile = File(...)):
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
     try:
-        # Handle the uploaded file directly
-        pdf_bytes = await file.read()
-        
-        # Create a temporary file-like object
-        class TempFile:
-            def __init__(self, content):
-                self.content = content
-                self.position = 0
-            
-            def read(self):
-                return self.content
-        
-        temp_file = TempFile(pdf_bytes)
-        result = process_pdf(temp_file)
-        parsed_result = json.loads(result)
+        # Spool the upload to disk in chunks; the worker opens it by path
+        with await spool_upload(file, Config.MAX_UPLOAD_SIZE_MB * 1024 * 1024) as upload:
+            # Serve repeated uploads from the shared result cache
+            result_cache = get_result_cache()
+            cache_key = result_key(upload.digest, API_OPTIONS)
+            result = await asyncio.to_thread(result_cache.get, cache_key)
+            if result is None:
+                # Extract on the worker pool so the server thread stays responsive
+                with api_pool.admit():
+                    document = await asyncio.wrap_future(api_pool.submit(extract_document, upload.path, API_OPTIONS))
+                result = await asyncio.to_thread(document.to_json)
+                await asyncio.to_thread(result_cache.put, cache_key, result)
         
-        return JSONResponse(content=parsed_result)
+        # The result is already serialized, so it is sent as it is
+        return Response(content=result, media_type="application/json")
         
+    except (UploadTooLarge, ResourceLimitExceeded) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPDFError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PoolSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+    except PoolClosed as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(api_pool.retry_after)})
+    except JobTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
-def run_api_server():
-    """Run the FastAPI server in a separate thread"""
-    uvicorn.run(api_app, host="0.0.0.0", port=8000, log_level="error")
+@st.cache_resource(show_spinner=False)
+def start_api_server():
+    """
+    Start the FastAPI server in a background thread, once per process.
 
-# Start API server in background
-if 'api_started' not in st.session_state:
-    st.session_state.api_started = True
-    api_thread = threading.Thread(target=run_api_server, daemon=True)
+    Returns the uvicorn Server once it accepts connections, instead of
+    sleeping for a fixed time; its ``started`` stays False if it could not
+    start in time (for example because the port is taken).
+    """
+    api_pool.start()
+    server = uvicorn.Server(uvicorn.Config(api_app, host="0.0.0.0", port=8000, log_level="error"))
+    api_thread = threading.Thread(target=server.run, name="embedded-api", daemon=True)
     api_thread.start()
-    time.sleep(2)  # Give the server time to start
+
+    deadline = time.monotonic() + API_START_TIMEOUT_SECONDS
+    while not server.started and api_thread.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server
+
+start_api_server()
+
+@st.cache_resource
+def get_result_cache():
+    """One result cache per server process, sharing its disk tier with the API."""
+    return ResultCache(
+        directory=Config.CACHE_DIR,
+        memory_bytes=Config.CACHE_MEMORY_MB * 1024 * 1024,
+        disk_bytes=Config.CACHE_DISK_MB * 1024 * 1024
+    )
+
+@st.cache_resource
+def get_image_store():
+    """Image bytes for the viewer, loaded lazily by display_json."""
+    return ImageStore(max_bytes=Config.IMAGE_STORE_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_preview_store():
+    """Page previews for the viewer, in the directory shared with the API."""
+    return PreviewStore(Config.PREVIEW_DIR, max_bytes=Config.PREVIEW_STORE_MB * 1024 * 1024)
 
 def main():
     st.title("📄 PDF Data Extractor")
@@ -100,15 +183,24 @@ def main():
             # Show file details
             st.success(f"✅ File uploaded: {pdf_file.name} ({pdf_file.size:,} bytes)")
             
-            # Process the PDF file with progress indicator
-            with st.spinner("🔄 Processing PDF... This may take a moment for large files."):
-                result = process_pdf(pdf_file)
+            # Extraction is memoized by the file's hash, so reruns caused by tab
+            # clicks and downloads do not process the PDF again
+            image_store = get_image_store()
+            preview_store = get_preview_store()
+            doc_id = upload_digest(pdf_file)
+            try:
+                with st.spinner("🔄 Processing PDF... This may take a moment for large files."):
+                    result = load_document(doc_id, pdf_file, get_result_cache(), image_store)
+            except PDFProcessingError as e:
+                result = None
+                st.error(f"❌ Error processing the PDF file: {e}")
 
-            # Display the result
+            # Display the result, loading image bytes and page text on demand
             if result:
-                display_json(result)
-            else:
-                st.error("❌ Error processing the PDF file.")
+                display_json(result,
+                             image_loader=lambda image_id: image_store.get(doc_id, image_id),
+                             page_text_loader=lambda page_number: page_text(doc_id, page_number, pdf_file),
+                             preview_loader=lambda page_number: page_preview(doc_id, page_number, pdf_file, preview_store))
         else:
             st.info("👆 Please upload a PDF file to get started.")
     
@@ -130,6 +222,9 @@ def main():
 # Health Check
 GET {api_base_url}/api/health
 
+# Readiness (503 until the workers have warmed up)
+GET {api_base_url}/api/ready
+
 # Process PDF
 POST {api_base_url}/api/process-pdf
 Content-Type: multipart/form-data
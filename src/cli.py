@@ -0,0 +1,379 @@
+"""
+Bulk extraction from the command line.
+
+PDFs found under directories (or listed in a file, one path per line) are
+extracted on a pool of worker processes, and the results are appended to
+JSONL files as they finish:
+
+    python src/cli.py /data/contracts --output results.jsonl --image-dir images --workers 8
+
+Every finished file is recorded in a manifest next to the output. Running
+the same command again skips the files that are already done, so an
+interrupted run resumes where it stopped. A file whose result was written
+just before an interruption can appear twice in the output; records carry
+the file's ``documentId`` to tell them apart.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SRC)
+# The project root holds the shared Config
+sys.path.append(os.path.dirname(SRC))
+
+from config import Config  # noqa: E402
+from services.executor import WorkerPool  # noqa: E402
+from services.pdf_processor import (  # noqa: E402
+    write_document_json, parse_fields, parse_page_ranges, round_preview_width, warm_up, ExtractionOptions,
+    ResourceLimits, DEFAULT_OPTIONS
+)
+from services.result_cache import hash_file  # noqa: E402
+from services.serialization import dumps  # noqa: E402
+
+# Manifest statuses
+DONE = "ok"
+FAILED = "error"
+
+
+def find_pdfs(inputs, file_list=None):
+    """Yield the PDF paths under the input directories and files, then those listed in ``file_list``."""
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+    if file_list:
+        with (sys.stdin if file_list == "-" else open(file_list)) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def write_image(image_dir, image):
+    """
+    Write an image to a content-addressed directory and return its descriptor.
+
+    Each image is stored once under its id, as ``<id[:2]>/<id>.<format>``,
+    however many documents contain it.
+    """
+    relative_path = os.path.join(image.id[:2], f"{image.id}.{image.format}")
+    path = os.path.join(image_dir, relative_path)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(image.data)
+        os.replace(temp_path, path)
+    return {**image.descriptor(), "file": relative_path}
+
+
+def extract_file(path, options, image_dir=None):
+    """
+    Extract one PDF in a worker process into a temporary JSONL file.
+
+    The record is written page by page (see write_document_json), so a huge
+    document takes no more memory than a small one, and images are written
+    by the worker itself. Returns (temporary file path, pages extracted);
+    the caller appends the file to the output and deletes it.
+    """
+    head = {"path": path, "status": DONE, "documentId": hash_file(path)}
+    image_json = (lambda image: write_image(image_dir, image)) if image_dir is not None else None
+    fd, temp_path = tempfile.mkstemp(suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            pages = write_document_json(path, out, options, head=head, image_json=image_json)
+            out.write(b"\n")
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, pages
+
+
+def _truncate_partial_line(path):
+    """Cut off a last line without a newline, left by an interrupted run; returns ``path``."""
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # Scan back for the end of the last whole line without reading the whole file
+                end = f.tell()
+                while end > 0:
+                    start = max(0, end - 1024 * 1024)
+                    f.seek(start)
+                    newline = f.read(end - start).rfind(b"\n")
+                    if newline >= 0:
+                        end = start + newline + 1
+                        break
+                    end = start
+                f.truncate(end)
+    return path
+
+
+class Manifest:
+    """
+    Append-only record of finished files: status, size, mtime and path per line.
+
+    A file counts as done while its size and modification time match, so a
+    file replaced since it was extracted is extracted again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        # A line cut off by an interrupted run is dropped, so the next record starts on its own line
+        _truncate_partial_line(path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t", 3)
+                    if len(parts) == 4:
+                        status, size, mtime, file_path = parts
+                        self.done[file_path] = (status, int(size), int(mtime))
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, path, stat, retry_failed=False):
+        entry = self.done.get(path)
+        if entry is None or (entry[1], entry[2]) != (stat.st_size, stat.st_mtime_ns):
+            return False
+        return not (retry_failed and entry[0] == FAILED)
+
+    def record(self, path, stat, status):
+        self._file.write(f"{status}\t{stat.st_size}\t{stat.st_mtime_ns}\t{path}\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlWriter:
+    """
+    Appends records to a JSONL file, or to numbered shards of ``shard_size`` records.
+
+    A partial last line left by an interrupted run is cut off before
+    appending; a resumed sharded run cuts it off the last shard and starts
+    a new one.
+    """
+
+    def __init__(self, path, shard_size=None):
+        self.path = path
+        self.shard_size = shard_size
+        self._file = None
+        self._records = 0
+        self._shard = 0
+        if shard_size:
+            while os.path.exists(self._shard_path(self._shard)):
+                self._shard += 1
+            if self._shard:
+                _truncate_partial_line(self._shard_path(self._shard - 1))
+        else:
+            self._file = open(_truncate_partial_line(path), "ab")
+
+    def write(self, record):
+        """Append a record: JSONL bytes, or a file holding them."""
+        if self.shard_size and (self._file is None or self._records >= self.shard_size):
+            if self._file is not None:
+                self._file.close()
+                self._shard += 1
+            self._file = open(self._shard_path(self._shard), "xb")
+            self._records = 0
+        if isinstance(record, bytes):
+            self._file.write(record)
+        else:
+            shutil.copyfileobj(record, self._file, 1024 * 1024)
+        self._file.flush()
+        self._records += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def _shard_path(self, index):
+        base, extension = os.path.splitext(self.path)
+        return f"{base}-{index:05d}{extension or '.jsonl'}"
+
+
+class Progress:
+    """Counts finished documents and pages, and reports rates every ``interval`` seconds."""
+
+    def __init__(self, interval=5.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.documents = 0
+        self.pages = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def add(self, pages=0, failed=False):
+        self.documents += 1
+        self.pages += pages
+        self.failed += failed
+        now = time.perf_counter()
+        if self.interval and now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def summary(self):
+        seconds = time.perf_counter() - self.start
+        return {
+            "documents": self.documents,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "pages": self.pages,
+            "seconds": round(seconds, 3),
+            "documentsPerSecond": round(self.documents / seconds, 2) if seconds else None,
+            "pagesPerSecond": round(self.pages / seconds, 1) if seconds else None
+        }
+
+    def report(self):
+        summary = self.summary()
+        print(f"{summary['documents']} documents ({summary['failed']} failed, {summary['skipped']} skipped), "
+              f"{summary['pages']} pages in {summary['seconds']:.0f}s: {summary['documentsPerSecond']} docs/s, "
+              f"{summary['pagesPerSecond']} pages/s", file=self.stream, flush=True)
+
+
+def run(paths, options, writer, manifest, workers, image_dir=None, timeout=None, retry_failed=False,
+        progress=None):
+    """
+    Extract every path not already in the manifest on a pool of ``workers`` processes.
+
+    Results and error records are written as they finish, in completion
+    order, and each file is recorded in the manifest after its record.
+    Returns the Progress.
+    """
+    progress = progress or Progress()
+    pool = WorkerPool(max_workers=workers, job_timeout=timeout, start_method=Config.WORKER_START_METHOD,
+                      warmup=warm_up)
+    # A few files per worker are kept queued so no worker waits for the next one
+    max_in_flight = 2 * workers
+    in_flight = {}
+
+    def finish(done):
+        for future in done:
+            path, stat = in_flight.pop(future)
+            try:
+                record_path, pages = future.result()
+                with open(record_path, "rb") as record:
+                    writer.write(record)
+                os.unlink(record_path)
+                status = DONE
+            except Exception as e:
+                pages, status = 0, FAILED
+                writer.write(dumps({"path": path, "status": FAILED, "error": str(e)}) + b"\n")
+            manifest.record(path, stat, status)
+            progress.add(pages, failed=status == FAILED)
+
+    # The pool starts with the first submitted file, so a run with nothing left to do returns at once
+    try:
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                writer.write(dumps({"path": path, "status": FAILED, "error": str(e)}) + b"\n")
+                progress.add(failed=True)
+                continue
+            if manifest.is_done(path, stat, retry_failed):
+                progress.skipped += 1
+                continue
+            while len(in_flight) >= max_in_flight:
+                finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            in_flight[pool.submit(extract_file, path, options, image_dir)] = (path, stat)
+        while in_flight:
+            finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+    finally:
+        for future in in_flight:
+            future.cancel()
+        pool.shutdown()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract PDFs in bulk into JSONL files.")
+    parser.add_argument("inputs", nargs="*", help="PDF files, or directories searched for *.pdf")
+    parser.add_argument("--file-list", help="File with one PDF path per line ('-' for stdin)")
+    parser.add_argument("--output", required=True, help="JSONL file the results are appended to")
+    parser.add_argument("--shard-size", type=int,
+                        help="Write numbered files of this many records (output-00000.jsonl, ...)")
+    parser.add_argument("--manifest", help="Checkpoint manifest (default: <output>.manifest)")
+    parser.add_argument("--retry-failed", action="store_true", help="Extract files that failed before again")
+    parser.add_argument("--image-dir",
+                        help="Write images here by content hash; records then hold image descriptors")
+    parser.add_argument("--workers", type=int, default=Config.WORKER_COUNT, help="Worker processes")
+    parser.add_argument("--timeout", type=float, default=Config.JOB_TIMEOUT_SECONDS,
+                        help="Seconds per file before its worker is killed (0 for no limit)")
+    parser.add_argument("--progress-interval", type=float, default=5.0,
+                        help="Seconds between progress lines on stderr (0 to disable)")
+    parser.add_argument("--fields", default=",".join(sorted(DEFAULT_OPTIONS.fields)),
+                        help="Comma separated fields: text, metadata, images, outline, links, previews")
+    parser.add_argument("--pages", help="1-based page ranges to extract, e.g. 1-10,50")
+    parser.add_argument("--image-format", default=DEFAULT_OPTIONS.image_format,
+                        choices=("jpeg", "png", "webp", "original"))
+    parser.add_argument("--image-quality", type=int, default=DEFAULT_OPTIONS.image_quality)
+    parser.add_argument("--max-image-dimension", type=int)
+    parser.add_argument("--thumbnails-only", action="store_true")
+    parser.add_argument("--min-image-size", type=int, default=DEFAULT_OPTIONS.min_image_size)
+    parser.add_argument("--engine-memory-mb", type=int, default=Config.ENGINE_MEMORY_MB,
+                        help="Worker memory above which MuPDF's cache is emptied between pages (0: never)")
+    parser.add_argument("--preview-width", type=int, default=DEFAULT_OPTIONS.preview_width,
+                        help="Width of page previews, rounded up to 128, 256, 512 or 1024 pixels")
+    args = parser.parse_args(argv)
+
+    if not args.inputs and not args.file_list:
+        parser.error("give at least one input or --file-list")
+    try:
+        options = ExtractionOptions(
+            image_format=args.image_format,
+            image_quality=args.image_quality,
+            max_image_dimension=args.max_image_dimension,
+            thumbnails_only=args.thumbnails_only,
+            min_image_size=args.min_image_size,
+            fields=parse_fields(args.fields),
+            pages=parse_page_ranges(args.pages) if args.pages else None,
+            preview_width=round_preview_width(args.preview_width),
+            limits=ResourceLimits(
+                max_pages=Config.MAX_PAGES,
+                max_image_pixels=Config.MAX_IMAGE_PIXELS,
+                max_single_image_pixels=Config.MAX_SINGLE_IMAGE_PIXELS,
+                max_output_bytes=Config.MAX_OUTPUT_MB * 1024 * 1024,
+                max_seconds=Config.MAX_EXTRACTION_SECONDS,
+                engine_memory_bytes=args.engine_memory_mb * 1024 * 1024
+            )
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    image_dir = os.path.abspath(args.image_dir) if args.image_dir else None
+    manifest = Manifest(args.manifest or f"{args.output}.manifest")
+    writer = JsonlWriter(args.output, args.shard_size)
+    progress = Progress(args.progress_interval)
+    try:
+        run(find_pdfs(args.inputs, args.file_list), options, writer, manifest, max(1, args.workers),
+            image_dir, args.timeout or None, args.retry_failed, progress)
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+        manifest.close()
+        if args.progress_interval:
+            progress.report()
+    print(json.dumps(progress.summary()))
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
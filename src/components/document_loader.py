@@ -0,0 +1,60 @@
+import streamlit as st
+
+from services.pdf_processor import (
+    extract_document, extract_page_chunk, render_page_preview, ExtractionOptions, DEFAULT_OPTIONS
+)
+from services.result_cache import hash_bytes, result_key
+from services.serialization import dumps, loads
+
+TEXT_ONLY = ExtractionOptions(fields=frozenset(("text",)))
+
+def upload_digest(pdf_file):
+    """SHA-256 of an uploaded file, computed once per upload instead of on every rerun."""
+    digests = st.session_state.setdefault("upload_digests", {})
+    if pdf_file.file_id not in digests:
+        digests[pdf_file.file_id] = hash_bytes(pdf_file.getvalue())
+    return digests[pdf_file.file_id]
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_document(doc_id, _pdf_file, _result_cache, _image_store):
+    """
+    Return the by-reference result dict of an uploaded PDF, memoized by its hash.
+
+    Reruns (tab clicks, downloads) get the same dict back without touching
+    the result cache, so it must not be modified. The shared result cache is
+    used while its images are still in the image store; otherwise the PDF is
+    extracted. Raises PDFProcessingError.
+    """
+    cache_key = result_key(doc_id, DEFAULT_OPTIONS, image_mode="ref")
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        result = loads(cached)
+        if _image_store.has_all(doc_id, result.get("images", [])):
+            return result
+
+    document = extract_document(_pdf_file.getvalue())
+    _image_store.put_images(doc_id, document.images)
+    document.document_id = doc_id
+    result = document.to_dict(image_mode="ref")
+    _result_cache.put(cache_key, dumps(result))
+    return result
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def page_text(doc_id, page_number, _pdf_file):
+    """Text of one page, extracted when the page is first viewed."""
+    page, = extract_page_chunk(_pdf_file.getvalue(), [page_number - 1], TEXT_ONLY)
+    return page.text
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def page_preview(doc_id, page_number, _pdf_file, _preview_store, width=DEFAULT_OPTIONS.preview_width):
+    """
+    JPEG preview of one page, rendered when the page is first viewed.
+
+    The preview store is shared with the API, so a page previewed by either
+    one is not rendered again by the other.
+    """
+    data = _preview_store.get(doc_id, page_number, width)
+    if data is None:
+        data = render_page_preview(_pdf_file.getvalue(), page_number, width).data
+        _preview_store.put(doc_id, page_number, width, data)
+    return data
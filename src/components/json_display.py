@@ -1,12 +1,146 @@
-def display_json(json_data):
-    import streamlit as st
-    import json
-    import base64
+import base64
+import hashlib
+import json
+from io import BytesIO
+
+import streamlit as st
+
+from services.serialization import dumps
+
+# Images shown per gallery page; only these are decoded
+IMAGES_PER_PAGE = 12
+THUMBNAIL_SIZE = 320
+
+# Longest text shown in the raw JSON preview
+PREVIEW_TEXT_CHARS = 2000
+PREVIEW_LIST_ITEMS = 5
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def make_thumbnail(image_id, _img_bytes):
+    """Return a small JPEG of an image, keyed by its id so each image is decoded once."""
     from PIL import Image
-    from io import BytesIO
 
+    image = Image.open(BytesIO(_img_bytes))
+    image.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", quality=80)
+    return buffered.getvalue()
+
+def _image_entry(img_data, image_loader):
+    """Return (image id, bytes, media type, extension) of an image, or None if it is gone."""
+    if isinstance(img_data, dict):
+        # Image descriptor: fetch the bytes on demand
+        entry = image_loader(img_data["id"]) if image_loader else None
+        if entry is None:
+            return None
+        img_bytes, mime_type = entry
+        return img_data["id"], img_bytes, mime_type, img_data["format"]
+
+    # Remove the data URL prefix if present
+    mime_type = "image/jpeg"
+    if img_data.startswith("data:image"):
+        header, img_data = img_data.split(",", 1)
+        mime_type = header[len("data:"):].split(";")[0]
+    img_bytes = base64.b64decode(img_data)
+    # Data URLs carry no id, so the thumbnail is keyed by a hash of the bytes
+    return hashlib.sha256(img_bytes).hexdigest(), img_bytes, mime_type, mime_type.split("/")[1]
+
+@st.fragment
+def _image_gallery(images, image_loader):
+    """One page of thumbnails; changing the page only reruns the gallery."""
+    page_count = (len(images) + IMAGES_PER_PAGE - 1) // IMAGES_PER_PAGE
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"Gallery page (of {page_count})", min_value=1, max_value=page_count,
+                               value=1, key="gallery_page")
+    first = (page - 1) * IMAGES_PER_PAGE
+
+    cols = st.columns(3)
+    for i, img_data in enumerate(images[first:first + IMAGES_PER_PAGE], first):
+        with cols[(i - first) % 3]:
+            try:
+                entry = _image_entry(img_data, image_loader)
+                if entry is None:
+                    st.warning(f"Image {i+1} is no longer available")
+                    continue
+                image_id, img_bytes, mime_type, extension = entry
+
+                caption = f"Image {i+1}"
+                if isinstance(img_data, dict):
+                    caption += f" (page {img_data['page']}, {img_data['width']}x{img_data['height']})"
+                st.image(make_thumbnail(image_id, img_bytes), caption=caption)
+
+                # The full image is only handed over when the button is pressed
+                st.download_button(
+                    label=f"📥 Download Image {i+1}",
+                    data=lambda img_bytes=img_bytes: img_bytes,
+                    file_name=f"extracted_image_{i+1}.{extension}",
+                    mime=mime_type,
+                    key=f"img_{i}"
+                )
+            except Exception as e:
+                st.error(f"Error displaying image {i+1}: {str(e)}")
+
+@st.fragment
+def _text_viewer(text_content, page_count, page_text_loader, preview_loader=None):
+    """Text of one page at a time, next to its preview; the whole text is only sent for download."""
+    if page_text_loader is not None and page_count:
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count,
+                               value=1, key="text_page")
+        page_text = page_text_loader(page)
+        text_column = st
+        if preview_loader is not None:
+            preview_column, text_column = st.columns([1, 2])
+            preview = preview_loader(page)
+            if preview is not None:
+                preview_column.image(preview, caption=f"Page {page}")
+        if page_text.strip():
+            text_column.text_area(f"Text of page {page}", page_text, height=400)
+        else:
+            text_column.info(f"Page {page} has no text.")
+    else:
+        st.text_area("Text Content (first 20,000 characters)", text_content[:20000], height=400)
+
+    st.download_button(
+        label="📥 Download Text",
+        data=lambda: text_content,
+        file_name="extracted_text.txt",
+        mime="text/plain"
+    )
+
+def _json_preview(data):
+    """A copy of the result with long text and lists cut short, cheap to render."""
+    preview = {}
+    for key, value in data.items():
+        if isinstance(value, str) and len(value) > PREVIEW_TEXT_CHARS:
+            value = value[:PREVIEW_TEXT_CHARS] + f"... ({len(value):,} characters)"
+        elif isinstance(value, list) and len(value) > PREVIEW_LIST_ITEMS:
+            value = value[:PREVIEW_LIST_ITEMS] + [f"... ({len(value):,} items)"]
+        preview[key] = value
+    return preview
+
+def display_json(json_data, image_loader=None, page_text_loader=None, preview_loader=None):
+    """
+    Render an extraction result in tabs.
+
+    The result may be a dict, a DocumentResult or JSON text. Images may be
+    inline data URLs or descriptors (image_mode=ref); the bytes
+    of a descriptor are fetched with ``image_loader(image_id)``, which returns
+    (bytes, media type) or None, only when its preview is shown.
+
+    Large results stay responsive: images are shown a page of thumbnails at
+    a time, text one PDF page at a time when ``page_text_loader(page_number)``
+    is given, and the raw JSON as a shortened preview. Full downloads are
+    only produced when their button is pressed. ``preview_loader(page_number)``
+    returns the JPEG preview shown next to a page's text, or None.
+    """
     # Parse JSON if it's a string
-    if isinstance(json_data, str):
+    if hasattr(json_data, "to_dict"):
+        data = json_data.to_dict()
+    elif isinstance(json_data, (str, bytes)):
         try:
             data = json.loads(json_data)
         except json.JSONDecodeError:
@@ -23,12 +157,12 @@ def display_json(json_data):
 
     # Create tabs for different sections
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Summary", "📝 Text Content", "🖼️ Images", "📋 Raw JSON"])
-    
+
     with tab1:
         st.subheader("PDF Processing Summary")
         if "metadata" in data:
             metadata = data["metadata"]
-            
+
             # Display key metrics
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -39,11 +173,11 @@ def display_json(json_data):
             with col3:
                 image_count = len(data.get("images", []))
                 st.metric("Images Found", image_count)
-            
+
             # Display metadata in a nice format
             st.subheader("Document Information")
             col1, col2 = st.columns(2)
-            
+
             with col1:
                 if metadata.get("title"):
                     st.write(f"**Title:** {metadata['title']}")
@@ -51,7 +185,7 @@ def display_json(json_data):
                     st.write(f"**Author:** {metadata['author']}")
                 if metadata.get("subject"):
                     st.write(f"**Subject:** {metadata['subject']}")
-            
+
             with col2:
                 if metadata.get("creator"):
                     st.write(f"**Creator:** {metadata['creator']}")
@@ -59,66 +193,34 @@ def display_json(json_data):
                     st.write(f"**Producer:** {metadata['producer']}")
                 if metadata.get("creationDate"):
                     st.write(f"**Created:** {metadata['creationDate']}")
-    
+
     with tab2:
         st.subheader("Extracted Text Content")
         text_content = data.get("text", "")
         if text_content.strip():
-            st.text_area("Text Content", text_content, height=400)
-            
-            # Add download button for text
-            st.download_button(
-                label="📥 Download Text",
-                data=text_content,
-                file_name="extracted_text.txt",
-                mime="text/plain"
-            )
+            page_count = data.get("metadata", {}).get("pageCount", 0)
+            _text_viewer(text_content, page_count, page_text_loader, preview_loader)
         else:
             st.info("No text content found in the PDF.")
-    
+
     with tab3:
         st.subheader("Extracted Images")
         images = data.get("images", [])
         if images:
             st.write(f"Found {len(images)} image(s) in the PDF:")
-            
-            # Display images in a grid
-            cols = st.columns(3)
-            for i, img_data in enumerate(images):
-                with cols[i % 3]:
-                    try:
-                        # Remove the data URL prefix if present
-                        if img_data.startswith("data:image"):
-                            img_data = img_data.split(",")[1]
-                        
-                        # Decode base64 image
-                        img_bytes = base64.b64decode(img_data)
-                        img = Image.open(BytesIO(img_bytes))
-                        
-                        st.image(img, caption=f"Image {i+1}", use_column_width=True)
-                        
-                        # Add download button for each image
-                        st.download_button(
-                            label=f"📥 Download Image {i+1}",
-                            data=img_bytes,
-                            file_name=f"extracted_image_{i+1}.jpg",
-                            mime="image/jpeg",
-                            key=f"img_{i}"
-                        )
-                    except Exception as e:
-                        st.error(f"Error displaying image {i+1}: {str(e)}")
+            _image_gallery(images, image_loader)
         else:
             st.info("No images found in the PDF.")
-    
+
     with tab4:
         st.subheader("Raw JSON Output")
-        st.json(data)
-        
+        st.caption("Long text and lists are shortened here; the download has the full result.")
+        st.json(_json_preview(data), expanded=False)
+
         # Add download button for JSON
-        json_str = json.dumps(data, indent=2)
         st.download_button(
             label="📥 Download JSON",
-            data=json_str,
+            data=lambda: dumps(data),
             file_name="pdf_extraction_result.json",
             mime="application/json"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,112 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional; br is not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional; zstd is not offered without it
+    zstandard = None
+
+# Preferred first when a client accepts several encodings equally
+PREFERENCE = ("zstd", "br", "gzip")
+
+# Fast settings: responses are compressed on the fly, once per request
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+
+def available_encodings():
+    """Return the content codings this process can produce, preferred first."""
+    return tuple(
+        encoding for encoding in PREFERENCE
+        if encoding == "gzip" or (encoding == "br" and brotli) or (encoding == "zstd" and zstandard)
+    )
+
+
+def _parse_quality(params):
+    for param in params:
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate_encoding(accept_encoding, encodings=None):
+    """
+    Pick a content coding from an Accept-Encoding header, or None for identity.
+
+    The client's quality values decide; ties go to the order of
+    ``encodings`` (available_encodings() by default). ``*`` matches any
+    coding that is not listed.
+    """
+    if not accept_encoding:
+        return None
+    encodings = available_encodings() if encodings is None else encodings
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, *params = item.split(";")
+        name = name.strip().lower()
+        if name:
+            qualities[name] = _parse_quality(params)
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    """Compress a whole body with a content coding from available_encodings()."""
+    if encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+class StreamCompressor:
+    """
+    Incremental compressor for streamed bodies.
+
+    Every compress() call returns output flushed up to the end of the chunk,
+    so a client can decode each record as soon as it arrives; finish()
+    returns the end of the stream.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, data):
+        if self.encoding == "gzip":
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == "gzip":
+            return self._compressor.flush()
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
@@ -0,0 +1,345 @@
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Times a worker whose warm-up fails is replaced and warmed up again; after
+# that a fresh worker is kept without a warm-up
+WARMUP_RETRIES = 2
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool cannot admit more work right now."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Extraction queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PoolClosed(Exception):
+    """Raised when work is submitted to a pool that has been shut down."""
+
+
+class JobTimeout(Exception):
+    """Raised when a job exceeds its time limit and its worker is killed."""
+
+
+class WorkerCrashed(Exception):
+    """Raised when a worker process dies while running a job."""
+
+
+def _worker_main(conn, preload):
+    if preload:
+        # Pay for the PyMuPDF import once per worker instead of once per job
+        import fitz  # noqa: F401
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        fn, args, kwargs = job
+        try:
+            conn.send((True, fn(*args, **kwargs)))
+        except BaseException as e:
+            try:
+                conn.send((False, e))
+            except Exception:
+                # The exception itself could not be pickled
+                conn.send((False, RuntimeError(repr(e))))
+
+
+class _Worker:
+    def __init__(self, ctx, preload):
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, preload),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    A fixed set of worker processes fed from a shared job queue.
+
+    Unlike ``ProcessPoolExecutor`` every job runs in a worker owned by a single
+    dispatcher thread, so a job that exceeds its timeout can be killed and its
+    worker replaced without disturbing jobs running on other workers.
+
+    Args:
+        max_workers: Number of worker processes
+        max_queue: Number of admitted jobs allowed to wait for a free worker
+        job_timeout: Default per-job time limit in seconds (None for no limit)
+        retry_after: Seconds clients are told to wait when the pool is full
+        start_method: multiprocessing start method for the workers
+        preload: Import PyMuPDF in each worker when it starts
+        warmup: Picklable callable run on every new worker before its first
+            job, such as pdf_processor.warm_up; the pool is ready once it
+            has run on every worker, or failed on it WARMUP_RETRIES + 1 times
+    """
+
+    def __init__(self, max_workers, max_queue=0, job_timeout=None, retry_after=5,
+                 start_method="spawn", preload=True, warmup=None):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.job_timeout = job_timeout
+        self.retry_after = retry_after
+        self.start_method = start_method
+        self.preload = preload
+        self.warmup = warmup
+
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._workers = {}
+        self._started = False
+        self._closed = False
+
+        self._admitted = 0
+        self._busy = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._restarts = 0
+        self._warm_workers = set()  # indexes whose worker is done warming up
+        self._warmup_error = None
+        self._ready = threading.Event()
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def ready(self):
+        """True once every worker has started and is done warming up."""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """Wait until the pool is ready; returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    def start(self):
+        """Start the dispatcher threads and their worker processes."""
+        with self._lock:
+            if self._started:
+                return
+            if self._closed:
+                raise PoolClosed("Worker pool has been shut down")
+            self._started = True
+
+        ctx = multiprocessing.get_context(self.start_method)
+        for index in range(self.max_workers):
+            self._workers[index] = _Worker(ctx, self.preload)
+            thread = threading.Thread(
+                target=self._dispatch,
+                args=(index, ctx),
+                name=f"pdf-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self):
+        """Stop accepting work, let running jobs finish and stop the workers."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            started = self._started
+
+        if not started:
+            return
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        for worker in self._workers.values():
+            if worker is not None:
+                worker.stop()
+        self._workers.clear()
+
+    @contextmanager
+    def admit(self, cost=1):
+        """
+        Reserve room in the pool for a unit of work, or raise PoolSaturated.
+
+        A single job is always admitted into an idle pool so that one
+        expensive document cannot be rejected forever.
+        """
+        with self._lock:
+            if self._closed:
+                raise PoolClosed("Worker pool has been shut down")
+            if self._admitted and self._admitted + cost > self.capacity:
+                raise PoolSaturated(self.retry_after)
+            self._admitted += cost
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._admitted -= cost
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` on a worker and return a Future."""
+        return self.submit_job(fn, args, kwargs)
+
+    def submit_job(self, fn, args=(), kwargs=None, timeout=None):
+        """Like submit(), with an explicit per-job timeout override."""
+        if self._closed:
+            raise PoolClosed("Worker pool has been shut down")
+        self.start()
+
+        future = Future()
+        if timeout is None:
+            timeout = self.job_timeout
+        self._jobs.put((future, fn, args, kwargs or {}, timeout))
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "busyWorkers": self._busy,
+                "queueDepth": self._jobs.qsize(),
+                "admitted": self._admitted,
+                "capacity": self.capacity,
+                "completed": self._completed,
+                "failed": self._failed,
+                "timedOut": self._timed_out,
+                "workerRestarts": self._restarts,
+                "readyWorkers": len(self._warm_workers),
+                "warmupError": self._warmup_error
+            }
+
+    def _dispatch(self, index, ctx):
+        self._warm_up(index, ctx)
+
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+
+            future, fn, args, kwargs, timeout = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            worker = self._workers.get(index)
+            if worker is None or not worker.is_alive():
+                worker = self._replace_worker(index, ctx)
+
+            with self._lock:
+                self._busy += 1
+            try:
+                outcome = self._run_job(worker, fn, args, kwargs, timeout)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+            if isinstance(outcome, (JobTimeout, WorkerCrashed)):
+                # The worker is gone or stuck; kill it and start a fresh one
+                worker.kill()
+                self._workers[index] = None
+                with self._lock:
+                    if isinstance(outcome, JobTimeout):
+                        self._timed_out += 1
+                    self._failed += 1
+                future.set_exception(outcome)
+                continue
+
+            ok, value = outcome
+            with self._lock:
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _run_job(self, worker, fn, args, kwargs, timeout):
+        try:
+            worker.conn.send((fn, args, kwargs))
+        except (OSError, ValueError) as e:
+            return WorkerCrashed(f"Worker process is unavailable: {e}")
+        except Exception as e:
+            # The job itself could not be pickled; the worker is still fine
+            return (False, e)
+
+        try:
+            if not worker.conn.poll(timeout):
+                return JobTimeout(f"Job exceeded the {timeout}s time limit")
+            return worker.conn.recv()
+        except (EOFError, OSError) as e:
+            return WorkerCrashed(f"Worker process died: {e!r}")
+
+    def _warm_up(self, index, ctx):
+        """
+        Run the warm-up on worker ``index``, a first or a replacement one.
+
+        A worker whose warm-up fails (it raises, times out or kills the
+        worker) is replaced and warmed up again, up to WARMUP_RETRIES times.
+        After that a fresh worker is kept without a warm-up: the pool still
+        becomes ready, and ``warmupError`` in stats() tells why.
+        """
+        for _ in range(WARMUP_RETRIES + 1):
+            error = self._run_warm_up(self._workers[index])
+            if error is None:
+                break
+            with self._lock:
+                self._warmup_error = error
+            # The worker may be dead, stuck or half initialized
+            self._new_worker(index, ctx)
+
+        with self._lock:
+            self._warm_workers.add(index)
+            if len(self._warm_workers) == self.max_workers:
+                self._ready.set()
+
+    def _run_warm_up(self, worker):
+        """Run the warm-up on a worker; returns an error message if it failed."""
+        if self.warmup is None:
+            return None
+        outcome = self._run_job(worker, self.warmup, (), {}, self.job_timeout)
+        if isinstance(outcome, (JobTimeout, WorkerCrashed)):
+            return str(outcome)
+        ok, value = outcome
+        return None if ok else f"Warm-up failed: {value!r}"
+
+    def _new_worker(self, index, ctx):
+        old = self._workers.get(index)
+        if old is not None:
+            old.kill()
+        self._workers[index] = _Worker(ctx, self.preload)
+        with self._lock:
+            self._restarts += 1
+
+    def _replace_worker(self, index, ctx):
+        self._new_worker(index, ctx)
+        self._warm_up(index, ctx)
+        return self._workers[index]
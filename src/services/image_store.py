@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+
+
+class ImageStore:
+    """
+    Bounded in-memory store for extracted image bytes.
+
+    Images are keyed by document id and image id and evicted least recently
+    used first once the byte budget is exceeded.
+
+    Args:
+        max_bytes: Total size of image bytes kept in memory
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._images = OrderedDict()
+        self._size = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def put(self, doc_id, image_id, data, media_type):
+        """Store the bytes of an image; images larger than the budget are dropped."""
+        if len(data) > self.max_bytes:
+            return
+        key = (doc_id, image_id)
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._images[key] = (data, media_type)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._images.popitem(last=False)
+                self._size -= len(evicted)
+                self._evictions += 1
+
+    def put_images(self, doc_id, images):
+        """Store a list of ExtractedImage under their ids."""
+        for image in images or ():
+            self.put(doc_id, image.id, image.data, image.media_type)
+
+    def get(self, doc_id, image_id):
+        """Return (bytes, media type) for an image, or None."""
+        with self._lock:
+            entry = self._images.get((doc_id, image_id))
+            if entry is None:
+                self._misses += 1
+                return None
+            self._images.move_to_end((doc_id, image_id))
+            self._hits += 1
+            return entry
+
+    def has_all(self, doc_id, descriptors):
+        """Return True if every described image of a document is still stored."""
+        with self._lock:
+            return all((doc_id, descriptor["id"]) in self._images for descriptor in descriptors)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "bytes": self._size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
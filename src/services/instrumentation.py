@@ -0,0 +1,165 @@
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# The Timings of the extraction running in the current thread or task, if any
+_current = ContextVar("pdf_timings", default=None)
+
+_NOOP = nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+
+
+class Timings:
+    """
+    Per-stage durations and counters of one extraction.
+
+    Stages accumulate seconds and calls (for example every ``text`` call of
+    every page); counters hold totals such as pages and image bytes. Timings
+    recorded in worker processes are merged into the request's Timings.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, calls=1):
+        with self._lock:
+            total = self.stages.get(name)
+            if total is None:
+                self.stages[name] = [seconds, calls]
+            else:
+                total[0] += seconds
+                total[1] += calls
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def merge(self, other):
+        for name, (seconds, calls) in other.stages.items():
+            self.add(name, seconds, calls)
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "stages": {
+                    name: {"seconds": round(seconds, 6), "calls": calls}
+                    for name, (seconds, calls) in self.stages.items()
+                },
+                "counters": dict(self.counters)
+            }
+
+    def server_timing(self):
+        """Return the stages as a Server-Timing header value, in milliseconds."""
+        with self._lock:
+            return ", ".join(
+                f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in self.stages.items()
+            )
+
+    def __getstate__(self):
+        return {"stages": self.stages, "counters": self.counters}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.stages = state["stages"]
+        self.counters = state["counters"]
+
+
+@contextmanager
+def recording(timings):
+    """Record stages and counters into ``timings`` (or nothing if None) within the block."""
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def stage(name):
+    """
+    Time a block as stage ``name`` of the current extraction.
+
+    Returns a shared no-op context manager when nothing is being recorded, so
+    an unmeasured extraction only pays for a context variable lookup.
+    """
+    timings = _current.get()
+    if timings is None:
+        return _NOOP
+    return _StageTimer(timings, name)
+
+
+def count(name, n=1):
+    """Add n to counter ``name`` of the current extraction, if one is being recorded."""
+    timings = _current.get()
+    if timings is not None:
+        timings.count(name, n)
+
+
+def current_timings():
+    return _current.get()
+
+
+def _run_timed(fn, args, kwargs):
+    with recording(Timings()) as timings:
+        result = fn(*args, **kwargs)
+    return result, timings
+
+
+class TimedExecutor:
+    """
+    Executor wrapper recording Timings inside each job.
+
+    Jobs run under their own Timings in the worker; when a job finishes its
+    Timings are merged into ``timings`` and its result is returned as usual.
+    Cancelling a returned future cancels the underlying job.
+    """
+
+    def __init__(self, executor, timings):
+        self.executor = executor
+        self.timings = timings
+
+    def submit(self, fn, *args, **kwargs):
+        inner = self.executor.submit(_run_timed, fn, args, kwargs)
+        outer = Future()
+
+        def forward_cancel(future):
+            if future.cancelled():
+                inner.cancel()
+
+        def forward_result(future):
+            try:
+                if future.cancelled():
+                    outer.cancel()
+                elif future.exception() is not None:
+                    outer.set_exception(future.exception())
+                else:
+                    result, timings = future.result()
+                    self.timings.merge(timings)
+                    outer.set_result(result)
+            except InvalidStateError:
+                pass  # the caller cancelled in the meantime
+
+        outer.add_done_callback(forward_cancel)
+        inner.add_done_callback(forward_result)
+        return outer
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL,
+    page_count INTEGER,
+    pages_processed INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+)
+"""
+
+
+class JobStore:
+    """
+    Local store for asynchronous extraction jobs.
+
+    Job state lives in a SQLite database and results are written as files
+    next to it, so nothing beyond the local disk is needed. Finished jobs
+    are removed ``ttl_seconds`` after they finish by purge_expired().
+
+    Cancellation is signalled with a marker file per job (see cancel_path),
+    which worker processes can check between pages without opening the
+    database.
+
+    Args:
+        directory: Directory holding the database, results and cancel markers
+        ttl_seconds: How long finished jobs and their results are kept
+    """
+
+    def __init__(self, directory, ttl_seconds=3600):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._db_path = os.path.join(directory, "jobs.sqlite3")
+        self._lock = threading.Lock()
+        self._purged = 0
+
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+
+    def create(self):
+        """Create a queued job and return it."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def start(self, job_id):
+        """Mark a queued job as running; returns False if it was cancelled meanwhile."""
+        return self._transition(job_id, RUNNING, (QUEUED,))
+
+    def set_progress(self, job_id, pages_processed, page_count):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET pages_processed = ?, page_count = ?, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (pages_processed, page_count, time.time(), job_id, RUNNING)
+            )
+
+    def complete(self, job_id, result, page_count=None):
+        """
+        Store the result bytes of a job and mark it completed, with all its
+        pages processed; ``page_count`` sets their number for a job that
+        never reported progress, such as one answered from a cache.
+        """
+        path = self.result_path(job_id)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(result)
+        os.replace(temp_path, path)
+        if not self._transition(job_id, COMPLETED, ACTIVE_STATUSES, all_pages_done=True, page_count=page_count):
+            # Cancelled while the result was being written
+            self._remove_files(job_id)
+            return False
+        return True
+
+    def fail(self, job_id, error):
+        return self._transition(job_id, FAILED, ACTIVE_STATUSES, error=error)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job and return it.
+
+        The cancel marker is created first so workers stop at their next page.
+        Finished jobs are returned unchanged.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return job
+        open(self.cancel_path(job_id), 'a').close()
+        self._transition(job_id, CANCELLED, ACTIVE_STATUSES)
+        return self.get(job_id)
+
+    def is_cancelled(self, job_id):
+        return os.path.exists(self.cancel_path(job_id))
+
+    def delete(self, job_id):
+        """Remove a job and its files."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self._remove_files(job_id)
+
+    def result_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.result.json")
+
+    def cancel_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.cancel")
+
+    def recover(self):
+        """
+        Fail jobs left queued or running by a previous process.
+
+        Their uploads were temporary files, so they cannot be resumed.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? "
+                "WHERE status IN (?, ?)",
+                (FAILED, "Interrupted by a server restart", time.time(), time.time(), *ACTIVE_STATUSES)
+            )
+            return cursor.rowcount
+
+    def purge_expired(self, now=None):
+        """Remove jobs that finished more than ttl_seconds ago; returns the number removed."""
+        cutoff = (now or time.time()) - self.ttl_seconds
+        with self._connect() as conn:
+            expired = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+            )]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+        for job_id in expired:
+            self._remove_files(job_id)
+        with self._lock:
+            self._purged += len(expired)
+        return len(expired)
+
+    def stats(self):
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        with self._lock:
+            purged = self._purged
+        return {
+            QUEUED: counts.get(QUEUED, 0),
+            RUNNING: counts.get(RUNNING, 0),
+            COMPLETED: counts.get(COMPLETED, 0),
+            FAILED: counts.get(FAILED, 0),
+            CANCELLED: counts.get(CANCELLED, 0),
+            "purged": purged
+        }
+
+    def _transition(self, job_id, status, from_statuses, error=None, all_pages_done=False, page_count=None):
+        now = time.time()
+        finished_at = now if status in FINISHED_STATUSES else None
+        placeholders = ", ".join("?" for _ in from_statuses)
+        pages = ""
+        page_params = ()
+        if all_pages_done and page_count is not None:
+            pages = ", page_count = ?, pages_processed = ?"
+            page_params = (page_count, page_count)
+        elif all_pages_done:
+            pages = ", pages_processed = COALESCE(page_count, pages_processed)"
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ?{pages} "
+                f"WHERE id = ? AND status IN ({placeholders})",
+                (status, error, finished_at, now, *page_params, job_id, *from_statuses)
+            )
+            return cursor.rowcount == 1
+
+    def _remove_files(self, job_id):
+        for path in (self.result_path(job_id), self.cancel_path(job_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _connect(self):
+        # Autocommit mode; every statement is its own transaction
+        conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)
+
@@ -0,0 +1,215 @@
+import base64
+from dataclasses import dataclass
+
+from services.serialization import dumps, dumps_as
+
+IMAGE_MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpx": "image/jp2",
+    "tiff": "image/tiff",
+    "bmp": "image/bmp",
+    "gif": "image/gif",
+}
+
+def image_mime_type(image_format):
+    return IMAGE_MIME_TYPES.get(image_format, f"image/{image_format}")
+
+@dataclass(slots=True)
+class ExtractedImage:
+    """
+    An image extracted from a page.
+
+    ``id`` is derived from the encoded bytes in ``data``, so it is stable for
+    the same image and options and can double as an HTTP ETag; ``hash`` is
+    the hash of the embedded source bytes used for de-duplication.
+    """
+    id: str
+    hash: str
+    page: int
+    xref: int
+    format: str
+    width: int
+    height: int
+    data: bytes
+
+    @property
+    def media_type(self):
+        return image_mime_type(self.format)
+
+    def data_url(self):
+        """Return the image as a base64 data URL."""
+        return f"data:{self.media_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+    def descriptor(self):
+        """Describe the image without its bytes."""
+        return {
+            "id": self.id,
+            "page": self.page,
+            "xref": self.xref,
+            "width": self.width,
+            "height": self.height,
+            "format": self.format,
+            "byteSize": len(self.data),
+            "hash": self.hash
+        }
+
+    def to_json(self, image_mode="inline"):
+        """
+        Return the serializable form of the image: a data URL, a descriptor
+        with image_mode="ref", or a descriptor plus the raw bytes as ``data``
+        with image_mode="binary" (for MessagePack and CBOR).
+        """
+        if image_mode == "ref":
+            return self.descriptor()
+        if image_mode == "binary":
+            return {**self.descriptor(), "data": self.data}
+        return self.data_url()
+
+@dataclass(slots=True)
+class PagePreview:
+    """
+    A low-resolution rendering of a page.
+
+    Previews are rendered straight at ``width`` pixels; the height follows
+    the page's aspect ratio.
+    """
+    page: int
+    width: int
+    height: int
+    data: bytes
+    format: str = "jpeg"
+
+    @property
+    def media_type(self):
+        return image_mime_type(self.format)
+
+    def data_url(self):
+        """Return the preview as a base64 data URL."""
+        return f"data:{self.media_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+    def descriptor(self):
+        """Describe the preview without its bytes."""
+        return {
+            "page": self.page,
+            "width": self.width,
+            "height": self.height,
+            "format": self.format,
+            "byteSize": len(self.data)
+        }
+
+    def to_json(self, image_mode="inline"):
+        """Return the serializable form of the preview, like ExtractedImage.to_json."""
+        if image_mode == "ref":
+            return self.descriptor()
+        if image_mode == "binary":
+            return {**self.descriptor(), "data": self.data}
+        return self.data_url()
+
+@dataclass(slots=True)
+class PageResult:
+    """
+    The extraction result for one page.
+
+    Fields that were not requested are None. ``images`` only holds images not
+    already returned for an earlier page of the same document. ``reused`` is
+    True when the page came from a PageMemo instead of being extracted;
+    previews are always rendered.
+    """
+    index: int
+    text: str = None
+    images: list = None
+    links: list = None
+    preview: PagePreview = None
+    reused: bool = False
+
+    @property
+    def number(self):
+        return self.index + 1
+
+    def to_dict(self, image_mode="inline"):
+        record = {"page": self.number}
+        if self.text is not None:
+            record["text"] = self.text
+        if self.images is not None:
+            record["images"] = [image.to_json(image_mode) for image in self.images]
+        if self.links is not None:
+            record["links"] = self.links
+        if self.preview is not None:
+            record["preview"] = self.preview.to_json(image_mode)
+        return record
+
+@dataclass(slots=True)
+class DocumentResult:
+    """
+    The extraction result for a whole document.
+
+    Fields that were not requested are None and are left out of to_dict().
+    ``pages`` lists the 1-based numbers of the extracted pages when a page
+    selection was given. ``page_offsets`` holds a (page number, offset)
+    pair for where each page starts in ``text``; it is not serialized.
+    ``page_reuse`` counts the pages that were reused from a PageMemo or
+    freshly extracted, when a memo was used.
+    """
+    text: str = None
+    metadata: dict = None
+    images: list = None
+    outline: list = None
+    links: list = None
+    previews: list = None
+    pages: list = None
+    document_id: str = None
+    page_offsets: list = None
+    page_reuse: dict = None
+
+    def iter_page_text(self):
+        """Yield (page number, text) for every extracted page, sliced from ``text``."""
+        offsets = self.page_offsets or []
+        for i, (number, start) in enumerate(offsets):
+            # Pages are joined with a newline, which is not part of either page
+            end = offsets[i + 1][1] - 1 if i + 1 < len(offsets) else len(self.text)
+            yield number, self.text[start:end]
+
+    def to_dict(self, image_mode="inline"):
+        """
+        Return the JSON-ready result.
+
+        Images and page previews are inline data URLs, or descriptors with
+        image_mode="ref"; the caller is then responsible for serving their bytes.
+        """
+        result = {}
+        if self.document_id is not None:
+            result["documentId"] = self.document_id
+        if self.text is not None:
+            result["text"] = self.text
+        if self.metadata is not None:
+            result["metadata"] = self.metadata
+        if self.images is not None:
+            result["images"] = [image.to_json(image_mode) for image in self.images]
+        if self.outline is not None:
+            result["outline"] = self.outline
+        if self.links is not None:
+            result["links"] = self.links
+        if self.previews is not None:
+            result["previews"] = [preview.to_json(image_mode) for preview in self.previews]
+        if self.pages is not None:
+            result["pages"] = self.pages
+        if self.page_reuse is not None:
+            result["pageReuse"] = self.page_reuse
+        return result
+
+    def to_json(self, image_mode="inline"):
+        """Serialize the result to JSON bytes."""
+        return dumps(self.to_dict(image_mode))
+
+    def to_bytes(self, output_format="json", image_mode="inline"):
+        """
+        Serialize the result as "json", "msgpack" or "cbor" (see
+        serialization.dumps_as); the binary formats carry inline images as
+        raw bytes instead of base64 data URLs.
+        """
+        if output_format == "json":
+            return self.to_json(image_mode)
+        return dumps_as(self.to_dict("binary" if image_mode == "inline" else image_mode), output_format)
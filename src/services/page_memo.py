@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+
+from services.serialization import dumps, loads
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    meta TEXT,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memo_used ON memo (used);
+"""
+
+# Pending writes are flushed in one transaction once they reach this size
+_FLUSH_BYTES = 8 * 1024 * 1024
+
+
+class PageMemo:
+    """
+    Disk-backed memo of page text and encoded images, shared by processes.
+
+    Entries are keyed by content hashes computed by the extractor (see
+    pdf_processor._page_fingerprint), so a revised document only extracts
+    the pages and images that changed. Every process opens the SQLite
+    database itself; instances pickle to just their settings, so they can
+    travel to worker processes inside ExtractionOptions.
+
+    Writes are buffered and committed by flush(), which the extractor calls
+    after each run of pages. The least recently used entries are evicted
+    once the database holds more than ``max_bytes`` of values. Database
+    errors are not raised: lookups miss and pending entries are dropped.
+
+    Args:
+        path: SQLite database file, created if missing
+        max_bytes: Budget for the stored text and image bytes
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = {}
+        self._pending_size = 0
+        self._used = set()
+
+    def get_text(self, key):
+        """Return the memoized text for a key, or None."""
+        row = self._get(key)
+        return row[0].decode("utf-8") if row is not None else None
+
+    def put_text(self, key, text):
+        self._put(key, text.encode("utf-8"), None)
+
+    def get_image(self, key):
+        """Return (metadata dict, bytes) of a memoized image, or None."""
+        row = self._get(key)
+        return (loads(row[1]), row[0]) if row is not None else None
+
+    def put_image(self, key, meta, data):
+        self._put(key, data, dumps(meta).decode("utf-8"))
+
+    def flush(self):
+        """Commit pending entries, record which entries were used and evict over budget."""
+        with self._lock:
+            pending, self._pending, self._pending_size = self._pending, {}, 0
+            used, self._used = self._used, set()
+            if not pending and not used:
+                return
+            now = time.time()
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error:
+                return
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO memo (key, value, meta, size, used) VALUES (?, ?, ?, ?, ?)",
+                    [(key, value, meta, len(value), now) for key, (value, meta) in pending.items()]
+                )
+                conn.executemany("UPDATE memo SET used = ? WHERE key = ?",
+                                 [(now, key) for key in used - pending.keys()])
+                if pending:
+                    self._evict(conn)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM memo").fetchone()
+        return {"entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __getstate__(self):
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _get(self, key):
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending
+            try:
+                row = self._connect().execute("SELECT value, meta FROM memo WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is not None:
+                self._used.add(key)
+            return row
+
+    def _put(self, key, value, meta):
+        with self._lock:
+            if len(value) > self.max_bytes:
+                return
+            self._pending[key] = (value, meta)
+            self._pending_size += len(value)
+            full = self._pending_size >= _FLUSH_BYTES
+        if full:
+            self.flush()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM memo").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM memo ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            keys.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM memo WHERE key = ?", keys)
+
+    def _connect(self):
+        # One connection per instance; autocommit mode, writes open their own transactions
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
@@ -1,79 +1,1083 @@
-def process_pdf(pdf_file):
+import hashlib
+import re
+from dataclasses import dataclass, asdict, replace
+
+from services.models import DocumentResult, PageResult, ExtractedImage, PagePreview, image_mime_type  # noqa: F401
+from services.instrumentation import stage, count
+from services.serialization import dumps
+
+# Parts of the result that can be requested; the page fields need per-page work
+ALL_FIELDS = frozenset(("text", "metadata", "images", "outline", "links", "previews"))
+PAGE_FIELDS = frozenset(("text", "images", "links", "previews"))
+DEFAULT_FIELDS = frozenset(("text", "metadata", "images"))
+
+# Low-memory mode: pages extracted before the document is reopened, and result
+# bytes kept in memory before they spill to a temporary file
+LOW_MEMORY_BATCH_PAGES = 500
+SPILL_BYTES = 16 * 1024 * 1024
+
+# Page previews: requested widths are rounded up to one of these, so a
+# handful of renderings per page serve every client
+PREVIEW_WIDTHS = (128, 256, 512, 1024)
+PREVIEW_QUALITY = 75
+# Pages taller than this many times their width are previewed at a smaller width
+PREVIEW_MAX_ASPECT = 4
+
+class PDFProcessingError(Exception):
+    """Raised when a PDF cannot be processed."""
+
+class InvalidPDFError(PDFProcessingError):
+    """Raised when the input is not a PDF that can be opened, or is encrypted."""
+
+class ExtractionCancelled(PDFProcessingError):
+    """Raised between pages once the extraction's cancel marker file exists."""
+
+class ResourceLimitExceeded(PDFProcessingError):
+    """Raised when a document exceeds one of its ResourceLimits."""
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """
+    Hard limits protecting workers from huge or hostile documents.
+
+    Page and pixel limits are checked by the pre-flight estimate right after
+    the document is opened, so an oversized document fails before any page
+    is extracted. None or 0 disables a limit.
+
+    Args:
+        max_pages: Selected pages per document
+        max_image_pixels: Declared pixels of all unique images on the
+            selected pages
+        max_single_image_pixels: Pixels of one image, checked against both
+            its declared and its decoded size before it is decompressed
+        max_output_bytes: Text characters plus image bytes produced, before
+            JSON and base64 encoding
+        max_seconds: Wall time of one extraction, checked between pages
+        engine_memory_bytes: Resident memory of the extracting process
+            above which MuPDF's store is emptied, checked between pages; it
+            never fails an extraction
+    """
+    max_pages: int = None
+    max_image_pixels: int = None
+    max_single_image_pixels: int = None
+    max_output_bytes: int = None
+    max_seconds: float = None
+    engine_memory_bytes: int = None
+
+    def check_cost(self, cost):
+        """Raise ResourceLimitExceeded if a pre-flight estimate is over a limit."""
+        if self.max_pages and cost["pages"] > self.max_pages:
+            raise ResourceLimitExceeded(
+                f"Document has {cost['pages']} pages to extract; the limit is {self.max_pages}")
+        if self.max_image_pixels and cost["imagePixels"] > self.max_image_pixels:
+            raise ResourceLimitExceeded(
+                f"Document images total {cost['imagePixels']:,} pixels; the limit is {self.max_image_pixels:,}")
+        self.check_image_size(cost["largestImagePixels"])
+
+    def check_image_size(self, pixels):
+        if self.max_single_image_pixels and pixels > self.max_single_image_pixels:
+            raise ResourceLimitExceeded(
+                f"Document contains an image of {pixels:,} pixels; the limit is {self.max_single_image_pixels:,}")
+
+    def deadline(self):
+        """Return the time.time() at which an extraction starting now must stop, or None."""
+        import time
+        return time.time() + self.max_seconds if self.max_seconds else None
+
+NO_LIMITS = ResourceLimits()
+
+@dataclass(frozen=True)
+class ExtractionOptions:
+    """
+    Settings that change what the extraction produces.
+
+    Args:
+        image_format: "jpeg", "png", "webp", or "original" to keep the
+            embedded image format
+        image_quality: Encoder quality for JPEG and WebP output
+        max_image_dimension: Downscale images whose width or height exceeds
+            this many pixels (None keeps the original size)
+        thumbnails_only: Emit only thumbnails of thumbnail_size pixels
+        thumbnail_size: Longest side of a thumbnail in pixels
+        min_image_size: Skip images narrower or shorter than this many
+            pixels, such as masks and 1x1 spacers
+        fields: Parts of the result to produce, out of ALL_FIELDS
+        pages: 0-based (start, stop) page ranges from parse_page_ranges, or
+            None for every page
+        limits: ResourceLimits; they do not change a successful result, so
+            they are left out of to_dict()
+        memo: Optional PageMemo reusing the text and images of pages
+            extracted before; left out of to_dict() as well
+        preview_width: Width in pixels of the page previews, one of
+            PREVIEW_WIDTHS (see round_preview_width)
+    """
+    image_format: str = "jpeg"
+    image_quality: int = 70
+    max_image_dimension: int = None
+    thumbnails_only: bool = False
+    thumbnail_size: int = 256
+    min_image_size: int = 8
+    fields: frozenset = DEFAULT_FIELDS
+    pages: tuple = None
+    limits: ResourceLimits = NO_LIMITS
+    memo: object = None
+    preview_width: int = 256
+
+    def to_dict(self):
+        # The memo is dropped first so asdict() does not copy it
+        data = asdict(replace(self, memo=None))
+        del data["limits"]
+        del data["memo"]
+        data["fields"] = sorted(self.fields)
+        data["pages"] = [list(page_range) for page_range in self.pages] if self.pages is not None else None
+        return data
+
+    @property
+    def page_fields(self):
+        """The requested fields that need per-page work."""
+        return self.fields & PAGE_FIELDS
+
+    def selected_pages(self, page_count):
+        """Return the sorted 0-based indexes of the requested pages that exist."""
+        if not self.page_fields:
+            return []
+        if self.pages is None:
+            return list(range(page_count))
+        selected = set()
+        for start, stop in self.pages:
+            selected.update(range(start, min(stop or page_count, page_count)))
+        return sorted(selected)
+
+DEFAULT_OPTIONS = ExtractionOptions()
+
+def parse_fields(spec):
+    """Parse a comma separated field list such as "text,metadata"."""
+    fields = frozenset(field.strip() for field in spec.split(",") if field.strip())
+    unknown = fields - ALL_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                         f"Choose from: {', '.join(sorted(ALL_FIELDS))}")
+    if not fields:
+        raise ValueError("At least one field must be requested")
+    return fields
+
+def round_preview_width(width):
+    """Round a requested preview width up to the nearest of PREVIEW_WIDTHS (or down to the largest)."""
+    for bucket in PREVIEW_WIDTHS:
+        if width <= bucket:
+            return bucket
+    return PREVIEW_WIDTHS[-1]
+
+def parse_page_ranges(spec):
+    """
+    Parse 1-based page ranges such as "1-10,50,90-" into 0-based (start, stop) pairs.
+
+    ``stop`` is exclusive, or None for a range that runs to the last page.
+    """
+    page_ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                first, last = part.split("-", 1)
+                start = int(first)
+                stop = int(last) if last.strip() else None
+            else:
+                start = stop = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part!r}")
+        if start < 1 or (stop is not None and stop < start):
+            raise ValueError(f"Invalid page range: {part!r}")
+        page_ranges.append((start - 1, stop))
+    if not page_ranges:
+        raise ValueError("No pages selected")
+    return tuple(page_ranges)
+
+def _open_document(pdf_file):
     import fitz  # PyMuPDF
-    import json
-    import base64
-    import hashlib
-    from io import BytesIO
-    from PIL import Image
 
-    result = {
-        "text": "",
-        "metadata": {},
-        "images": []
+    try:
+        with stage("open"):
+            # Handle raw bytes, file path strings and Streamlit UploadedFile objects
+            if isinstance(pdf_file, (bytes, bytearray)):
+                doc = fitz.open(stream=pdf_file, filetype="pdf")
+            elif hasattr(pdf_file, 'read'):
+                # It's a Streamlit UploadedFile object
+                doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
+            else:
+                # It's a file path string
+                doc = fitz.open(pdf_file)
+    except RuntimeError as e:
+        # The message may name a temporary file, so it is not passed on
+        raise InvalidPDFError("Cannot open PDF: the file is damaged or not a PDF") from e
+
+    if doc.needs_pass:
+        doc.close()
+        raise InvalidPDFError("PDF is encrypted")
+    return doc
+
+def _document_metadata(doc):
+    metadata = doc.metadata
+    return {
+        "pageCount": len(doc),
+        "title": metadata.get("title", ""),
+        "author": metadata.get("author", ""),
+        "subject": metadata.get("subject", ""),
+        "creator": metadata.get("creator", ""),
+        "producer": metadata.get("producer", ""),
+        "creationDate": metadata.get("creationDate", ""),
+        "modificationDate": metadata.get("modDate", "")
     }
 
+def _document_outline(doc):
+    return [
+        {"level": level, "title": title, "page": page}
+        for level, title, page in doc.get_toc(simple=True)
+    ]
+
+def _page_links(page, index):
+    links = []
+    for link in page.get_links():
+        rect = link.get("from")
+        entry = {"page": index + 1, "rect": [rect.x0, rect.y0, rect.x1, rect.y1] if rect else None}
+        if link.get("uri"):
+            entry["uri"] = link["uri"]
+        elif link.get("page", -1) >= 0:
+            entry["targetPage"] = link["page"] + 1
+        else:
+            continue
+        links.append(entry)
+    return links
+
+# Dictionary keys that lead from resources back up the page tree. /P only
+# does so on annotations; elsewhere it can be an ordinary resource name
+_BACK_REFERENCE = re.compile(r"/Parent\s+\d+\s+\d+\s+R")
+_ANNOTATION_PAGE_REFERENCE = re.compile(r"/P\s+\d+\s+\d+\s+R")
+_REFERENCE = re.compile(r"(\d+)\s+\d+\s+R")
+
+def _object_hash(doc, xref, object_hashes):
+    """
+    Hash a PDF object by content, with every reference replaced by the hash of
+    the object it points to.
+
+    Objects keep their hash when a revision renumbers them, and an object
+    changes its hash whenever anything it refers to changes. Stream data is
+    hashed as stored, without decompressing it. ``object_hashes`` memoizes
+    the hashes of one document.
+    """
+    digest = object_hashes.get(xref)
+    if digest is None:
+        object_hashes[xref] = b"cycle"  # placeholder while the object's references are hashed
+        source = doc.xref_object(xref, compressed=True)
+        if _is_annotation(doc, xref):
+            source = _ANNOTATION_PAGE_REFERENCE.sub("", source)
+        sha = hashlib.sha256(_resolve_references(doc, source, object_hashes))
+        if doc.xref_is_stream(xref):
+            sha.update(doc.xref_stream_raw(xref) or b"")
+        digest = object_hashes[xref] = sha.digest()
+    return digest
+
+def _is_annotation(doc, xref):
+    # /Type is optional on annotations, but every one has a /Rect, which forms and images do not
+    return doc.xref_get_key(xref, "Type")[1] == "/Annot" or doc.xref_get_key(xref, "Rect")[0] != "null"
+
+def _resolve_references(doc, source, object_hashes):
+    source = _BACK_REFERENCE.sub("", source)
+    return _REFERENCE.sub(lambda match: _object_hash(doc, int(match.group(1)), object_hashes).hex(),
+                          source).encode("utf-8")
+
+def _page_fingerprint(doc, page, object_hashes):
+    """
+    Hash everything the text of a page depends on.
+
+    That is its content streams, its resources (fonts, images and forms,
+    inherited ones included), its boxes and its rotation. Returns None when
+    the page structure cannot be read, so the page is extracted as usual.
+    """
+    try:
+        sha = hashlib.sha256(repr((tuple(page.mediabox), tuple(page.cropbox), page.rotation)).encode("ascii"))
+        for xref in page.get_contents():
+            sha.update(_object_hash(doc, xref, object_hashes))
+
+        # Resources can be inherited from an ancestor in the page tree
+        xref = page.xref
+        kind, value = doc.xref_get_key(xref, "Resources")
+        for _ in range(32):
+            if kind != "null":
+                break
+            kind, parent = doc.xref_get_key(xref, "Parent")
+            if kind != "xref":
+                break
+            xref = int(parent.split()[0])
+            kind, value = doc.xref_get_key(xref, "Resources")
+        sha.update(_resolve_references(doc, value, object_hashes))
+        return sha.digest()
+    except Exception:
+        return None
+
+def _memo_key(kind, digest, settings=()):
+    """Key of a PageMemo entry; MuPDF's version is part of it because its output can change."""
+    import fitz
+
+    return hashlib.sha256(repr((kind, fitz.VersionBind, settings)).encode("utf-8") + digest).hexdigest()
+
+def _image_memo_key(doc, xref, object_hashes, options):
+    """Key of an image encoded with the options' image settings, or None if its stream cannot be read."""
+    settings = (options.image_format, options.image_quality, options.max_image_dimension,
+                options.thumbnails_only, options.thumbnail_size)
     try:
-        # Handle both file path strings and Streamlit UploadedFile objects
-        if hasattr(pdf_file, 'read'):
-            # It's a Streamlit UploadedFile object
-            pdf_bytes = pdf_file.read()
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        return _memo_key("image", _object_hash(doc, xref, object_hashes), settings)
+    except Exception:
+        return None
+
+def _jpeg_components(data):
+    """Return the number of colour components in a JPEG's frame header, or None if it has none."""
+    position = 2  # after the SOI marker
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:  # fill byte
+            position += 1
+            continue
+        # Start of frame markers, except DHT, JPG and DAC which share the range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return data[position + 9] if position + 9 < len(data) else None
+        position += 2 + int.from_bytes(data[position + 2:position + 4], "big")
+    return None
+
+def _encode_image(doc, xref, info, options):
+    """Return (source bytes, output bytes, format, width, height) for an image xref."""
+    from io import BytesIO
+    from PIL import Image
+
+    width, height, colorspace, image_filter = info[2], info[3], info[5], info[8]
+    max_dimension = options.thumbnail_size if options.thumbnails_only else options.max_image_dimension
+    needs_resize = bool(max_dimension) and max(width, height) > max_dimension
+
+    # JPEG streams are passed through untouched when no conversion is needed.
+    # Browsers show CMYK JPEGs with wrong colours, and the colour space name
+    # does not always tell (ICCBased, Indexed), so the stream's own component
+    # count decides
+    if (image_filter == "DCTDecode" and options.image_format in ("jpeg", "original")
+            and not needs_resize and "CMYK" not in colorspace):
+        with stage("image_extract"):
+            data = doc.xref_stream_raw(xref)
+        if _jpeg_components(data) in (1, 3):
+            return data, data, "jpeg", width, height
+
+    with stage("image_extract"):
+        base_image = doc.extract_image(xref)
+    source = base_image["image"]
+    if options.image_format == "original" and not needs_resize:
+        return source, source, base_image["ext"], base_image["width"], base_image["height"]
+
+    with stage("image_encode"):
+        try:
+            image = Image.open(BytesIO(source))
+        except Image.DecompressionBombError as e:
+            raise ResourceLimitExceeded(f"Image {xref} is too large to decode safely") from e
+        # The decoded size can differ from the size the PDF declares
+        options.limits.check_image_size(image.width * image.height)
+        if needs_resize:
+            # draft() lets the JPEG decoder scale down while decoding
+            image.draft("RGB", (max_dimension, max_dimension))
+            image.thumbnail((max_dimension, max_dimension))
+
+        output_format = base_image["ext"] if options.image_format == "original" else options.image_format
+        output_format = "jpeg" if output_format == "jpg" else output_format
+        if output_format == "jpeg":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            image = image.convert("RGBA" if "A" in image.mode else "RGB")
+
+        buffered = BytesIO()
+        if output_format in ("jpeg", "webp"):
+            image.save(buffered, format=output_format.upper(), quality=options.image_quality)
         else:
-            # It's a file path string
-            doc = fitz.open(pdf_file)
-        
-        page_count = len(doc)
-        result["metadata"]["pageCount"] = page_count
-        
-        # Extract additional metadata
-        metadata = doc.metadata
-        result["metadata"].update({
-            "title": metadata.get("title", ""),
-            "author": metadata.get("author", ""),
-            "subject": metadata.get("subject", ""),
-            "creator": metadata.get("creator", ""),
-            "producer": metadata.get("producer", ""),
-            "creationDate": metadata.get("creationDate", ""),
-            "modificationDate": metadata.get("modDate", "")
-        })
-
-        # Extract text
-        text_content = []
-        for page in doc:
-            text_content.append(page.get_text())
-        result["text"] = "\n".join(text_content)
-
-        # Extract images
-        # Use a set to track duplicate images
-        seen_hashes = set()
-        
-        for page in doc:
-            image_list = page.get_images(full=True)
-            for img in image_list:
-                try:
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    
-                    # Hash the image bytes to detect duplicates
-                    img_hash = hashlib.sha256(image_bytes).hexdigest()
-                    if img_hash in seen_hashes:
-                        continue  # skip duplicate
-                    seen_hashes.add(img_hash)
-                    
-                    image = Image.open(BytesIO(image_bytes))
-                    buffered = BytesIO()
-                    image.convert("RGB").save(buffered, format="JPEG", quality=70)
-                    img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                    result["images"].append(f"data:image/jpeg;base64,{img_base64}")
-                except Exception as e:
-                    # Skip problematic images
+            image.save(buffered, format=output_format.upper())
+    return source, buffered.getvalue(), output_format, image.width, image.height
+
+def _page_images(doc, page, seen_xrefs, seen_hashes, options=DEFAULT_OPTIONS, object_hashes=None):
+    """
+    Return the images on a page that were not seen before, as ExtractedImage,
+    and whether all of them came from ``options.memo``.
+
+    Images are de-duplicated by xref before anything is extracted, then by a
+    hash of their source bytes. With a memo, images are looked up by the
+    hash of their stream (see _object_hash) before they are extracted.
+    """
+    memo = options.memo
+    reused = True
+    images = []
+    for img in page.get_images(full=True):
+        xref = img[0]
+        if xref in seen_xrefs:
+            continue
+        seen_xrefs.add(xref)
+
+        # The declared size is known without decoding, so skip tiny images early
+        if img[2] < options.min_image_size or img[3] < options.min_image_size:
+            continue
+        options.limits.check_image_size(img[2] * img[3])
+
+        try:
+            memo_key = memoized = None
+            if memo is not None:
+                memo_key = _image_memo_key(doc, xref, object_hashes, options)
+                memoized = memo.get_image(memo_key) if memo_key is not None else None
+            if memoized is not None:
+                meta, data = memoized
+                img_hash, image_format, width, height = meta["hash"], meta["format"], meta["width"], meta["height"]
+                source_size = meta["sourceSize"]
+            else:
+                reused = False
+                source, data, image_format, width, height = _encode_image(doc, xref, img, options)
+                # Hash the source bytes to detect duplicates stored under other xrefs
+                img_hash = hashlib.sha256(source).hexdigest()
+                source_size = len(source)
+                if memo_key is not None:
+                    memo.put_image(memo_key, {"hash": img_hash, "format": image_format, "width": width,
+                                              "height": height, "sourceSize": source_size}, data)
+
+            if img_hash in seen_hashes:
+                continue  # skip duplicate
+            seen_hashes.add(img_hash)
+
+            count("images")
+            if memoized is not None:
+                count("imagesReused")
+            count("imageBytesIn", source_size)
+            count("imageBytesOut", len(data))
+            images.append(ExtractedImage(
+                id=hashlib.sha256(data).hexdigest()[:32],
+                hash=img_hash,
+                page=page.number + 1,
+                xref=xref,
+                format=image_format,
+                width=width,
+                height=height,
+                data=data
+            ))
+        except ResourceLimitExceeded:
+            raise
+        except Exception:
+            # Skip problematic images
+            continue
+    return images, reused
+
+def _render_preview(page, width):
+    """
+    Render a page straight at a low resolution, as a JPEG ``width`` pixels wide.
+
+    The page is rasterized once at the preview's scale, never at full
+    resolution. Very tall pages are scaled down further so the preview is
+    at most PREVIEW_MAX_ASPECT times as tall as it is wide.
+    """
+    import fitz
+
+    rect = page.rect
+    scale = min(width / max(rect.width, 1), PREVIEW_MAX_ASPECT * width / max(rect.height, 1))
+    with stage("preview"):
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        preview = PagePreview(page=page.number + 1, width=pixmap.width, height=pixmap.height,
+                              data=pixmap.tobytes("jpeg", jpg_quality=PREVIEW_QUALITY))
+    count("previews")
+    return preview
+
+def render_page_preview(pdf_file, page_number, width=256):
+    """
+    Render the preview of one page (1-based) of a PDF, for pages that were not previewed during extraction.
+
+    Raises InvalidPDFError if the document cannot be opened and IndexError
+    if it has no such page.
+    """
+    doc = _open_document(pdf_file)
+    try:
+        if not 1 <= page_number <= len(doc):
+            raise IndexError(f"Document has no page {page_number}")
+        return _render_preview(doc[page_number - 1], width)
+    finally:
+        doc.close()
+        release_engine_memory()
+
+def _check_cancelled(cancel_path):
+    import os
+    if cancel_path is not None and os.path.exists(cancel_path):
+        raise ExtractionCancelled("Extraction was cancelled")
+
+def _check_deadline(deadline, options):
+    import time
+    if deadline is not None and time.time() > deadline:
+        raise ResourceLimitExceeded(
+            f"Extraction exceeded the time limit of {options.limits.max_seconds:g}s")
+
+def _check_engine_memory(options):
+    limit = options.limits.engine_memory_bytes
+    if limit and (_resident_bytes() or 0) > limit:
+        release_engine_memory()
+
+def _resident_bytes():
+    """Resident memory of this process, or None where /proc is not available."""
+    import os
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def _estimate_cost(doc, page_indexes, options):
+    """
+    Estimate the cost of extracting the selected pages, without decoding anything.
+
+    Only the page tree and each page's image list are read; pixel counts
+    are the sizes the images declare.
+    """
+    seen_xrefs = set()
+    pixels = largest = 0
+    if "images" in options.fields:
+        for index in page_indexes:
+            for img in doc.get_page_images(index, full=True):
+                if img[0] in seen_xrefs:
                     continue
+                seen_xrefs.add(img[0])
+                image_pixels = img[2] * img[3]
+                pixels += image_pixels
+                largest = max(largest, image_pixels)
+    return {
+        "pages": len(page_indexes),
+        "images": len(seen_xrefs),
+        "imagePixels": pixels,
+        "largestImagePixels": largest
+    }
+
+def limit_output(pages, options):
+    """
+    Pass PageResults through, raising ResourceLimitExceeded once they add up
+    to more than ``options.limits.max_output_bytes``.
+    """
+    max_bytes = options.limits.max_output_bytes
+    if not max_bytes:
+        yield from pages
+        return
+    produced = 0
+    for page in pages:
+        produced += len(page.text or "") + sum(len(image.data) for image in page.images or ())
+        if page.preview is not None:
+            produced += len(page.preview.data)
+        if produced > max_bytes:
+            raise ResourceLimitExceeded(
+                f"Extraction output exceeds the limit of {max_bytes / (1024 * 1024):g} MB")
+        yield page
+
+def _extract_page(doc, index, seen_xrefs, seen_hashes, options, object_hashes=None):
+    """
+    Return a PageResult holding only the requested fields.
+
+    With ``options.memo``, the text is looked up by the page's fingerprint
+    first, and ``reused`` is set when the text and images all came from the
+    memo. Links are always read from the page, and previews rendered from it.
+    """
+    page = doc[index]
+    result = PageResult(index)
+    count("pages")
+    memo = options.memo
+    reused = memo is not None
+    if "text" in options.fields:
+        text = memo_key = None
+        if memo is not None:
+            with stage("fingerprint"):
+                fingerprint = _page_fingerprint(doc, page, object_hashes)
+            if fingerprint is not None:
+                memo_key = _memo_key("text", fingerprint)
+                text = memo.get_text(memo_key)
+        if text is None:
+            reused = False
+            with stage("text"):
+                text = page.get_text()
+            if memo_key is not None:
+                memo.put_text(memo_key, text)
+        result.text = text
+    if "images" in options.fields:
+        result.images, images_reused = _page_images(doc, page, seen_xrefs, seen_hashes, options, object_hashes)
+        reused = reused and images_reused
+    if "links" in options.fields:
+        with stage("links"):
+            result.links = _page_links(page, index)
+    if "previews" in options.fields:
+        result.preview = _render_preview(page, options.preview_width)
+    result.reused = reused
+    if reused:
+        count("pagesReused")
+    return result
+
+def _document_info(doc, options):
+    page_indexes = options.selected_pages(len(doc))
+    with stage("preflight"):
+        cost = _estimate_cost(doc, page_indexes, options)
+    options.limits.check_cost(cost)
+
+    info = {
+        "metadata": _document_metadata(doc),
+        "pageIndexes": page_indexes,
+        "cost": cost
+    }
+    if "outline" in options.fields:
+        info["outline"] = _document_outline(doc)
+    return info
+
+def _build_result(info, pages, options):
+    """Assemble a DocumentResult holding the requested fields from document info and pages."""
+    text_content = []
+    page_offsets = []
+    text_length = 0
+    images = []
+    links = []
+    previews = []
+    reused = extracted = 0
+    for page in limit_output(pages, options):
+        if page.reused:
+            reused += 1
+        else:
+            extracted += 1
+        if page.text is not None:
+            page_offsets.append((page.number, text_length))
+            text_length += len(page.text) + 1
+            text_content.append(page.text)
+        if page.images:
+            images.extend(page.images)
+        if page.links:
+            links.extend(page.links)
+        if page.preview is not None:
+            previews.append(page.preview)
+
+    result = DocumentResult()
+    if "text" in options.fields:
+        result.text = "\n".join(text_content)
+        result.page_offsets = page_offsets
+    if "metadata" in options.fields:
+        result.metadata = info["metadata"]
+    if "images" in options.fields:
+        result.images = images
+    if "outline" in options.fields:
+        result.outline = info["outline"]
+    if "links" in options.fields:
+        result.links = links
+    if "previews" in options.fields:
+        result.previews = previews
+    if options.pages is not None:
+        result.pages = [index + 1 for index in info["pageIndexes"]]
+    if options.memo is not None:
+        result.page_reuse = {"reused": reused, "extracted": extracted}
+    return result
+
+def extract_document_info(pdf_file, options=DEFAULT_OPTIONS):
+    """
+    Return the document-level information needed before pages are extracted.
+
+    The dict holds the metadata, the indexes of the selected pages, the
+    pre-flight cost estimate (see _estimate_cost) and, if requested, the
+    outline. No page content is parsed. Raises ResourceLimitExceeded if the
+    estimate is over ``options.limits``.
+    """
+    doc = _open_document(pdf_file)
+    try:
+        return _document_info(doc, options)
+    finally:
+        doc.close()
+
+def extract_page_chunk(pdf_path, page_indexes, options=DEFAULT_OPTIONS, cancel_path=None, deadline=None):
+    """
+    Extract the PageResults for the given page indexes of a PDF on disk (or
+    of PDF bytes).
+
+    Images are de-duplicated within the chunk only; each image keeps its hash
+    so the caller can de-duplicate across chunks while merging. Raises
+    ExtractionCancelled before any page once ``cancel_path`` exists, and
+    ResourceLimitExceeded once the ``deadline`` (a time.time()) has passed.
+    """
+    doc = _open_document(pdf_path)
+    try:
+        return list(iter_pages(doc, options, page_indexes, cancel_path, deadline))
+    finally:
+        doc.close()
+        release_engine_memory()
+
+def iter_pages(doc, options=DEFAULT_OPTIONS, page_indexes=None, cancel_path=None, deadline=None):
+    """
+    Yield a PageResult for every selected page of an open document.
+
+    Only the requested page fields are set, and ``images`` only holds images
+    not yielded for an earlier page. This is the serial counterpart of
+    iter_pages_parallel. Raises ExtractionCancelled between pages once
+    ``cancel_path`` exists, and ResourceLimitExceeded once the ``deadline``
+    has passed.
+    """
+    if page_indexes is None:
+        page_indexes = options.selected_pages(len(doc))
+
+    # Use sets to track duplicate images
+    seen_xrefs = set()
+    seen_hashes = set()
+    object_hashes = {}
+    try:
+        for index in page_indexes:
+            _check_cancelled(cancel_path)
+            _check_deadline(deadline, options)
+            _check_engine_memory(options)
+            yield _extract_page(doc, index, seen_xrefs, seen_hashes, options, object_hashes)
+    finally:
+        if options.memo is not None:
+            options.memo.flush()
+
+def extract_document(pdf_file, options=DEFAULT_OPTIONS, cancel_path=None, deadline=None):
+    """
+    Extract the requested fields of a PDF into a DocumentResult.
+
+    Raises InvalidPDFError if the document cannot be opened,
+    ExtractionCancelled once ``cancel_path`` exists, ResourceLimitExceeded
+    when the document is over ``options.limits`` and PDFProcessingError if
+    the extraction fails. The time limit counts from the call unless a
+    ``deadline`` is given.
+    """
+    if deadline is None:
+        deadline = options.limits.deadline()
+    doc = _open_document(pdf_file)
+    try:
+        info = _document_info(doc, options)
+
+        # Extract the requested fields page by page
+        pages = iter_pages(doc, options, info["pageIndexes"], cancel_path, deadline)
+        return _build_result(info, pages, options)
+    except PDFProcessingError:
+        raise
+    except Exception as e:
+        raise PDFProcessingError(f"Error processing PDF: {e}") from e
+    finally:
+        doc.close()
+        release_engine_memory()
+
+def release_engine_memory():
+    """
+    Empty MuPDF's global store of decoded images, fonts and parsed objects.
+
+    PyMuPDF can neither set nor read the store's size (its limit is 256 MB),
+    so it is emptied after every document and batch of pages, and between
+    pages while the process is over ``ResourceLimits.engine_memory_bytes``.
+    """
+    import fitz
+    fitz.TOOLS.store_shrink(100)
+
+def iter_document_pages(pdf_file, options=DEFAULT_OPTIONS, page_indexes=None, cancel_path=None, deadline=None,
+                        batch_pages=LOW_MEMORY_BATCH_PAGES):
+    """
+    Yield a PageResult for every selected page of a PDF while holding a bounded amount of memory.
+
+    MuPDF keeps every object it parsed until the document is closed, so
+    iter_pages grows with the document. Here the document is reopened every
+    ``batch_pages`` pages, with the engine's store emptied in between, and
+    the store is also emptied between pages while the process is over
+    ``options.limits.engine_memory_bytes``. Images are still de-duplicated across the whole document, and the pages
+    are the same as from iter_pages. ``pdf_file`` is a path or raw bytes;
+    a file object is read once.
+    """
+    if hasattr(pdf_file, "read"):
+        pdf_file = pdf_file.read()
+    if page_indexes is None:
+        doc = _open_document(pdf_file)
+        try:
+            page_indexes = options.selected_pages(len(doc))
+        finally:
+            doc.close()
+
+    seen_xrefs = set()
+    seen_hashes = set()
+    batch_pages = max(1, int(batch_pages))
+    for start in range(0, len(page_indexes), batch_pages):
+        doc = _open_document(pdf_file)
+        object_hashes = {}
+        try:
+            for index in page_indexes[start:start + batch_pages]:
+                _check_cancelled(cancel_path)
+                _check_deadline(deadline, options)
+                _check_engine_memory(options)
+                yield _extract_page(doc, index, seen_xrefs, seen_hashes, options, object_hashes)
+        finally:
+            doc.close()
+            if options.memo is not None:
+                options.memo.flush()
+            release_engine_memory()
+
+def _write_spilled(out, spill):
+    from shutil import copyfileobj
+    out.write(b"[")
+    spill.seek(0)
+    copyfileobj(spill, out)
+    out.write(b"]")
+
+def write_document_json(pdf_file, out, options=DEFAULT_OPTIONS, image_mode="inline", head=None,
+                        image_json=None, preview_json=None, cancel_path=None, deadline=None, spill_bytes=SPILL_BYTES,
+                        batch_pages=LOW_MEMORY_BATCH_PAGES):
+    """
+    Write the JSON of ``extract_document(pdf_file, options).to_json(image_mode)`` to a binary file, page by page.
 
-        return json.dumps(result)
+    This is the low-memory counterpart of extract_document: pages come from
+    iter_document_pages and each one is written (its text) or appended to a
+    spill buffer (its images, links and preview) as soon as it is extracted,
+    so no more than one page is held in memory. Spill buffers move to
+    temporary files once they exceed ``spill_bytes``. ``head`` holds fields
+    written before the result's own, such as ``documentId``;
+    ``image_json(image)`` replaces ExtractedImage.to_json(image_mode), for
+    example to store the bytes elsewhere, and ``preview_json(preview)``
+    replaces PagePreview.to_json(image_mode). Returns the number of pages
+    written. Raises the same exceptions as extract_document; ``out`` then
+    holds a partial document.
+    """
+    from tempfile import SpooledTemporaryFile
 
+    if deadline is None:
+        deadline = options.limits.deadline()
+    if hasattr(pdf_file, "read"):
+        pdf_file = pdf_file.read()
+    if image_json is None:
+        def image_json(image):
+            return image.to_json(image_mode)
+    if preview_json is None:
+        def preview_json(preview):
+            return preview.to_json(image_mode)
+
+    doc = _open_document(pdf_file)
+    try:
+        info = _document_info(doc, options)
+    finally:
+        doc.close()
+
+    separator = b"{"
+    for name, value in (head or {}).items():
+        out.write(separator + dumps({name: value})[1:-1])
+        separator = b","
+
+    pages = iter_document_pages(pdf_file, options, info["pageIndexes"], cancel_path, deadline, batch_pages)
+    page_count = reused = 0
+    with SpooledTemporaryFile(spill_bytes) as images, SpooledTemporaryFile(spill_bytes) as links, \
+            SpooledTemporaryFile(spill_bytes) as previews:
+        try:
+            if "text" in options.fields:
+                out.write(separator + b'"text":"')
+                separator = b","
+            text_separator = image_separator = link_separator = preview_separator = b""
+            for page in limit_output(pages, options):
+                page_count += 1
+                reused += page.reused
+                if page.text is not None:
+                    # JSON escapes character by character, so the page strings can be escaped one at a time
+                    out.write(text_separator + dumps(page.text)[1:-1])
+                    text_separator = b"\\n"
+                for image in page.images or ():
+                    images.write(image_separator + dumps(image_json(image)))
+                    image_separator = b","
+                for link in page.links or ():
+                    links.write(link_separator + dumps(link))
+                    link_separator = b","
+                if page.preview is not None:
+                    previews.write(preview_separator + dumps(preview_json(page.preview)))
+                    preview_separator = b","
+                page = None  # the page's text and image bytes are released before the next one
+        except PDFProcessingError:
+            raise
+        except Exception as e:
+            raise PDFProcessingError(f"Error processing PDF: {e}") from e
+        if "text" in options.fields:
+            out.write(b'"')
+
+        # The remaining fields in the order of DocumentResult.to_dict
+        def write_field(name, value=None, spill=None):
+            nonlocal separator
+            out.write(separator + dumps(name) + b":")
+            separator = b","
+            if spill is not None:
+                _write_spilled(out, spill)
+            else:
+                out.write(dumps(value))
+
+        if "metadata" in options.fields:
+            write_field("metadata", info["metadata"])
+        if "images" in options.fields:
+            write_field("images", spill=images)
+        if "outline" in options.fields:
+            write_field("outline", info["outline"])
+        if "links" in options.fields:
+            write_field("links", spill=links)
+        if "previews" in options.fields:
+            write_field("previews", spill=previews)
+        if options.pages is not None:
+            write_field("pages", [index + 1 for index in info["pageIndexes"]])
+        if options.memo is not None:
+            write_field("pageReuse", {"reused": reused, "extracted": page_count - reused})
+    out.write(b"}" if separator == b"," else b"{}")
+    return page_count
+
+def warm_up():
+    """
+    Import the extraction engine and run it on a tiny built-in document.
+
+    Servers call this at startup, so the first request does not pay for
+    importing PyMuPDF and Pillow and loading MuPDF's fonts. Returns the
+    seconds it took.
+    """
+    import time
+    start = time.perf_counter()
+    import fitz
+    from PIL import Image  # noqa: F401
+
+    doc = fitz.open()
+    try:
+        page = doc.new_page(width=200, height=200)
+        page.insert_text((20, 40), "Warm-up")
+        data = doc.tobytes()
+    finally:
+        doc.close()
+    extract_document(data, ExtractionOptions(fields=ALL_FIELDS))
+    return time.perf_counter() - start
+
+def process_pdf(pdf_file, options=DEFAULT_OPTIONS):
+    """
+    Return the extraction result of extract_document as a JSON string.
+
+    Kept for compatibility: failures are returned as an ``{"error": ...}``
+    payload instead of being raised.
+    """
+    import json
+
+    try:
+        return extract_document(pdf_file, options).to_json().decode('utf-8')
     except Exception as e:
         return json.dumps({"error": str(e)})
+
+def iter_pages_parallel(pdf_path, page_indexes, executor, chunk_pages=50, max_workers=None,
+                        options=DEFAULT_OPTIONS, cancel_path=None, deadline=None):
+    """
+    Yield the PageResults of ``page_indexes``, in page order.
+
+    Pages are extracted in chunks of ``chunk_pages`` on ``executor`` with at
+    most ``max_workers`` chunks in flight, so only a bounded window of results
+    is held in memory. Pages are the same as from iter_pages, and images
+    are de-duplicated across chunks. Chunks still in flight are cancelled
+    when the generator is closed early. Once ``cancel_path`` exists, or the
+    ``deadline`` has passed, no new chunk is submitted and the workers stop
+    at their next page.
+    """
+    import os
+    from collections import deque
+
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_pages = max(1, int(chunk_pages))
+    chunks = deque(page_indexes[start:start + chunk_pages]
+                   for start in range(0, len(page_indexes), chunk_pages))
+    seen_hashes = set()
+
+    in_flight = deque()
+    try:
+        while chunks or in_flight:
+            while chunks and len(in_flight) < max_workers:
+                _check_cancelled(cancel_path)
+                _check_deadline(deadline, options)
+                in_flight.append(executor.submit(extract_page_chunk, pdf_path, chunks.popleft(),
+                                                 options, cancel_path, deadline))
+
+            for page in in_flight.popleft().result():
+                if page.images:
+                    images = []
+                    for image in page.images:
+                        if image.hash in seen_hashes:
+                            continue  # duplicate from an earlier chunk
+                        seen_hashes.add(image.hash)
+                        images.append(image)
+                    page.images = images
+                yield page
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+def _report_progress(pages, page_total, progress):
+    progress(0, page_total)
+    for done, page in enumerate(pages, 1):
+        yield page
+        progress(done, page_total)
+
+def extract_document_parallel(pdf_file, executor=None, chunk_pages=50, max_workers=None, min_pages=200,
+                              options=DEFAULT_OPTIONS, progress=None, cancel_path=None, info=None):
+    """
+    Extract a PDF by splitting its pages into chunks extracted in separate processes.
+
+    Every worker opens the same file on disk (bytes and uploaded files are
+    written to a temporary file first), so the document is shared through the
+    OS page cache instead of being pickled to each worker. Chunk results are
+    merged in page order and image de-duplication stays global. When fewer
+    than ``min_pages`` pages are selected they are extracted by a single job.
+
+    Args:
+        pdf_file: File path, raw bytes or an object with ``read()``
+        executor: Anything with ``submit(fn, *args)`` returning a Future, such
+            as ``WorkerPool``; a temporary ``ProcessPoolExecutor`` if None
+        chunk_pages: Number of pages extracted per job
+        max_workers: Maximum number of chunks in flight for this document
+        min_pages: Page count below which the serial path is used
+        options: ExtractionOptions
+        progress: Optional ``progress(pages_done, page_total)`` callback,
+            called as chunked pages are merged
+        cancel_path: Stop with ExtractionCancelled once this file exists
+        info: The document's extract_document_info, if the caller already
+            has it (for example from an admission pre-flight)
+
+    Returns the same DocumentResult as ``extract_document`` and raises the
+    same exceptions. Errors raised by the executor (timeouts, crashed
+    workers) propagate unchanged.
+    """
+    import os
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    deadline = options.limits.deadline()
+    temp_path = None
+    own_executor = None
+    try:
+        if isinstance(pdf_file, str):
+            pdf_path = pdf_file
+        else:
+            data = pdf_file if isinstance(pdf_file, (bytes, bytearray)) else pdf_file.read()
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+                temp_file.write(data)
+                temp_path = pdf_path = temp_file.name
+            del data
+
+        if info is None:
+            info = extract_document_info(pdf_path, options)
+
+        page_indexes = info["pageIndexes"]
+        if not page_indexes:
+            # Only document-level fields were requested; no page is loaded
+            return _build_result(info, [], options)
+
+        max_workers = max_workers or os.cpu_count() or 1
+        if executor is None:
+            if len(page_indexes) < min_pages:
+                return extract_document(pdf_path, options, cancel_path, deadline)
+            executor = own_executor = ProcessPoolExecutor(max_workers=max_workers)
+        elif len(page_indexes) < min_pages:
+            return executor.submit(extract_document, pdf_path, options, cancel_path, deadline).result()
+
+        pages = iter_pages_parallel(pdf_path, page_indexes, executor, chunk_pages, max_workers,
+                                    options, cancel_path, deadline)
+        if progress is not None:
+            pages = _report_progress(pages, len(page_indexes), progress)
+        return _build_result(info, pages, options)
+
     finally:
-        if 'doc' in locals():
-            doc.close()
\ No newline at end of file
+        if own_executor is not None:
+            own_executor.shutdown(cancel_futures=True)
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
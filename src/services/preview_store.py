@@ -0,0 +1,186 @@
+import os
+import re
+import shutil
+import threading
+
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def is_digest(value):
+    """Return True if ``value`` is a lowercase hex SHA-256, the only document id a store accepts."""
+    return isinstance(value, str) and _DIGEST.fullmatch(value) is not None
+
+
+class PreviewStore:
+    """
+    Bounded on-disk store of page previews and the PDFs they are rendered from.
+
+    Previews are content addressed: they are stored under the document's
+    SHA-256, the page number and the preview width, so a preview is rendered
+    once per document however many requests or processes ask for it. The
+    source PDF of a document can be kept as well, so pages that were not
+    previewed during extraction can be rendered on demand. Previews and
+    sources share one byte budget; the least recently used files are evicted
+    when it is exceeded. The directory can be shared by several processes
+    (the API and the Streamlit apps).
+
+    Args:
+        directory: Directory holding the ``previews`` and ``sources`` trees
+        max_bytes: Budget for the stored previews and PDFs
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def get(self, digest, page, width):
+        """Return the JPEG bytes of a stored preview, or None."""
+        if not is_digest(digest):
+            return None
+        data = self._read(self._preview_path(digest, page, width))
+        with self._lock:
+            if data is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return data
+
+    def put(self, digest, page, width, data):
+        self._write(self._preview_path(digest, page, width), data)
+
+    def put_previews(self, digest, previews, width):
+        """Store PagePreviews rendered for the requested ``width``."""
+        for preview in previews or ():
+            self.put(digest, preview.page, width, preview.data)
+
+    def keep_source(self, digest, path):
+        """Keep a copy of the PDF at ``path`` for on-demand previews, unless one is already kept."""
+        target = self._source_path(digest)
+        if self._touch(target):
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            try:
+                # A hard link costs nothing when the file is on the same file system
+                os.link(path, temp_path)
+            except OSError:
+                shutil.copyfile(path, temp_path)
+            os.replace(temp_path, target)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+        self._added(os.path.getsize(target))
+
+    def source_path(self, digest):
+        """Return the path of a kept PDF, or None."""
+        if not is_digest(digest):
+            return None
+        path = self._source_path(digest)
+        return path if self._touch(path) else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "bytes": self._size
+            }
+
+    def _preview_path(self, digest, page, width):
+        _check_digest(digest)
+        return os.path.join(self.directory, "previews", digest[:2], f"{digest}-{int(page)}-{int(width)}.jpeg")
+
+    def _source_path(self, digest):
+        _check_digest(digest)
+        return os.path.join(self.directory, "sources", digest[:2], f"{digest}.pdf")
+
+    def _touch(self, path):
+        # Refresh the modification time so eviction is least recently used
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        return data
+
+    def _write(self, path, data):
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+        self._added(len(data) - previous)
+
+    def _added(self, size):
+        with self._lock:
+            self._size += size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        # Rescan so files written by other processes are accounted for
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        evicted = 0
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._size = total
+            self._evictions += evicted
+
+
+def _check_digest(digest):
+    # Digests are joined into paths, so anything else could escape the directory
+    if not is_digest(digest):
+        raise ValueError(f"Not a SHA-256 hex digest: {digest!r}")
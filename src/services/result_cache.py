@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Bump when the extraction output format changes so old entries are ignored
+FORMAT_VERSION = 2
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data):
+    """Return the SHA-256 hex digest of a bytes object."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(digest, options=None):
+    """
+    Build a cache key from a document digest and the extraction options.
+
+    The same PDF processed with different options gets a different key.
+    """
+    options_json = json.dumps(
+        {"version": FORMAT_VERSION, "options": options or {}},
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    options_hash = hashlib.sha256(options_json.encode('utf-8')).hexdigest()[:16]
+    return f"{digest}-{options_hash}"
+
+
+def result_key(digest, options, image_mode="inline", output_format="json"):
+    """
+    Build the cache key of an extraction result.
+
+    ``options`` are ExtractionOptions. Every process that serves results
+    (the API, the embedded API of the Streamlit app, the Streamlit viewer)
+    builds its keys here, so they share entries in a shared cache directory.
+    """
+    key_options = {**options.to_dict(), "imageMode": image_mode}
+    if output_format != "json":
+        key_options["format"] = output_format
+    return make_key(digest, key_options)
+
+
+class ResultCache:
+    """
+    Two-tier cache of serialized extraction results (JSON bytes).
+
+    A byte-bounded in-memory LRU sits in front of an on-disk store with a
+    byte budget; the least recently used files are evicted when it is
+    exceeded. The disk tier can be shared by several processes (the API and
+    the Streamlit apps) by pointing them at the same directory.
+
+    Args:
+        directory: Directory for the disk tier, or None for memory only
+        memory_bytes: Budget for the in-memory tier
+        disk_bytes: Budget for the disk tier
+    """
+
+    def __init__(self, directory=None, memory_bytes=64 * 1024 * 1024,
+                 disk_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = 0
+
+        self._hits = 0
+        self._memory_hits = 0
+        self._misses = 0
+        self._memory_evictions = 0
+        self._disk_evictions = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_size = sum(size for _, _, size in self._disk_entries())
+
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                self._memory_hits += 1
+                return value
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Store a value in both tiers."""
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "memoryHits": self._memory_hits,
+                "diskHits": self._hits - self._memory_hits,
+                "misses": self._misses,
+                "memoryEvictions": self._memory_evictions,
+                "diskEvictions": self._disk_evictions,
+                "memoryEntries": len(self._memory),
+                "memoryBytes": self._memory_size,
+                "diskBytes": self._disk_size
+            }
+
+    def _remember(self, key, value):
+        size = len(value)
+        if size > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = value
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self._memory_evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            # Refresh the modification time so eviction is least recently used
+            os.utime(path)
+            return value
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.directory:
+            return
+        data = value.encode('utf-8') if isinstance(value, str) else value
+        if len(data) > self.disk_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+
+        with self._lock:
+            self._disk_size += len(data) - previous
+            over_budget = self._disk_size > self.disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _disk_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict_disk(self):
+        # Rescan so files written by other processes are accounted for
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        evicted = 0
+        for _, path, size in entries:
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._disk_size = total
+            self._disk_evictions += evicted
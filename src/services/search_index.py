@@ -0,0 +1,291 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from tempfile import SpooledTemporaryFile
+
+from services.serialization import dumps, loads
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    page_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    page INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_doc_id ON pages (doc_id);
+-- Prefix indexes keep short prefix queries ("inv*") from scanning every matching term
+CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+"""
+
+
+def match_expression(query):
+    """
+    Turn a user query into an FTS5 MATCH expression.
+
+    Every whitespace separated term must match (implicit AND) and is quoted,
+    so FTS5 operators and punctuation cannot cause syntax errors; a term
+    ending in ``*`` matches as a prefix.
+    """
+    terms = []
+    for term in query.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*")
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Local full-text index over the per-page text of processed documents.
+
+    Page text lives in an SQLite FTS5 table whose rowids point into a plain
+    ``pages`` table, so a document's pages can be found (and replaced or
+    deleted) through an ordinary index while queries use FTS5 ranking and
+    snippets. Writes should come from a single thread (see SearchIndexer);
+    any number of threads may search at the same time.
+
+    Args:
+        path: SQLite database file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def add_document(self, doc_id, pages, title=None):
+        """
+        Index the (page number, text) pairs of a document, replacing any earlier version.
+
+        The document becomes searchable all at once when its transaction commits.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete(conn, doc_id)
+                page_count = 0
+                for number, text in pages:
+                    page_count += 1
+                    if text.strip():
+                        rowid = conn.execute("INSERT INTO pages (doc_id, page) VALUES (?, ?)",
+                                             (doc_id, number)).lastrowid
+                        conn.execute("INSERT INTO page_text (rowid, text) VALUES (?, ?)", (rowid, text))
+                conn.execute(
+                    "INSERT INTO documents (id, title, page_count, indexed_at) VALUES (?, ?, ?, ?)",
+                    (doc_id, title, page_count, time.time())
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return page_count
+
+    def delete_document(self, doc_id):
+        """Remove a document from the index; returns False if it was not indexed."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = self._delete(conn, doc_id)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def has_document(self, doc_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM documents WHERE id = ?", (doc_id,)).fetchone() is not None
+
+    def search(self, query, limit=20, offset=0, doc_id=None):
+        """
+        Return the best matching pages for a query, best first.
+
+        Each hit is a dict with documentId, title, page, snippet (matches
+        wrapped in ``[`` and ``]``) and score (BM25; lower is better).
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            "SELECT p.doc_id, d.title, p.page, "
+            "snippet(page_text, 0, '[', ']', '…', 16) AS snippet, page_text.rank AS score "
+            "FROM page_text "
+            "JOIN pages p ON p.id = page_text.rowid "
+            "JOIN documents d ON d.id = p.doc_id "
+            "WHERE page_text MATCH ?"
+        )
+        params = [expression]
+        if doc_id is not None:
+            sql += " AND p.doc_id = ?"
+            params.append(doc_id)
+        sql += " ORDER BY page_text.rank LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {
+                "documentId": row["doc_id"],
+                "title": row["title"],
+                "page": row["page"],
+                "snippet": row["snippet"],
+                "score": row["score"]
+            }
+            for row in rows
+        ]
+
+    def stats(self):
+        with self._connect() as conn:
+            documents = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            pages = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {"documents": documents, "pages": pages}
+
+    def _delete(self, conn, doc_id):
+        conn.execute("DELETE FROM page_text WHERE rowid IN (SELECT id FROM pages WHERE doc_id = ?)", (doc_id,))
+        conn.execute("DELETE FROM pages WHERE doc_id = ?", (doc_id,))
+        return conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,)).rowcount == 1
+
+    def _connect(self):
+        # Autocommit mode; writes open their own transactions
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)
+
+
+class SpooledPageText:
+    """
+    (page number, text) pairs collected for SearchIndexer.submit() without
+    holding them in memory.
+
+    Pages are appended to a temporary file as they are produced, such as
+    while a response streams, and iterating reads them back once and
+    deletes the file. close() discards pages that were never submitted.
+
+    Args:
+        max_memory_bytes: Text kept in memory before it moves to the file
+    """
+
+    def __init__(self, max_memory_bytes=1024 * 1024):
+        self._file = SpooledTemporaryFile(max_memory_bytes)
+
+    def append(self, number, text):
+        # JSON escapes newlines, so every page is one line
+        self._file.write(dumps([number, text]) + b"\n")
+
+    def __iter__(self):
+        try:
+            self._file.seek(0)
+            for line in self._file:
+                number, text = loads(line)
+                yield number, text
+        finally:
+            self._file.close()
+
+    def close(self):
+        self._file.close()
+
+
+class SearchIndexer:
+    """
+    Feeds a SearchIndex from a background thread, off the request path.
+
+    submit() only puts the document on a bounded queue and never blocks; when
+    the queue is full the document is dropped and counted, so a slow index
+    can never hold up extraction.
+
+    Args:
+        index: SearchIndex to write to
+        max_queue: Documents allowed to wait for indexing
+    """
+
+    def __init__(self, index, max_queue=64):
+        self.index = index
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = set()
+        self._indexed = 0
+        self._dropped = 0
+        self._failed = 0
+        self._last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="search-indexer", daemon=True)
+                self._thread.start()
+
+    def shutdown(self, timeout=None):
+        """Index what is queued, then stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, doc_id, pages, title=None):
+        """
+        Queue a document for indexing; returns False if it was dropped.
+
+        ``pages`` is an iterable of (page number, text) pairs, such as
+        DocumentResult.iter_page_text(); it is consumed by the indexing thread.
+        """
+        self.start()
+        with self._lock:
+            self._pending.add(doc_id)
+        try:
+            self._queue.put_nowait((doc_id, pages, title))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(doc_id)
+                self._dropped += 1
+            return False
+
+    def has_document(self, doc_id):
+        """True if a document is in the index or waiting to be indexed."""
+        with self._lock:
+            if doc_id in self._pending:
+                return True
+        return self.index.has_document(doc_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "indexed": self._indexed,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "lastError": self._last_error
+            }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            doc_id, pages, title = item
+            try:
+                self.index.add_document(doc_id, pages, title)
+                with self._lock:
+                    self._indexed += 1
+            except Exception as e:
+                with self._lock:
+                    self._failed += 1
+                    self._last_error = f"{doc_id}: {e}"
+            finally:
+                with self._lock:
+                    self._pending.discard(doc_id)
+
@@ -0,0 +1,95 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; MessagePack output is not offered without it
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional; CBOR output is not offered without it
+    cbor2 = None
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "cbor": "application/cbor",
+}
+
+# Media types clients send for each format, including unofficial ones
+_FORMATS_BY_MEDIA_TYPE = {
+    **{media_type: name for name, media_type in MEDIA_TYPES.items()},
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+
+def dumps(obj):
+    """Serialize obj to compact UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def loads(data):
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def available_formats():
+    """Return the output formats this process can produce; JSON is always first."""
+    return tuple(name for name, module in (("json", json), ("msgpack", msgpack), ("cbor", cbor2)) if module)
+
+def negotiate_format(accept):
+    """
+    Pick an output format from an Accept header.
+
+    JSON is used without an Accept header and wins ties, so ``*/*`` and
+    ``application/json`` keep getting JSON. It is also the fallback when no
+    available format is acceptable, as clients got JSON before there was a
+    choice.
+    """
+    if not accept:
+        return "json"
+    qualities = {}
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        key = _FORMATS_BY_MEDIA_TYPE.get(media_type, media_type)
+        qualities[key] = max(quality, qualities.get(key, 0.0))
+
+    wildcard = max(qualities.get("application/*", 0.0), qualities.get("*/*", 0.0))
+    best, best_quality = None, 0.0
+    for name in available_formats():
+        quality = qualities.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best or "json"
+
+def dumps_as(obj, output_format="json"):
+    """Serialize obj as JSON, MessagePack or CBOR bytes; bytes values stay binary in the latter two."""
+    if output_format == "msgpack":
+        return msgpack.packb(obj, use_bin_type=True)
+    if output_format == "cbor":
+        return cbor2.dumps(obj)
+    return dumps(obj)
+
+def loads_as(data, output_format="json"):
+    """Parse bytes produced by dumps_as()."""
+    if output_format == "msgpack":
+        return msgpack.unpackb(data, raw=False)
+    if output_format == "cbor":
+        return cbor2.loads(data)
+    return loads(data)
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the maximum size."""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"File exceeds the maximum upload size of {max_bytes / (1024 * 1024):g} MB")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """
+    An upload copied to a named temporary file.
+
+    Holds the file's path, SHA-256 digest and size. The file is deleted by
+    close(), or on leaving the ``with`` block; closing twice is harmless.
+    """
+
+    def __init__(self, path, digest, size):
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self._owner = True
+
+    def detach(self):
+        """
+        Hand the file over to a new SpooledUpload, which deletes it when closed.
+
+        Closing this one no longer deletes the file, so work that outlives
+        the request (such as a shared extraction) can keep using it.
+        """
+        self._owner = False
+        return SpooledUpload(self.path, self.digest, self.size)
+
+    def close(self):
+        if not self._owner:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def spool_file(fileobj, max_bytes=None, chunk_size=_CHUNK_SIZE):
+    """
+    Copy a binary file object to a temporary file in chunks and return a SpooledUpload.
+
+    The digest is computed while copying, so the data is read exactly once
+    and never held in memory as a whole. Raises UploadTooLarge as soon as
+    more than ``max_bytes`` have been read; the partial file is removed.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return SpooledUpload(path, digest.hexdigest(), size)
+
+
+async def spool_upload(upload, max_bytes=None, chunk_size=_CHUNK_SIZE):
+    """
+    Spool a FastAPI/Starlette UploadFile to disk without blocking the event loop.
+
+    Uploads whose declared size is already over the limit are rejected
+    before anything is copied.
+    """
+    size = getattr(upload, "size", None)
+    if max_bytes is not None and size is not None and size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    await upload.seek(0)
+    return await asyncio.to_thread(spool_file, upload.file, max_bytes, chunk_size)
+
+
+def zip_pdf_members(zip_file):
+    """Return the ZipInfo of every PDF in an open ZipFile, skipping folders and macOS metadata."""
+    return [
+        info for info in zip_file.infolist()
+        if not info.is_dir()
+        and info.filename.lower().endswith('.pdf')
+        and not info.filename.startswith('__MACOSX/')
+    ]
+
+
+def spool_zip_member(zip_file, info, max_bytes=None, chunk_size=_CHUNK_SIZE):
+    """
+    Decompress one member of an open ZipFile to a temporary file.
+
+    ``max_bytes`` applies to the decompressed size, so a highly compressed
+    member cannot fill the disk.
+    """
+    with zip_file.open(info) as member:
+        return spool_file(member, max_bytes, chunk_size)
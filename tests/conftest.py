@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The services import each other as top-level packages from src/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
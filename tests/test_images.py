@@ -0,0 +1,53 @@
+import io
+
+import fitz
+from PIL import Image
+
+from services.pdf_processor import ExtractionOptions, extract_document
+
+IMAGES = ExtractionOptions(fields=frozenset({"images"}))
+
+
+def _jpeg(mode, color):
+    buffered = io.BytesIO()
+    Image.new(mode, (16, 16), color).save(buffered, "JPEG")
+    return buffered.getvalue()
+
+
+def _icc_cmyk_pdf(jpeg):
+    """A page showing a CMYK JPEG whose colour space is ICCBased, not DeviceCMYK."""
+    doc = fitz.open()
+    page = doc.new_page()
+    profile = doc.get_new_xref()
+    doc.update_object(profile, "<< /N 4 /Alternate /DeviceCMYK >>")
+    doc.update_stream(profile, b"0" * 128)
+    image = doc.get_new_xref()
+    doc.update_object(image, "<< /Type /XObject /Subtype /Image /Width 16 /Height 16 /BitsPerComponent 8 "
+                             f"/ColorSpace [/ICCBased {profile} 0 R] >>")
+    doc.update_stream(image, jpeg, compress=False)
+    doc.xref_set_key(image, "Filter", "/DCTDecode")
+    doc.xref_set_key(page.xref, "Resources", f"<< /XObject << /Im0 {image} 0 R >> >>")
+    contents = doc.get_new_xref()
+    doc.update_object(contents, "<< >>")
+    doc.update_stream(contents, b"q 100 0 0 100 50 50 cm /Im0 Do Q")
+    doc.xref_set_key(page.xref, "Contents", f"{contents} 0 R")
+    return doc.tobytes()
+
+
+def test_rgb_jpeg_is_passed_through():
+    jpeg = _jpeg("RGB", (200, 30, 30))
+    doc = fitz.open()
+    doc.new_page().insert_image(fitz.Rect(50, 50, 150, 150), stream=jpeg)
+
+    image, = extract_document(doc.tobytes(), IMAGES).images
+
+    assert image.data == jpeg
+
+
+def test_cmyk_jpeg_under_icc_colorspace_is_converted():
+    jpeg = _jpeg("CMYK", (0, 255, 255, 0))
+
+    image, = extract_document(_icc_cmyk_pdf(jpeg), IMAGES).images
+
+    assert image.data != jpeg
+    assert Image.open(io.BytesIO(image.data)).mode == "RGB"
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from services.job_store import CANCELLED, COMPLETED, FAILED, QUEUED, RUNNING, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path), ttl_seconds=60)
+
+
+def test_job_runs_to_completion(store):
+    job = store.create()
+    assert job["status"] == QUEUED
+
+    assert store.start(job["id"])
+    store.set_progress(job["id"], 2, 5)
+    job = store.get(job["id"])
+    assert (job["status"], job["pages_processed"], job["page_count"]) == (RUNNING, 2, 5)
+
+    assert store.complete(job["id"], b'{"pages": []}')
+    job = store.get(job["id"])
+    assert (job["status"], job["pages_processed"], job["page_count"]) == (COMPLETED, 5, 5)
+    assert job["finished_at"] is not None
+    with open(store.result_path(job["id"]), 'rb') as f:
+        assert f.read() == b'{"pages": []}'
+
+
+def test_completing_without_progress_takes_the_given_page_count(store):
+    job = store.create()
+
+    assert store.complete(job["id"], b"{}", page_count=3)
+    job = store.get(job["id"])
+    assert (job["status"], job["pages_processed"], job["page_count"]) == (COMPLETED, 3, 3)
+
+
+def test_cancelled_job_cannot_start_or_complete(store):
+    job = store.create()
+
+    assert store.cancel(job["id"])["status"] == CANCELLED
+    assert store.is_cancelled(job["id"])
+    assert not store.start(job["id"])
+    assert not store.complete(job["id"], b"{}")
+    assert not os.path.exists(store.result_path(job["id"]))
+    assert store.get(job["id"])["status"] == CANCELLED
+
+
+def test_finished_jobs_are_not_cancelled(store):
+    job = store.create()
+    store.start(job["id"])
+    store.fail(job["id"], "Invalid PDF")
+
+    job = store.cancel(job["id"])
+    assert (job["status"], job["error"]) == (FAILED, "Invalid PDF")
+    assert not store.is_cancelled(job["id"])
+    assert store.cancel("missing") is None
+
+
+def test_recover_fails_interrupted_jobs(store):
+    queued = store.create()
+    running = store.create()
+    store.start(running["id"])
+    done = store.create()
+    store.complete(done["id"], b"{}")
+
+    assert store.recover() == 2
+    assert store.get(queued["id"])["status"] == FAILED
+    assert store.get(running["id"])["error"] == "Interrupted by a server restart"
+    assert store.get(done["id"])["status"] == COMPLETED
+
+
+def test_expired_jobs_are_purged_with_their_files(store):
+    old = store.create()
+    store.complete(old["id"], b"{}")
+    active = store.create()
+    finished_at = store.get(old["id"])["finished_at"]
+
+    assert store.purge_expired(now=finished_at + 30) == 0
+    assert store.purge_expired(now=finished_at + 61) == 1
+    assert store.get(old["id"]) is None
+    assert not os.path.exists(store.result_path(old["id"]))
+    assert store.get(active["id"])["status"] == QUEUED
+    assert store.stats()["purged"] == 1
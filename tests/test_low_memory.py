@@ -0,0 +1,75 @@
+"""
+The low-memory extraction mode: its output, and its peak memory on documents
+of growing size.
+
+The peak memory test is slow, so it only runs with PDF_SLOW_TESTS=1. It is
+Linux only: every extraction runs in a fresh interpreter and reports its own
+peak RSS (VmHWM).
+"""
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.corpus import CorpusSpec, generate
+from services import pdf_processor
+from services.pdf_processor import ALL_FIELDS, ExtractionOptions, ResourceLimits, extract_document, write_document_json
+
+slow = pytest.mark.skipif(os.getenv("PDF_SLOW_TESTS", "0").lower() not in ("1", "true", "yes"),
+                          reason="slow; set PDF_SLOW_TESTS=1 to run")
+needs_proc = pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc for peak RSS")
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# One bound for every page count: the low-memory mode must not grow with the document
+PEAK_RSS_LIMIT_MB = 160
+PAGE_COUNTS = (1000, 5000)
+
+_EXTRACT = """
+import os, sys
+sys.path.insert(0, sys.argv[1])
+from services.pdf_processor import write_document_json
+with open(os.devnull, "wb") as out:
+    write_document_json(sys.argv[2], out)
+with open("/proc/self/status") as f:
+    print(next(int(line.split()[1]) // 1024 for line in f if line.startswith("VmHWM:")))
+"""
+
+
+def _peak_rss_mb(path):
+    done = subprocess.run([sys.executable, "-c", _EXTRACT, SRC, path],
+                          capture_output=True, text=True, check=True)
+    return int(done.stdout.split()[-1])
+
+
+@pytest.mark.parametrize("image_mode", ["inline", "ref"])
+def test_spilled_json_matches_extract_document(tmp_path, monkeypatch, image_mode):
+    path = str(tmp_path / "small.pdf")
+    generate(path, CorpusSpec(pages=6, lines_per_page=5, images_per_page=2, image_format="png",
+                              image_size=32, duplicate_ratio=0.5))
+    # One byte of resident memory is always over the limit, so the store is emptied between all pages
+    options = ExtractionOptions(fields=ALL_FIELDS, limits=ResourceLimits(engine_memory_bytes=1))
+    releases = []
+    release = pdf_processor.release_engine_memory
+    monkeypatch.setattr(pdf_processor, "release_engine_memory", lambda: releases.append(1) or release())
+
+    out = io.BytesIO()
+    # Every image, link and preview spills to a file, and the document is reopened every two pages
+    pages = write_document_json(path, out, options, image_mode, spill_bytes=1, batch_pages=2)
+
+    assert pages == 6
+    assert len(releases) >= 6
+    assert out.getvalue() == extract_document(path, options).to_json(image_mode)
+
+
+@slow
+@needs_proc
+@pytest.mark.parametrize("pages", PAGE_COUNTS)
+def test_low_memory_peak_rss_is_bounded(tmp_path, pages):
+    path = str(tmp_path / "huge.pdf")
+    generate(path, CorpusSpec(pages=pages, lines_per_page=40, images_per_page=1, image_format="jpeg",
+                              image_size=128, duplicate_ratio=0.5))
+
+    assert _peak_rss_mb(path) < PEAK_RSS_LIMIT_MB
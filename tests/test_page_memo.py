@@ -0,0 +1,32 @@
+import fitz
+
+from services.page_memo import PageMemo
+from services.pdf_processor import ExtractionOptions, extract_document
+
+
+def _form_pdf(text):
+    """A one-page PDF whose text is drawn by a Form XObject named /P."""
+    doc = fitz.open()
+    page = doc.new_page()
+    font = doc.get_new_xref()
+    doc.update_object(font, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    form = doc.get_new_xref()
+    doc.update_object(form, "<< /Type /XObject /Subtype /Form /BBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 {font} 0 R >> >> >>")
+    doc.update_stream(form, f"BT /F1 24 Tf 72 700 Td ({text}) Tj ET".encode("ascii"))
+    doc.xref_set_key(page.xref, "Resources", f"<< /XObject << /P {form} 0 R >> >>")
+    contents = doc.get_new_xref()
+    doc.update_object(contents, "<< >>")
+    doc.update_stream(contents, b"/P Do")
+    doc.xref_set_key(page.xref, "Contents", f"{contents} 0 R")
+    return doc.tobytes()
+
+
+def test_memo_sees_changes_behind_resources_named_p(tmp_path):
+    options = ExtractionOptions(fields=frozenset({"text"}), memo=PageMemo(str(tmp_path / "memo.sqlite3")))
+
+    first = extract_document(_form_pdf("Alpha"), options)
+    second = extract_document(_form_pdf("Bravo"), options)
+
+    assert "Alpha" in first.text
+    assert "Bravo" in second.text
@@ -0,0 +1,41 @@
+import hashlib
+import os
+
+import pytest
+
+from services.preview_store import PreviewStore, is_digest
+
+
+DIGEST = hashlib.sha256(b"document").hexdigest()
+
+
+def test_previews_are_stored_under_the_digest(tmp_path):
+    store = PreviewStore(str(tmp_path))
+    store.put(DIGEST, 1, 256, b"jpeg")
+
+    assert store.get(DIGEST, 1, 256) == b"jpeg"
+    assert store.get(DIGEST, 2, 256) is None
+
+
+@pytest.mark.parametrize("doc_id", [
+    "../../etc/passwd",
+    "..%2F..%2Fsecret",
+    DIGEST.upper(),
+    DIGEST[:-1],
+    DIGEST + "0",
+    DIGEST[:-2] + "/x"
+])
+def test_ids_that_are_not_digests_never_reach_the_file_system(tmp_path, doc_id):
+    directory = tmp_path / "store"
+    secret = tmp_path / "secret.pdf"
+    secret.write_bytes(b"%PDF")
+    store = PreviewStore(str(directory))
+
+    assert not is_digest(doc_id)
+    assert store.get(doc_id, 1, 256) is None
+    assert store.source_path(doc_id) is None
+    with pytest.raises(ValueError):
+        store.put(doc_id, 1, 256, b"jpeg")
+    with pytest.raises(ValueError):
+        store.keep_source(doc_id, str(secret))
+    assert not any(files for _, _, files in os.walk(directory))
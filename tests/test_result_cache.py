@@ -0,0 +1,74 @@
+import os
+
+from services.pdf_processor import ExtractionOptions
+from services.result_cache import ResultCache, result_key
+
+
+def _disk_files(directory):
+    return sorted(name for _, _, files in os.walk(directory) for name in files)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(memory_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    stats = cache.stats()
+    assert stats["memoryEvictions"] == 1
+    assert stats["memoryBytes"] == 8
+    assert stats["misses"] == 1
+
+
+def test_values_over_the_memory_budget_are_kept_on_disk_only(tmp_path):
+    cache = ResultCache(str(tmp_path), memory_bytes=4)
+    cache.put("big", b"0123456789")
+
+    assert cache.stats()["memoryEntries"] == 0
+    assert cache.get("big") == b"0123456789"
+    assert cache.stats()["diskHits"] == 1
+
+
+def test_disk_tier_is_shared_through_the_directory(tmp_path):
+    ResultCache(str(tmp_path)).put("key", b"{}")
+    cache = ResultCache(str(tmp_path))
+
+    assert cache.stats()["diskBytes"] == 2
+    assert cache.get("key") == b"{}"
+    stats = cache.stats()
+    assert stats["diskHits"] == 1
+    # The disk hit is promoted to memory
+    assert cache.get("key") == b"{}"
+    assert cache.stats()["memoryHits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), memory_bytes=0, disk_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    # Older modification times than the read refreshes below
+    for name in ("a", "b"):
+        os.utime(os.path.join(tmp_path, name[:2], f"{name}.json"), (1, 1))
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+
+    assert _disk_files(tmp_path) == ["a.json", "c.json"]
+    stats = cache.stats()
+    assert stats["diskEvictions"] == 1
+    assert stats["diskBytes"] == 8
+
+
+def test_result_key_depends_on_the_options_and_output():
+    options = ExtractionOptions()
+    key = result_key("d" * 64, options)
+
+    assert key.startswith("d" * 64)
+    assert result_key("d" * 64, ExtractionOptions()) == key
+    assert result_key("e" * 64, options) != key
+    assert result_key("d" * 64, ExtractionOptions(fields=frozenset({"text"}))) != key
+    assert result_key("d" * 64, options, image_mode="ref") != key
+    assert result_key("d" * 64, options, output_format="msgpack") != key
@@ -0,0 +1,16 @@
+import pytest
+
+from services.serialization import available_formats, negotiate_format
+
+
+@pytest.mark.parametrize("accept", [None, "", "*/*", "application/json", "application/*",
+                                    "text/html", "text/html, image/*;q=0.8"])
+def test_json_when_nothing_else_is_asked_for(accept):
+    assert negotiate_format(accept) == "json"
+
+
+@pytest.mark.skipif("msgpack" not in available_formats(), reason="msgpack is not installed")
+def test_binary_format_wins_when_preferred():
+    assert negotiate_format("application/x-msgpack") == "msgpack"
+    assert negotiate_format("application/json;q=0.5, application/msgpack") == "msgpack"
+    assert negotiate_format("application/msgpack, */*") == "json"
@@ -0,0 +1,98 @@
+import asyncio
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def SingleFlight(tmp_path_factory):
+    # Importing the API creates its stores; keep them out of the home directory
+    directory = tmp_path_factory.mktemp("api")
+    for name in ("PDF_CACHE_DIR", "PDF_PREVIEW_DIR", "PDF_JOBS_DIR"):
+        os.environ.setdefault(name, str(directory / name))
+    return importlib.import_module("api_server").SingleFlight
+
+
+def test_identical_requests_share_one_extraction(SingleFlight):
+    flight = SingleFlight()
+    calls = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def extract():
+            calls.append(1)
+            await release.wait()
+            return b"{}"
+
+        waiters = [asyncio.ensure_future(flight.run("key", extract)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flight.stats() == {"inFlight": 1, "started": 1, "coalesced": 2}
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert results == [b"{}"] * 3
+        assert flight.stats()["inFlight"] == 0
+        # Finished work is not reused; the cache serves later requests
+        assert await flight.run("key", extract) == b"{}"
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_waiters_share_the_exception(SingleFlight):
+    flight = SingleFlight()
+
+    async def main():
+        async def extract():
+            await asyncio.sleep(0.01)
+            raise ValueError("Invalid PDF")
+
+        results = await asyncio.gather(*(flight.run("key", extract) for _ in range(2)),
+                                       return_exceptions=True)
+        assert [str(result) for result in results] == ["Invalid PDF"] * 2
+        assert results[0] is results[1]
+        assert flight.stats()["inFlight"] == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_extraction_running(SingleFlight):
+    flight = SingleFlight()
+
+    async def main():
+        release = asyncio.Event()
+        finished = []
+
+        async def extract():
+            await release.wait()
+            finished.append(1)
+            return b"{}"
+
+        gone = asyncio.ensure_future(flight.run("key", extract))
+        staying = asyncio.ensure_future(flight.run("key", extract))
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await staying == b"{}"
+        assert gone.cancelled()
+        assert finished == [1]
+
+    asyncio.run(main())
+
+
+def test_different_keys_do_not_coalesce(SingleFlight):
+    flight = SingleFlight()
+
+    async def main():
+        async def extract():
+            await asyncio.sleep(0.01)
+            return b"{}"
+
+        await asyncio.gather(flight.run("a", extract), flight.run("b", extract))
+
+    asyncio.run(main())
+    assert flight.stats() == {"inFlight": 0, "started": 2, "coalesced": 0}
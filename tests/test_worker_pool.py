@@ -0,0 +1,134 @@
+import functools
+import os
+import time
+
+import pytest
+
+from services.executor import WARMUP_RETRIES, JobTimeout, PoolClosed, PoolSaturated, WorkerCrashed, WorkerPool
+
+
+def _add(a, b):
+    return a + b
+
+
+def _fail():
+    raise RuntimeError("no engine")
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+
+
+def _crash():
+    os._exit(1)
+
+
+def _crash_once(marker):
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(*args, **kwargs):
+        kwargs.setdefault("preload", False)
+        pool = WorkerPool(*args, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_replacement_warm_up_makes_pool_ready(make_pool, tmp_path):
+    pool = make_pool(2, warmup=functools.partial(_crash_once, str(tmp_path / "crashed")))
+    pool.start()
+
+    assert pool.wait_ready(30)
+    stats = pool.stats()
+    assert stats["readyWorkers"] == 2
+    assert stats["workerRestarts"] == 1
+    assert "died" in stats["warmupError"]
+
+
+def test_raising_warm_up_gives_up_and_pool_still_runs_jobs(make_pool):
+    pool = make_pool(1, warmup=_fail)
+    pool.start()
+
+    assert pool.wait_ready(30)
+    stats = pool.stats()
+    assert stats["readyWorkers"] == 1
+    assert stats["workerRestarts"] == WARMUP_RETRIES + 1
+    assert "no engine" in stats["warmupError"]
+    assert pool.submit(_add, 1, 2).result(timeout=30) == 3
+
+
+def test_job_over_its_timeout_is_killed_and_the_worker_replaced(make_pool):
+    pool = make_pool(1, job_timeout=0.5)
+
+    with pytest.raises(JobTimeout):
+        pool.submit(_sleep, 30).result(timeout=30)
+    assert pool.submit(_add, 2, 2).result(timeout=30) == 4
+    assert pool.submit_job(_sleep, (0.5,), timeout=30).result(timeout=30) is None
+
+    stats = pool.stats()
+    assert stats["timedOut"] == 1
+    assert stats["failed"] == 1
+    assert stats["completed"] == 2
+    assert stats["workerRestarts"] == 1
+
+
+def test_crashed_worker_is_replaced(make_pool):
+    pool = make_pool(1)
+
+    with pytest.raises(WorkerCrashed):
+        pool.submit(_crash).result(timeout=30)
+    assert pool.submit(_add, 1, 1).result(timeout=30) == 2
+    assert pool.stats()["workerRestarts"] == 1
+
+
+def test_job_exceptions_reach_the_caller_without_replacing_the_worker(make_pool):
+    pool = make_pool(1)
+
+    with pytest.raises(RuntimeError, match="no engine"):
+        pool.submit(_fail).result(timeout=30)
+    assert pool.submit(_add, 1, 1).result(timeout=30) == 2
+    assert pool.stats()["workerRestarts"] == 0
+
+
+def test_admission_is_bounded_by_workers_and_queue(make_pool):
+    pool = make_pool(1, max_queue=1, retry_after=7)
+
+    with pool.admit(), pool.admit():
+        assert pool.stats()["admitted"] == 2
+        with pytest.raises(PoolSaturated) as saturated:
+            with pool.admit():
+                pass
+        assert saturated.value.retry_after == 7
+    with pool.admit(cost=2):
+        pass
+    assert pool.stats()["admitted"] == 0
+
+
+def test_idle_pool_admits_a_job_over_its_capacity(make_pool):
+    pool = make_pool(1)
+
+    with pool.admit(cost=10):
+        with pytest.raises(PoolSaturated):
+            with pool.admit():
+                pass
+
+
+def test_shut_down_pool_refuses_work(make_pool):
+    pool = make_pool(1)
+    pool.shutdown()
+
+    with pytest.raises(PoolClosed):
+        with pool.admit():
+            pass
+    with pytest.raises(PoolClosed):
+        pool.submit(_add, 1, 1)